@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+bench_normalizer.py
+Throughput de MarkdownNormalizer (líneas/seg) sobre tesis convertidas
+
+Normaliza cada .md de --input (por defecto sources_local/converted) y mide
+líneas/seg del pipeline completo y µs por encabezado del parser de
+numeración (_extract_semantic_level + _extract_numbering). Sin archivos de
+entrada genera tesis sintéticas con la forma de la salida de
+_convert_native (marcadores de página, separadores, encabezados
+numerados y párrafos fragmentados).
+
+Con --compare-rev se carga además markdown_normalizer.py desde una
+revisión de git y se comparan ambas versiones sobre los mismos textos.
+
+Con --pathological mide entradas de peor caso a tamaños crecientes (una
+palabra por línea, líneas de 100k caracteres, corridas de encabezados) y
+reporta la escala: ~1.0 es lineal, ~8 (para 8x de entrada) cuadrático.
+
+Con --cache mide la re-normalización con caché de bloques: sin caché,
+caché fría, caliente, tras cambiar una regla de fusión y tras agregar un
+patrón de perfil que toca pocos bloques.
+
+Con --validation mide solo la validación (_validate) sobre las salidas ya
+normalizadas y su peso en el tiempo de normalizar; con --pages grande y
+--compare-rev muestra el ahorro en documentos largos.
+
+Uso:
+    python scripts/benchmarks/bench_normalizer.py
+    python scripts/benchmarks/bench_normalizer.py --input sources_local/converted
+    python scripts/benchmarks/bench_normalizer.py --compare-rev HEAD~1
+    python scripts/benchmarks/bench_normalizer.py --pathological
+    python scripts/benchmarks/bench_normalizer.py --cache
+    python scripts/benchmarks/bench_normalizer.py --validation --pages 1500 --compare-rev HEAD~1
+"""
+
+import argparse
+import importlib.util
+import logging
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "conversion"))
+
+import markdown_normalizer
+
+NORMALIZER_PATH = "scripts/conversion/markdown_normalizer.py"
+REPO_ROOT = Path(__file__).parent.parent.parent
+
+WORDS = (
+    "el la de que en los se del las un por con para una su al es lo como más pero "
+    "investigación análisis datos resultados método estudio sistema modelo proceso "
+    "desarrollo teoría variable muestra población hipótesis objetivo problema"
+).split()
+ROMANS = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X"]
+# Tamaños (palabras, caracteres o líneas) de los casos patológicos
+PATHOLOGICAL_SIZES = (12_500, 25_000, 50_000, 100_000)
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:]
+
+
+def synthetic_thesis(seed: int, pages: int) -> str:
+    """Tesis sintética con la estructura de la salida de _convert_native."""
+    rng = random.Random(seed)
+    chapter = section = 0
+    blocks = []
+    for page in range(1, pages + 1):
+        lines = [f"## Página {page}", "", "UNIVERSIDAD PRIVADA DE TACNA", ""]
+        for _ in range(rng.randint(3, 7)):
+            kind = rng.random()
+            if kind < 0.05:
+                chapter += 1
+                section = 0
+                lines.append(f"## CAPÍTULO {ROMANS[chapter % 10]}: {_sentence(rng, 3).upper()}")
+            elif kind < 0.20:
+                section += 1
+                lines.append(f"### {max(chapter, 1)}.{section} {_sentence(rng, 4)}")
+            elif kind < 0.30:
+                lines.append(f"## {max(chapter, 1)}.{max(section, 1)}.{rng.randint(1, 5)} {_sentence(rng, 4)}")
+            elif kind < 0.33:
+                lines.append(f"## Anexo {rng.randint(1, 9)}")
+            else:
+                # Párrafo fragmentado: líneas cortadas a media oración
+                for _ in range(rng.randint(2, 8)):
+                    line = _sentence(rng, rng.randint(6, 16))
+                    if rng.random() < 0.6:
+                        line = line[0].lower() + line[1:]
+                    lines.append(line + rng.choice(["", "", ",", "."]))
+            lines.append("")
+        lines.append(f"## {page}")
+        blocks.append("\n".join(lines).strip())
+    return "\n\n---\n\n".join(blocks)
+
+
+def pathological_cases(rng: random.Random) -> dict:
+    """Generadores de entradas de peor caso: nombre → función(tamaño) → texto."""
+    def one_word_lines(n):
+        # OCR de una palabra por línea: un solo párrafo de n fragmentos
+        return "\n".join(rng.choice(WORDS) for _ in range(n))
+    
+    def long_lines(n):
+        # Líneas de n caracteres que los patrones de limpieza sí examinan
+        return "\n".join([
+            _sentence(rng, n // 6)[:n],
+            "#" * n,
+            "## " + " " * n + "x",
+            "---" + " " * n,
+            "## Página " + "1 " * (n // 2),
+            "## " + "1." * (n // 2),
+        ])
+    
+    def heading_runs(n):
+        # n/10 encabezados seguidos, numeración de hasta 6 niveles
+        lines = []
+        for i in range(n // 10):
+            depth = 1 + i % 6
+            numbering = ".".join(str(1 + (i >> k) % 9) for k in range(depth))
+            lines.append(f"{'#' * depth} {numbering} {_sentence(rng, 3)}")
+        return "\n".join(lines)
+    
+    def blank_runs(n):
+        # Encabezados y separadores entre blancos, y un encabezado seguido
+        # de n/2 líneas en blanco (el validador espera el siguiente contenido)
+        block = ["## 1.1 Título", "   ", "---", "\t", "##", "", " "]
+        lines = block * (n // 2 // len(block)) + ["# Título"] + ["  "] * (n // 2) + ["fin"]
+        return "\n".join(lines)
+    
+    return {
+        "una palabra/línea": one_word_lines,
+        "líneas de 100k": long_lines,
+        "encabezados": heading_runs,
+        "blancos": blank_runs,
+    }
+
+
+def bench_pathological(module, repeat: int) -> dict:
+    """Mejor tiempo (s) por caso y tamaño: {caso: [t por PATHOLOGICAL_SIZES]}."""
+    normalizer = module.MarkdownNormalizer()
+    results = {}
+    for name, make in pathological_cases(random.Random(0)).items():
+        results[name] = []
+        for size in PATHOLOGICAL_SIZES:
+            text = make(size)
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                normalizer.normalize(text)
+                best = min(best, time.perf_counter() - start)
+            results[name].append(best)
+    return results
+
+
+def print_pathological(versions: list, repeat: int):
+    """Tabla de tiempos y escala de los casos patológicos."""
+    growth = PATHOLOGICAL_SIZES[-1] / PATHOLOGICAL_SIZES[0]
+    print(f"{'Versión':<10} {'Caso':<18} " + " ".join(f"{size:>9,}" for size in PATHOLOGICAL_SIZES)
+          + f" {'escala':>7}")
+    for name, module in versions:
+        for case, times in bench_pathological(module, repeat).items():
+            scale = times[-1] / max(times[0], 1e-9) / growth
+            print(f"{name:<10} {case:<18} " + " ".join(f"{t * 1000:>7.1f}ms" for t in times)
+                  + f" {scale:>7.1f}")
+    print("(escala = crecimiento del tiempo / crecimiento de la entrada; 1.0 es lineal)")
+
+
+def bench_cache(documents: list) -> list:
+    """(escenario, segundos) de normalizar todos los documentos con caché de bloques."""
+    def run(normalizer, cache=None) -> float:
+        start = time.perf_counter()
+        for _, text in documents:
+            normalizer.normalize(text, cache=cache)
+        return time.perf_counter() - start
+    
+    # Perfiles mínimos: solo los campos que lee MarkdownNormalizer
+    def profile(name, **fields):
+        defaults = dict(name=name, preserve_metadata=False, merge_fragmented_lines=True,
+                        min_line_length_for_merge=0, max_heading_level=6,
+                        uppercase_is_heading=True, strip_boilerplate=True,
+                        page_marker_pattern=None, footer_pattern=None, header_pattern=None)
+        return SimpleNamespace(**{**defaults, **fields})
+    
+    standard = markdown_normalizer.MarkdownNormalizer()
+    merge_rule = markdown_normalizer.MarkdownNormalizer(profile=profile("fusion", min_line_length_for_merge=40))
+    footer_rule = markdown_normalizer.MarkdownNormalizer(profile=profile("pie", footer_pattern=r"Anexo\s+9"))
+    
+    results = [("sin caché", run(standard))]
+    with tempfile.TemporaryDirectory() as tmp:
+        with markdown_normalizer.NormalizationCache(Path(tmp) / "cache.db") as cache:
+            results.append(("caché fría", run(standard, cache)))
+            results.append(("caché caliente", run(standard, cache)))
+            results.append(("regla de fusión", run(merge_rule, cache)))
+            results.append(("patrón de perfil", run(footer_rule, cache)))
+    return results
+
+
+def load_revision(rev: str):
+    """Carga markdown_normalizer.py de una revisión de git como módulo aparte."""
+    source = subprocess.run(
+        ["git", "show", f"{rev}:{NORMALIZER_PATH}"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    path = Path(tempfile.mkdtemp()) / "markdown_normalizer_rev.py"
+    path.write_text(source, encoding="utf-8")
+    spec = importlib.util.spec_from_file_location(f"markdown_normalizer_{rev}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_documents(input_dir: Path, synthetic: int, pages: int) -> list:
+    """(nombre, texto) de los .md de input_dir o de tesis sintéticas."""
+    files = sorted(input_dir.glob("*.md")) if input_dir.is_dir() else []
+    if files:
+        return [(path.name, path.read_text(encoding="utf-8")) for path in files]
+    return [(f"sintetica_{seed}.md", synthetic_thesis(seed, pages)) for seed in range(synthetic)]
+
+
+def heading_texts(documents: list) -> list:
+    """Textos de encabezado markdown (lo que recibe el parser de numeración)."""
+    pattern = re.compile(r'^#+\s+(.+)$', re.MULTILINE)
+    return [m.group(1).strip() for _, text in documents for m in pattern.finditer(text)]
+
+
+def bench_normalize(module, documents: list, repeat: int) -> float:
+    """Mejor tiempo (s) de normalizar todos los documentos."""
+    normalizer = module.MarkdownNormalizer()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _, text in documents:
+            normalizer.normalize(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_validation(module, outputs: list, repeat: int) -> float:
+    """Mejor tiempo (s) de validar todas las salidas normalizadas."""
+    normalizer = module.MarkdownNormalizer()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for markdown in outputs:
+            normalizer._validate(markdown)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_headings(module, headings: list, repeat: int) -> float:
+    """Mejor tiempo (s) de extraer nivel y numeración de todos los encabezados."""
+    normalizer = module.MarkdownNormalizer()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in headings:
+            normalizer._extract_semantic_level(text)
+            normalizer._extract_numbering(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput de MarkdownNormalizer")
+    parser.add_argument("--input", default="sources_local/converted",
+                        help="Directorio con .md a normalizar (default: sources_local/converted)")
+    parser.add_argument("--synthetic", type=int, default=10,
+                        help="Tesis sintéticas si --input no tiene .md (default: 10)")
+    parser.add_argument("--pages", type=int, default=150,
+                        help="Páginas por tesis sintética (default: 150)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones (default: 3)")
+    parser.add_argument("--compare-rev", metavar="REV",
+                        help="Comparar con markdown_normalizer.py de una revisión de git")
+    parser.add_argument("--pathological", action="store_true",
+                        help="Medir escalado con entradas de peor caso en vez de tesis")
+    parser.add_argument("--cache", action="store_true",
+                        help="Medir re-normalización con caché de bloques")
+    parser.add_argument("--validation", action="store_true",
+                        help="Medir la validación sobre las salidas normalizadas")
+    args = parser.parse_args()
+    
+    # El normalizador registra cada fase y avisa saltos de jerarquía;
+    # silenciarlo para no medir el logging
+    logging.disable(logging.WARNING)
+    
+    versions = [("actual", markdown_normalizer)]
+    if args.compare_rev:
+        versions.insert(0, (args.compare_rev, load_revision(args.compare_rev)))
+    
+    if args.pathological:
+        print("=" * 70)
+        print("📊 BENCHMARK NORMALIZADOR - Peor caso")
+        print("=" * 70)
+        print_pathological(versions, args.repeat)
+        print("=" * 70)
+        return
+    
+    documents = load_documents(Path(args.input), args.synthetic, args.pages)
+    headings = heading_texts(documents)
+    total_lines = sum(text.count("\n") + 1 for _, text in documents)
+    total_mb = sum(len(text.encode("utf-8")) for _, text in documents) / 1024 / 1024
+    
+    print("=" * 70)
+    print("📊 BENCHMARK NORMALIZADOR - MarkdownNormalizer")
+    print("=" * 70)
+    print(f"Documentos: {len(documents)} | Líneas: {total_lines} | "
+          f"{total_mb:.1f} MB | Encabezados: {len(headings)}")
+    print("-" * 70)
+    
+    if args.cache:
+        results = bench_cache(documents)
+        baseline = results[0][1]
+        print(f"{'Escenario':<20} {'segundos':>10} {'vs sin caché':>14}")
+        for name, elapsed in results:
+            print(f"{name:<20} {elapsed:>10.2f} {baseline / elapsed:>13.1f}x")
+        print("=" * 70)
+        return
+    
+    if args.validation:
+        # Mismas salidas para todas las versiones (las del normalizador actual)
+        outputs = [markdown_normalizer.MarkdownNormalizer().normalize(text)["markdown"]
+                   for _, text in documents]
+        output_mb = sum(len(text.encode("utf-8")) for text in outputs) / 1024 / 1024
+        print(f"{'Versión':<14} {'ms validación':>14} {'MB/s':>8} {'% de normalizar':>16}")
+        for name, module in versions:
+            elapsed = bench_validation(module, outputs, args.repeat)
+            total = bench_normalize(module, documents, args.repeat)
+            print(f"{name:<14} {elapsed * 1000:>14.1f} {output_mb / elapsed:>8.1f} "
+                  f"{elapsed / total * 100:>15.1f}%")
+        print("=" * 70)
+        return
+    
+    print(f"{'Versión':<14} {'líneas/s':>12} {'MB/s':>8} {'µs/encabezado':>15}")
+    
+    for name, module in versions:
+        elapsed = bench_normalize(module, documents, args.repeat)
+        heading_elapsed = bench_headings(module, headings, args.repeat)
+        print(f"{name:<14} {total_lines / elapsed:>12,.0f} {total_mb / elapsed:>8.2f} "
+              f"{heading_elapsed / max(len(headings), 1) * 1e6:>15.2f}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+bench_tracker_bulk.py
+Benchmark de registro masivo en ConversionTracker (filas/seg)
+
+Compara add_conversion()/update_conversion() fila a fila contra
+add_conversions_many()/update_conversions_many() sobre N PDFs
+sintéticos pequeños. El hash de los archivos se calcula antes de medir
+(queda memoizado en el tracker) para medir solo la base de datos.
+
+Uso:
+    python scripts/benchmarks/bench_tracker_bulk.py
+    python scripts/benchmarks/bench_tracker_bulk.py --files 20000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "conversion"))
+
+from conversion_db import ConversionTracker
+
+# El tracker registra cada escritura; silenciarlo para no medir el logging
+logging.getLogger("conversion_db").setLevel(logging.CRITICAL)
+
+
+def _make_files(directory: Path, count: int) -> list:
+    """Crea `count` archivos con contenido distinto (hash único)."""
+    paths = []
+    for i in range(count):
+        path = directory / f"doc_{i:06d}.pdf"
+        path.write_bytes(b"%PDF-1.4\n" + os.urandom(256))
+        paths.append(path)
+    return paths
+
+
+def _open_warm_tracker(db_dir: Path, paths: list) -> ConversionTracker:
+    """Tracker nuevo con los hashes ya memoizados."""
+    tracker = ConversionTracker(str(db_dir))
+    for path in paths:
+        tracker._calculate_hash(path)
+        tracker._calculate_partial_hash(path)
+    return tracker
+
+
+def bench_rows(paths: list, work_dir: Path) -> dict:
+    """Inserción y actualización fila a fila."""
+    tracker = _open_warm_tracker(work_dir / "rows", paths)
+    
+    start = time.perf_counter()
+    ids = [tracker.add_conversion(path, status="pending", pages=1) for path in paths]
+    insert_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for conversion_id in ids:
+        tracker.update_conversion(conversion_id, status="success", confidence_score=90)
+    update_time = time.perf_counter() - start
+    
+    tracker.close()
+    return {"insert": insert_time, "update": update_time}
+
+
+def bench_bulk(paths: list, work_dir: Path) -> dict:
+    """Inserción y actualización con las APIs *_many."""
+    tracker = _open_warm_tracker(work_dir / "bulk", paths)
+    
+    start = time.perf_counter()
+    ids = tracker.add_conversions_many(
+        {"pdf_path": path, "status": "pending", "pages": 1} for path in paths
+    )
+    insert_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    tracker.update_conversions_many(
+        (conversion_id, {"status": "success", "confidence_score": 90})
+        for conversion_id in ids
+    )
+    update_time = time.perf_counter() - start
+    
+    tracker.close()
+    return {"insert": insert_time, "update": update_time}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de registro masivo del tracker")
+    parser.add_argument("--files", type=int, default=5000, help="PDFs sintéticos (default: 5000)")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("📊 BENCHMARK REGISTRO MASIVO - ConversionTracker")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        paths = _make_files(work_dir, args.files)
+        
+        for label, bench in [("fila a fila", bench_rows), ("*_many", bench_bulk)]:
+            result = bench(paths, work_dir)
+            print(f"  {label:<12} insert {args.files / result['insert']:>9.0f} filas/s | "
+                  f"update {args.files / result['update']:>9.0f} filas/s")
+    
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+bench_tracker_queries.py
+Plan de consultas y latencia de las consultas del tracker y del dashboard
+
+Siembra una base sintética de N conversiones (100k por defecto), ejecuta
+las consultas de conversion_db.py y de tools/dashboard.py capturando el
+SQL real con set_trace_callback(), y para cada consulta muestra el
+EXPLAIN QUERY PLAN y el tiempo de ejecución.
+
+Con --legacy-indexes se reemplazan los índices actuales por los del
+esquema v1 (pdf_hash, status, created_at) para comparar.
+
+Uso:
+    python scripts/benchmarks/bench_tracker_queries.py
+    python scripts/benchmarks/bench_tracker_queries.py --rows 1000000
+    python scripts/benchmarks/bench_tracker_queries.py --legacy-indexes
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "conversion"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools"))
+
+from conversion_db import ConversionTracker, _BACKFILL_METRICS_SQL
+
+try:
+    from dashboard import ConversionDashboard
+except (ImportError, SystemExit):
+    # dashboard.py termina el proceso si falta rich
+    ConversionDashboard = None
+
+# El tracker registra cada consulta; silenciarlo para no medir el logging
+logging.getLogger("conversion_db").setLevel(logging.CRITICAL)
+
+STATUSES = ["success"] * 70 + ["completed"] * 15 + ["failed"] * 10 + ["processing"] * 5
+
+# Índices del esquema v1 (--legacy-indexes)
+LEGACY_INDEXES = {
+    "idx_pdf_hash": "conversions(pdf_hash)",
+    "idx_status": "conversions(status)",
+    "idx_created_at": "conversions(created_at)",
+    "idx_size_partial": "conversions(pdf_size_bytes, partial_hash)",
+}
+
+
+def seed(tracker: ConversionTracker, rows: int, chunk: int = 50000):
+    """Inserta `rows` conversiones sintéticas con executemany."""
+    rng = random.Random(42)
+    start_date = datetime(2024, 1, 1)
+    
+    def generate(offset: int, count: int):
+        for i in range(offset, offset + count):
+            created = start_date + timedelta(seconds=rng.randrange(60 * 60 * 24 * 600))
+            updated = created + timedelta(seconds=rng.randrange(3600))
+            scanned = rng.random() < 0.2
+            size = rng.randrange(50_000, 50_000_000)
+            yield (
+                f"doc_{i:07d}.pdf", f"/data/pdfs/doc_{i:07d}.pdf",
+                hashlib.sha256(str(i).encode()).hexdigest(), size,
+                hashlib.blake2b(str(i).encode(), digest_size=16).hexdigest(),
+                rng.choice(STATUSES), created.isoformat(), updated.isoformat(),
+                f"/data/md/doc_{i:07d}.md", rng.randrange(1, 400),
+                rng.random() < 0.3, rng.random() < 0.1, scanned, "es",
+                rng.uniform(0.5, 120.0), rng.randrange(40, 100),
+                json.dumps({
+                    "strategy": "pdfplumber",
+                    "tables_extracted": rng.randrange(0, 20),
+                    "headings_detected": rng.randrange(0, 60),
+                    "detection": {"native_ratio": round(rng.random(), 3)}
+                }),
+                "scanned" if scanned else "native",
+                rng.choice([None, "academic_apa", "universidad_de_chile_thesis"]),
+                rng.uniform(60.0, 100.0)
+            )
+    
+    sql = """
+        INSERT INTO conversions (
+            pdf_filename, pdf_path, pdf_hash, pdf_size_bytes, partial_hash,
+            status, created_at, updated_at, markdown_path, pages,
+            has_tables, has_equations, is_scanned, language,
+            conversion_time_seconds, confidence_score, notes, pdf_type,
+            profile_used, fidelity_score
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    for offset in range(0, rows, chunk):
+        with tracker.transaction():
+            tracker.conn.executemany(sql, generate(offset, min(chunk, rows - offset)))
+    
+    # Métricas estructuradas: el mismo backfill que la migración v3
+    with tracker.transaction():
+        tracker.conn.execute(_BACKFILL_METRICS_SQL)
+
+
+def use_legacy_indexes(conn: sqlite3.Connection):
+    """Reemplaza los índices actuales de conversions por los del esquema v1."""
+    current = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' "
+        "AND tbl_name = 'conversions' AND sql IS NOT NULL"
+    )]
+    for name in current:
+        conn.execute(f"DROP INDEX {name}")
+    for name, target in LEGACY_INDEXES.items():
+        conn.execute(f"CREATE INDEX {name} ON {target}")
+    conn.commit()
+
+
+def open_dashboard(tracker: ConversionTracker, metadata_dir: str):
+    """
+    Dashboard que reutiliza `tracker`. Se crea antes de tocar los índices:
+    su propio ConversionTracker volvería a crear los índices actuales.
+    """
+    if ConversionDashboard is None:
+        return None
+    dashboard = ConversionDashboard(metadata_dir)
+    dashboard.tracker.close()
+    dashboard.tracker = tracker
+    return dashboard
+
+
+def capture_queries(tracker: ConversionTracker, dashboard, metadata_dir: str) -> list:
+    """Ejecuta las consultas del tracker y del dashboard y devuelve su SQL."""
+    conn = tracker.conn
+    sample = conn.execute("SELECT id, pdf_hash FROM conversions WHERE id = 1").fetchone()
+    probe = Path(metadata_dir) / "probe.pdf"
+    probe.write_bytes(b"%PDF-1.4\n" + bytes(1024))
+    
+    captured = []
+    conn.set_trace_callback(captured.append)
+    
+    tracker.get_conversion(sample['id'])
+    tracker.get_conversions_by_status("failed")
+    tracker.get_statistics()
+    tracker.is_duplicate(probe)
+    tracker._ids_by_hash([sample['pdf_hash']])
+    tracker.get_page_map(sample['pdf_hash'])
+    tracker.get_metrics(sample['id'])
+    tracker.get_metric_stats("tables_extracted")
+    tracker.get_metric_stats("detection.native_ratio", status="failed")
+    
+    if dashboard is not None:
+        dashboard._get_all_conversions(20)
+        dashboard._get_all_conversions_with_duplicates(50)
+        dashboard._find_duplicates()
+        dashboard._get_profile_stats()
+        dashboard._get_conversion_by_id(sample['id'])
+    
+    conn.set_trace_callback(None)
+    
+    queries = []
+    for sql in captured:
+        sql = sql.strip()
+        if sql.upper().startswith("SELECT") and sql not in queries:
+            queries.append(sql)
+    return queries
+
+
+def time_notes_json(conn: sqlite3.Connection, key: str) -> float:
+    """Tiempo (ms) de promediar una métrica leyendo notes con json.loads."""
+    start = time.perf_counter()
+    values = [json.loads(row[0]).get(key, 0) for row in conn.execute("SELECT notes FROM conversions")
+              if row[0] and row[0].startswith("{")]
+    sum(values) / max(len(values), 1)
+    return (time.perf_counter() - start) * 1000
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> list:
+    """Detalle de EXPLAIN QUERY PLAN (una línea por paso)."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def time_query(conn: sqlite3.Connection, sql: str, repeat: int) -> float:
+    """Mejor tiempo (ms) de `repeat` ejecuciones."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql).fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan de consultas del tracker y del dashboard")
+    parser.add_argument("--rows", type=int, default=100000, help="Conversiones sintéticas (default: 100000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por consulta (default: 3)")
+    parser.add_argument("--legacy-indexes", action="store_true",
+                        help="Usar los índices del esquema v1 para comparar")
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("📊 BENCHMARK CONSULTAS - ConversionTracker + Dashboard")
+    print("=" * 70)
+    
+    with tempfile.TemporaryDirectory() as metadata_dir:
+        tracker = ConversionTracker(metadata_dir)
+        dashboard = open_dashboard(tracker, metadata_dir)
+        
+        start = time.perf_counter()
+        seed(tracker, args.rows)
+        if args.legacy_indexes:
+            use_legacy_indexes(tracker.conn)
+        tracker.conn.execute("ANALYZE")
+        print(f"Filas: {args.rows} (sembradas en {time.perf_counter() - start:.1f}s) | "
+              f"Índices: {'v1' if args.legacy_indexes else 'actuales'}")
+        if dashboard is None:
+            print("⚠️  rich no instalado: se omiten las consultas del dashboard")
+        
+        total = 0.0
+        for sql in capture_queries(tracker, dashboard, metadata_dir):
+            elapsed = time_query(tracker.conn, sql, args.repeat)
+            total += elapsed
+            print("-" * 70)
+            print(" ".join(sql.split())[:200])
+            print(f"  ⏱️  {elapsed:.2f} ms")
+            for step in explain(tracker.conn, sql):
+                marker = "⚠️ " if step.startswith("SCAN") or "TEMP B-TREE" in step else "  "
+                print(f"  {marker}{step}")
+        
+        print("=" * 70)
+        print(f"Total: {total:.1f} ms")
+        print(f"Referencia: AVG(tables_extracted) con json.loads(notes) en Python: "
+              f"{time_notes_json(tracker.conn, 'tables_extracted'):.1f} ms")
+        tracker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+bench_tracker_writes.py
+Benchmark de escrituras concurrentes en ConversionTracker (filas/seg)
+
+Lanza N procesos escritores sobre la misma base SQLite y mide el
+throughput de add_error() + update_conversion() en tres modos:
+- por fila: cada escritura hace su propio commit
+- agrupado: las escrituras se agrupan con tracker.transaction()
+- write-behind: las escrituras se encolan y un hilo las aplica en lotes
+  (el tiempo incluye el flush() final)
+
+Con --legacy-pragmas se fuerza el modo anterior (journal DELETE,
+synchronous FULL, timeout por defecto de 5s) para comparar.
+
+Uso:
+    python scripts/benchmarks/bench_tracker_writes.py
+    python scripts/benchmarks/bench_tracker_writes.py --workers 8 --rows 2000
+    python scripts/benchmarks/bench_tracker_writes.py --legacy-pragmas
+"""
+
+import argparse
+import logging
+import multiprocessing as mp
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "conversion"))
+
+from conversion_db import ConversionTracker
+
+# El tracker registra cada escritura; silenciarlo para no medir el logging
+logging.getLogger("conversion_db").setLevel(logging.CRITICAL)
+
+
+class LegacyTracker(ConversionTracker):
+    """Tracker con la conexión anterior: journal DELETE y synchronous FULL."""
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path))
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.execute("PRAGMA synchronous = FULL")
+        return conn
+
+
+def _open_tracker(db_dir: str, legacy_pragmas: bool,
+                  write_behind: bool = False) -> ConversionTracker:
+    """Abre un tracker con la configuración actual o la anterior."""
+    tracker_cls = LegacyTracker if legacy_pragmas else ConversionTracker
+    return tracker_cls(db_dir, write_behind=write_behind)
+
+
+def _writer(args) -> dict:
+    """Proceso escritor: registra un PDF propio y escribe `rows` filas."""
+    db_dir, worker_id, rows, batch_size, legacy_pragmas, write_behind = args
+    
+    pdf_path = Path(db_dir) / f"worker_{worker_id}.pdf"
+    pdf_path.write_bytes(os.urandom(4096))
+    
+    tracker = _open_tracker(db_dir, legacy_pragmas, write_behind)
+    conversion_id = tracker.add_conversion(pdf_path, status="processing")
+    
+    errors = 0
+    written = 0
+    start = time.perf_counter()
+    
+    for offset in range(0, rows, batch_size):
+        count = min(batch_size, rows - offset)
+        try:
+            if batch_size > 1:
+                with tracker.transaction():
+                    for i in range(count):
+                        _write_row(tracker, conversion_id, offset + i)
+            else:
+                _write_row(tracker, conversion_id, offset)
+            written += count
+        except sqlite3.OperationalError:
+            # "database is locked" con los pragmas anteriores
+            errors += 1
+    
+    tracker.flush()
+    elapsed = time.perf_counter() - start
+    tracker.close()
+    return {"written": written, "errors": errors, "elapsed": elapsed}
+
+
+def _write_row(tracker: ConversionTracker, conversion_id: int, index: int):
+    """Una 'fila' del benchmark: un error + una actualización de estado."""
+    tracker.add_error(conversion_id, "bench", f"fila {index}", step="benchmark")
+    tracker.update_conversion(conversion_id, status="processing", pages=index)
+
+
+def run(workers: int, rows: int, batch_size: int, legacy_pragmas: bool,
+        write_behind: bool = False) -> dict:
+    """Ejecuta un escenario y devuelve filas/seg agregadas."""
+    with tempfile.TemporaryDirectory() as db_dir:
+        # Crear esquema antes de lanzar los escritores
+        _open_tracker(db_dir, legacy_pragmas).close()
+        
+        jobs = [(db_dir, w, rows, batch_size, legacy_pragmas, write_behind)
+                for w in range(workers)]
+        start = time.perf_counter()
+        with mp.Pool(workers) as pool:
+            results = pool.map(_writer, jobs)
+        wall = time.perf_counter() - start
+    
+    written = sum(r["written"] for r in results)
+    return {
+        "written": written,
+        "errors": sum(r["errors"] for r in results),
+        "wall": wall,
+        "rows_per_sec": written / wall if wall else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de escrituras concurrentes del tracker")
+    parser.add_argument("--workers", type=int, default=4, help="Procesos escritores (default: 4)")
+    parser.add_argument("--rows", type=int, default=500, help="Filas por escritor (default: 500)")
+    parser.add_argument("--batch", type=int, default=100, help="Filas por transacción en modo agrupado")
+    parser.add_argument("--legacy-pragmas", action="store_true",
+                        help="Usar journal DELETE + synchronous FULL (comportamiento anterior)")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("📊 BENCHMARK ESCRITURAS CONCURRENTES - ConversionTracker")
+    print("=" * 60)
+    print(f"Escritores: {args.workers} | Filas/escritor: {args.rows} | "
+          f"Pragmas: {'legacy' if args.legacy_pragmas else 'WAL + NORMAL'}")
+    
+    scenarios = [
+        ("por fila", 1, False),
+        (f"agrupado x{args.batch}", args.batch, False),
+        ("write-behind", 1, True)
+    ]
+    for label, batch, write_behind in scenarios:
+        result = run(args.workers, args.rows, batch, args.legacy_pragmas, write_behind)
+        print(f"  {label:<16} {result['rows_per_sec']:>10.0f} filas/s "
+              f"({result['written']} filas en {result['wall']:.2f}s, "
+              f"{result['errors']} errores de lock)")
+    
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -32,9 +32,10 @@ import statistics
 script_dir = Path(__file__).parent
 sys.path.insert(0, str(script_dir))
 
-from pdf_type_detector import PDFTypeDetector, PDFType
+from pdf_type_detector import PDFTypeDetector, PDFType, PageMap
 from conversion_db import ConversionTracker
-from markdown_normalizer import MarkdownNormalizer, normalize_markdown_file
+from near_duplicates import NearDuplicateDetector
+from markdown_normalizer import get_normalizer, SECTIONS_SUFFIX
 from conversion_profiles import ProfileManager, ConversionProfile
 from profile_detector import ProfileDetector
 
@@ -206,7 +207,10 @@ class AdaptivePDFConverter:
         ollama_model: str = "gemma3:12b",
         force_strategy: Optional[str] = None,
         normalize: bool = True,
-        profile: Optional[str] = None
+        profile: Optional[str] = None,
+        write_behind: bool = False,
+        near_duplicates: str = "link",
+        section_tree: bool = False
     ):
         """
         Inicializa el convertidor.
@@ -219,6 +223,11 @@ class AdaptivePDFConverter:
             force_strategy: Forzar estrategia ("native", "scanned", "mixed")
             normalize: Activar post-procesamiento de normalización (default: True)
             profile: Nombre del perfil de conversión a usar (ej: "academic_apa", "universidad_de_chile_thesis")
+            write_behind: Escrituras del tracker en segundo plano (lotes de PDFs pequeños)
+            near_duplicates: Casi-duplicados por MinHash: "link" (marcar y convertir),
+                "skip" (no convertir) u "off"
+            section_tree: Guardar el árbol de secciones del markdown normalizado
+                (<stem>_sections.json junto al .md) para chunking y etiquetado
         """
         project_root = Path(__file__).parent.parent.parent
         
@@ -261,7 +270,13 @@ class AdaptivePDFConverter:
             dir_path.mkdir(parents=True, exist_ok=True)
         
         # Inicializar tracker
-        self.tracker = ConversionTracker(str(self.metadata_dir))
+        self.tracker = ConversionTracker(str(self.metadata_dir), write_behind=write_behind)
+        
+        # Detector de casi-duplicados (firma MinHash de las primeras páginas)
+        if near_duplicates not in ("link", "skip", "off"):
+            raise ValueError(f"Modo de casi-duplicados desconocido: {near_duplicates}")
+        self.near_duplicates = near_duplicates
+        self.near_detector = NearDuplicateDetector(self.tracker) if near_duplicates != "off" else None
         
         # Inicializar detector de tipo
         self.detector = PDFTypeDetector()
@@ -291,7 +306,8 @@ class AdaptivePDFConverter:
         
         # Post-procesamiento
         self.normalize = normalize
-        self.normalizer = MarkdownNormalizer() if normalize else None
+        self.normalizer = get_normalizer() if normalize else None
+        self.section_tree = section_tree
         
         if self.use_ollama:
             if not self._check_ollama():
@@ -328,6 +344,39 @@ class AdaptivePDFConverter:
         
         return dest_path
     
+    def _detect_type(
+        self,
+        pdf_path: Path,
+        pdf_hash: str,
+        quick_detect: bool
+    ) -> Tuple[PDFType, Dict]:
+        """
+        Detecta el tipo de PDF reutilizando el mapa por página persistido.
+        
+        Si el tracker ya tiene un PageMap para el hash del PDF (por ejemplo,
+        en una reconversión con --force) se clasifica desde ese mapa sin
+        releer páginas; si no, se detecta y se guarda el mapa completo.
+        """
+        cached_map = self.tracker.get_page_map(pdf_hash)
+        if cached_map:
+            try:
+                pdf_type, detection_stats = self.detector.classify_page_map(
+                    PageMap.from_bytes(cached_map)
+                )
+                logger.info("♻️  Tipo obtenido del mapa de páginas persistido")
+                return pdf_type, detection_stats
+            except ValueError as e:
+                logger.warning(f"⚠️  Mapa de páginas inválido, re-detectando: {e}")
+        
+        pdf_type, detection_stats = self.detector.detect(
+            pdf_path, quick=quick_detect, page_map=True
+        )
+        page_map = detection_stats.pop("page_map", None)
+        if page_map is not None:
+            self.tracker.save_page_map(pdf_hash, page_map)
+        
+        return pdf_type, detection_stats
+    
     def _convert_native(self, pdf_path: Path, conversion_id: int) -> Tuple[str, Dict]:
         """
         Convierte PDF nativo priorizando preservación de estructura.
@@ -344,6 +393,7 @@ class AdaptivePDFConverter:
         pdfplumber = _import_pdfplumber()
         
         markdown_blocks: list[str] = []
+        page_records: list[dict] = []
         metadata = {
             "converter": "pdfplumber_structured",
             "strategy": "native",
@@ -359,7 +409,9 @@ class AdaptivePDFConverter:
                 metadata["pages"] = len(pdf.pages)
                 
                 for page_number, page in enumerate(pdf.pages, start=1):
+                    page_start = time.perf_counter()
                     page_lines = [f"## Página {page_number}"]
+                    page_tables = 0
                     
                     structured_text, page_stats = self._render_page_with_structure(page)
                     metadata["headings_detected"] += page_stats.get("headings", 0)
@@ -377,6 +429,7 @@ class AdaptivePDFConverter:
                             if not table_md:
                                 continue
                             metadata["tables_extracted"] += 1
+                            page_tables += 1
                             page_lines.append("")
                             page_lines.append(table_md)
                     
@@ -386,8 +439,19 @@ class AdaptivePDFConverter:
                     
                     if page_block:
                         markdown_blocks.append(page_block)
+                    
+                    page_records.append({
+                        "page_number": page_number,
+                        "strategy": metadata["strategy"],
+                        "char_count": len(page.chars),
+                        "word_count": len(structured_text.split()) if structured_text else 0,
+                        "table_count": page_tables,
+                        "render_seconds": time.perf_counter() - page_start,
+                        "output_bytes": len(page_block.encode("utf-8"))
+                    })
                 
                 markdown = self._join_with_page_separators(markdown_blocks)
+                self.tracker.add_page_records(conversion_id, page_records)
                 
                 logger.info(
                     "✅ [NATIVE] Estructura preservada | "
@@ -854,6 +918,30 @@ class AdaptivePDFConverter:
                 "markdown_path": existing_conversion.get("markdown_path")
             }
         
+        # 2.5 Verificar casi-duplicados (mismo texto, distinto archivo)
+        signature, near_matches = None, []
+        if self.near_detector is not None:
+            signature, near_matches = self.near_detector.check(pdf_path, exclude_id=existing_id)
+            if near_matches:
+                near_id, similarity = near_matches[0]
+                logger.info(f"🔁 Casi-duplicado de ID {near_id} (similitud {similarity:.0%})")
+                if self.near_duplicates == "skip" and not force:
+                    near_conversion = self.tracker.get_conversion(near_id)
+                    if near_conversion is None:
+                        # Firma de una conversión borrada: se ignora y se convierte
+                        logger.warning(f"⚠️  La conversión {near_id} ya no existe, se convierte igual")
+                        near_matches = near_matches[1:]
+                    else:
+                        logger.info("⏩ Conversión omitida (--near-duplicates skip), use --force para convertir")
+                        return {
+                            "success": True,
+                            "duplicate": True,
+                            "near_duplicate": True,
+                            "similarity": similarity,
+                            "conversion_id": near_id,
+                            "markdown_path": near_conversion.get("markdown_path")
+                        }
+        
         # 3. Detección automática de perfil (si no se especificó uno)
         profile_detection_info = {}
         if not self.profile and not self.active_profile:
@@ -870,13 +958,24 @@ class AdaptivePDFConverter:
             status="processing"
         )
         
+        if signature is not None:
+            self.near_detector.register(conversion_id, signature)
+            # En una reconversión también se limpia un enlace anterior
+            if near_matches or existing_id is not None:
+                self.tracker.update_conversion(
+                    conversion_id,
+                    near_duplicate_of=near_matches[0][0] if near_matches else None
+                )
+        
         try:
             # 5. Detectar tipo de PDF
             if self.force_strategy:
                 pdf_type = PDFType(self.force_strategy)
                 detection_stats = {"forced": True}
             else:
-                pdf_type, detection_stats = self.detector.detect(pdf_path, quick=quick_detect)
+                pdf_type, detection_stats = self._detect_type(
+                    pdf_path, self.tracker.file_hash(pdf_path), quick_detect
+                )
             
             logger.info(f"📊 Tipo: {pdf_type.value.upper()}")
             
@@ -902,18 +1001,33 @@ class AdaptivePDFConverter:
             if self.normalize and self.normalizer:
                 logger.info("🔄 Aplicando post-procesamiento de normalización...")
                 try:
-                    norm_result = self.normalizer.normalize(markdown)
+                    # Normalizador compilado para el perfil activo (o auto-detectado),
+                    # propio de este hilo: guarda el estado del documento en curso
+                    normalizer = get_normalizer(
+                        self.active_profile.normalization if self.active_profile else None
+                    )
+                    norm_result = normalizer.normalize(markdown, section_tree=self.section_tree)
                     
-                    # Guardar markdown normalizado
+                    # Guardar markdown normalizado ('\n': offsets del árbol de secciones)
                     normalized_md = norm_result['markdown']
-                    md_path.write_text(normalized_md, encoding="utf-8")
+                    with open(md_path, 'w', encoding='utf-8', newline='\n') as f:
+                        f.write(normalized_md)
+                    
+                    if self.section_tree:
+                        sections_path = md_path.parent / f"{md_path.stem}{SECTIONS_SUFFIX}"
+                        with open(sections_path, 'w', encoding='utf-8') as f:
+                            json.dump({"markdown": md_path.name, **norm_result['sections']}, f,
+                                      ensure_ascii=False, separators=(',', ':'))
+                        logger.info(f"🌳 Árbol de secciones: {sections_path}")
                     
                     # Guardar reporte de normalización
                     norm_report_path = self.reports_dir / f"{pdf_path.stem}_normalization.json"
                     with open(norm_report_path, 'w', encoding='utf-8') as f:
                         json.dump({
                             "validation": norm_result['validation'],
-                            "changes_count": len(norm_result['changes']),
+                            "changes_count": norm_result['changes_count'],
+                            "changes_by_type": norm_result['changes_by_type'],
+                            "boilerplate": norm_result['boilerplate'],
                             "changes": norm_result['changes'][:20]
                         }, f, indent=2, ensure_ascii=False)
                     
@@ -936,6 +1050,11 @@ class AdaptivePDFConverter:
             
             # 8. Actualizar DB
             elapsed = time.time() - start_time
+            metrics = {
+                **conv_metadata,
+                "detection": detection_stats,
+                "hardware": str(self.hardware)
+            }
             
             self.tracker.update_conversion(
                 conversion_id=conversion_id,
@@ -947,12 +1066,9 @@ class AdaptivePDFConverter:
                 pdf_type=pdf_type.value,
                 profile_used=self.profile,
                 fidelity_score=normalization_report.get("fidelity_score") if normalization_report else None,
-                notes=json.dumps({
-                    **conv_metadata,
-                    "detection": detection_stats,
-                    "hardware": str(self.hardware)
-                })
+                notes=json.dumps(metrics)
             )
+            self.tracker.record_metrics(conversion_id, metrics)
             
             logger.info(f"✅ CONVERSIÓN COMPLETA en {elapsed:.1f}s")
             logger.info(f"{'='*60}\n")
@@ -1054,6 +1170,12 @@ if __name__ == "__main__":
                        help="Listar perfiles disponibles y salir")
     parser.add_argument("--create-profile", type=str, metavar="UNIVERSITY_NAME",
                        help="Crear perfil personalizado para una universidad")
+    parser.add_argument("--write-behind", action="store_true",
+                       help="Escribir el tracking en segundo plano (se vacía al terminar)")
+    parser.add_argument("--near-duplicates", choices=["link", "skip", "off"], default="link",
+                       help="Casi-duplicados: marcar y convertir (link), omitir (skip) o no buscar (off)")
+    parser.add_argument("--sections", action="store_true",
+                       help="Guardar el árbol de secciones (<stem>_sections.json) junto al markdown")
     
     args = parser.parse_args()
     
@@ -1111,7 +1233,10 @@ if __name__ == "__main__":
         use_ollama=args.ollama,
         force_strategy=args.strategy,
         normalize=not args.no_normalize,
-        profile=args.profile
+        profile=args.profile,
+        write_behind=args.write_behind,
+        near_duplicates=args.near_duplicates,
+        section_tree=args.sections
     )
     
     result = converter.convert_single(
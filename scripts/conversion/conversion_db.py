@@ -3,37 +3,553 @@
 conversion_db.py
 Sistema de base de datos SQLite para tracking de conversiones PDF→Markdown
 """
+import os
 import sqlite3
+import threading
 import hashlib
 import json
+import atexit
+import functools
+import inspect
+import queue
+import weakref
+from collections import Counter
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Buffer de lectura para hashing (1 MiB: pocas syscalls en PDFs grandes)
+HASH_BUFFER_SIZE = 1024 * 1024
+
+# Prefiltro de duplicados: bytes leídos del inicio y del final del archivo
+PARTIAL_HASH_BYTES = 64 * 1024
+
+# Versión del esquema (PRAGMA user_version) para migrar bases existentes
+SCHEMA_VERSION = 7
+
+# Espera máxima ante bloqueos de otros procesos (workers, dashboard)
+BUSY_TIMEOUT_MS = 30000
+
+# Modo write-behind: escrituras aplicadas por transacción del hilo escritor
+WRITE_BEHIND_BATCH_SIZE = 256
+
+# Mantenimiento: base de archivo y antigüedad de los errores que se archivan
+ARCHIVE_DB_NAME = "conversion_archive.db"
+ARCHIVE_AFTER_DAYS = 90
+
+# Filas que archive_rows() mueve a la base de archivo (alias t, parámetro :cutoff)
+# - conversion_errors: anteriores al corte, o de conversiones que luego terminaron bien
+# - validation_reports: superados por un reporte más nuevo de la misma conversión
+ARCHIVE_CRITERIA: Dict[str, str] = {
+    "conversion_errors": """
+        t.created_at < :cutoff
+        OR EXISTS (
+            SELECT 1 FROM main.conversions c
+            WHERE c.id = t.conversion_id
+              AND c.status IN ('success', 'completed')
+              AND c.updated_at >= t.created_at
+        )
+    """,
+    "validation_reports": """
+        t.id NOT IN (
+            SELECT MAX(id) FROM main.validation_reports GROUP BY conversion_id
+        )
+    """,
+}
+
+# Campos opcionales de add_conversion() y su valor por defecto
+CONVERSION_INSERT_FIELDS: Tuple[Tuple[str, object], ...] = (
+    ("pages", 0),
+    ("has_tables", False),
+    ("has_equations", False),
+    ("is_scanned", False),
+    ("language", "unknown"),
+    ("notes", ""),
+    ("pdf_type", "unknown"),
+    ("profile_used", None),
+    ("fidelity_score", None),
+)
+
+# Columnas que update_conversion() acepta (los nombres se interpolan en el SQL)
+CONVERSION_UPDATE_COLUMNS = frozenset({
+    "pdf_filename", "pdf_path", "pdf_size_bytes", "partial_hash", "status",
+    "markdown_path", "pages", "has_tables", "has_equations", "is_scanned",
+    "language", "conversion_time_seconds", "confidence_score", "notes",
+    "pdf_type", "profile_used", "fidelity_score", "near_duplicate_of",
+})
+
+# Memoización del SHA-256 por (ruta, inode, tamaño, mtime_ns)
+_MEMOIZE_HASH_SQL = """
+    INSERT OR REPLACE INTO file_hashes (
+        path, inode, size, mtime_ns, sha256, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+_INSERT_CONVERSION_SQL = f"""
+    INSERT INTO conversions (
+        pdf_filename, pdf_path, pdf_hash, pdf_size_bytes, partial_hash,
+        status, created_at, updated_at,
+        {", ".join(name for name, _ in CONVERSION_INSERT_FIELDS)}
+    ) VALUES ({", ".join("?" * (8 + len(CONVERSION_INSERT_FIELDS)))})
+"""
+
+# Backfill de conversion_metrics desde notes (JSON1): mismas claves que
+# _flatten_metrics() (objetos anidados con '.', sin elementos de listas).
+# fullkey es '$.a."b_c"': se quita '$.' y las comillas de las claves
+_BACKFILL_METRICS_SQL = """
+    INSERT OR REPLACE INTO conversion_metrics (conversion_id, key, value_num, value_text)
+    SELECT c.id, replace(substr(t.fullkey, 3), '"', ''),
+           CASE t.type WHEN 'integer' THEN t.value WHEN 'real' THEN t.value
+                       WHEN 'true' THEN 1 WHEN 'false' THEN 0 END,
+           CASE t.type WHEN 'text' THEN t.value END
+    FROM conversions c, json_tree(c.notes) t
+    WHERE json_valid(c.notes)
+      AND t.type IN ('integer', 'real', 'true', 'false', 'text')
+      AND t.fullkey NOT LIKE '%[%'
+"""
+
+# Resumen por estado mantenido por triggers (get_statistics en O(1)).
+# Expresiones sobre una fila de conversions; {row} es NEW u OLD
+_STATS_COLUMNS = (
+    ("count", "1"),
+    ("confidence_sum", "IFNULL({row}.confidence_score, 0)"),
+    ("confidence_count", "({row}.confidence_score IS NOT NULL)"),
+    ("pages", "IFNULL({row}.pages, 0)"),
+    ("size_bytes", "IFNULL({row}.pdf_size_bytes, 0)"),
+    ("with_tables", "({row}.has_tables = 1)"),
+    ("with_equations", "({row}.has_equations = 1)"),
+    ("scanned", "({row}.is_scanned = 1)"),
+)
+
+# Columnas de conversions que afectan al resumen
+_STATS_SOURCE_COLUMNS = (
+    "status, confidence_score, pages, pdf_size_bytes, "
+    "has_tables, has_equations, is_scanned"
+)
+
+
+def _stats_add_sql(row: str) -> str:
+    """Upsert que suma la fila `row` (NEW/OLD) al resumen de su estado."""
+    names = ", ".join(name for name, _ in _STATS_COLUMNS)
+    values = ", ".join(expr.format(row=row) for _, expr in _STATS_COLUMNS)
+    updates = ", ".join(f"{name} = {name} + excluded.{name}" for name, _ in _STATS_COLUMNS)
+    return (
+        f"INSERT INTO conversion_stats (status, {names}) VALUES ({row}.status, {values}) "
+        f"ON CONFLICT(status) DO UPDATE SET {updates};"
+    )
+
+
+def _stats_subtract_sql(row: str) -> str:
+    """UPDATE que resta la fila `row` (NEW/OLD) del resumen de su estado."""
+    updates = ", ".join(
+        f"{name} = {name} - {expr.format(row=row)}" for name, expr in _STATS_COLUMNS
+    )
+    return f"UPDATE conversion_stats SET {updates} WHERE status = {row}.status;"
+
+
+# Campos por página de conversion_pages (además de conversion_id/page_number)
+PAGE_RECORD_FIELDS = (
+    "strategy", "char_count", "word_count", "table_count",
+    "render_seconds", "output_bytes",
+)
+
+# Filas por executemany al registrar páginas
+PAGE_RECORD_BATCH_SIZE = 500
+
+# Límite de parámetros por consulta IN (...) (SQLITE_MAX_VARIABLE_NUMBER antiguo)
+SQL_IN_CHUNK = 500
+
+
+def _flatten_metrics(metrics: Dict, prefix: str = "") -> Iterator[Tuple[str, Optional[float], Optional[str]]]:
+    """
+    Aplana un dict de métricas a filas (clave, value_num, value_text).
+    
+    Los dicts anidados se unen con '.' ("detection.native_ratio"); los
+    booleanos se guardan como 0/1; listas y None se omiten.
+    """
+    for key, value in metrics.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten_metrics(value, f"{name}.")
+        elif isinstance(value, (bool, int, float)):
+            yield name, float(value), None
+        elif isinstance(value, str):
+            yield name, None, value
+
+
+@functools.lru_cache(maxsize=128)
+def _update_conversion_sql(columns: Tuple[str, ...]) -> str:
+    """
+    SQL de UPDATE para un conjunto de columnas (cacheado: el mismo string
+    reutiliza la sentencia preparada en la caché de sqlite3).
+    
+    Raises:
+        ValueError: Si alguna columna no está en CONVERSION_UPDATE_COLUMNS
+    """
+    invalid = [c for c in columns if c not in CONVERSION_UPDATE_COLUMNS]
+    if invalid:
+        raise ValueError(f"Columnas no actualizables en conversions: {', '.join(invalid)}")
+    assignments = ", ".join(f"{c} = ?" for c in ("updated_at",) + columns)
+    return f"UPDATE conversions SET {assignments} WHERE id = ?"
+
+
+def _deferred(method=None, *, keys, validate=None):
+    """
+    Marca una escritura que en modo write-behind se encola en vez de
+    ejecutarse. Dentro de transaction() o en el hilo escritor se ejecuta
+    directamente.
+    
+    Antes de encolar se comprueban los argumentos en el hilo que llama
+    (firma del método y, si se indica, `validate` con los mismos
+    argumentos), para que el error no aparezca después en el escritor.
+    
+    Args:
+        keys: Función con los mismos argumentos que devuelve las claves de
+            datos que modifica la escritura (ver _flushed)
+    """
+    if method is None:
+        return functools.partial(_deferred, keys=keys, validate=validate)
+    signature = inspect.signature(method)
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._write_behind and not self._in_writer() and self._tx_depth == 0:
+            signature.bind(self, *args, **kwargs)
+            if validate is not None:
+                validate(self, *args, **kwargs)
+            self._enqueue(method, args, kwargs, tuple(keys(self, *args, **kwargs)))
+            return None
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _validate_update_conversion(self, conversion_id: int, status: Optional[str] = None, **kwargs):
+    """Comprueba las columnas de update_conversion() (ValueError si no son válidas)."""
+    _update_conversion_sql(tuple({"status": status, **kwargs} if status else kwargs))
+
+
+def _close_at_exit(tracker_ref: "weakref.ref"):
+    """Cierra el tracker al terminar el proceso si todavía existe."""
+    tracker = tracker_ref()
+    if tracker is not None:
+        tracker.close()
+
+
+def _flushed(method=None, *, keys=None):
+    """
+    Marca una operación síncrona (lecturas, inserciones que devuelven ID):
+    en modo write-behind primero espera lo ya encolado que pueda leer.
+    
+    Sin `keys` vacía toda la cola. Con `keys` (función con los mismos
+    argumentos que devuelve claves de datos) solo la vacía si hay
+    escrituras pendientes sobre alguna de esas claves, así las lecturas
+    del flujo de conversión no bloquean al llamador en cada documento.
+    
+    Claves de datos:
+        "conversions"               Cualquier fila de conversions
+        ("conversion", id)          Una fila (None: filas no identificadas)
+        "duplicate_keys"            Columnas de detección de duplicados
+        ("page_map", pdf_hash)      Mapa de páginas de un PDF
+        Nombre de tabla             El resto de tablas (conversion_errors, ...)
+    """
+    if method is None:
+        return functools.partial(_flushed, keys=keys)
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._write_behind and not self._in_writer():
+            if keys is None:
+                self.flush()
+            else:
+                self._flush_pending(keys(self, *args, **kwargs))
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+# Columnas de conversions que usan is_duplicate() y add_conversion()
+_DUPLICATE_KEY_COLUMNS = frozenset({"pdf_size_bytes", "partial_hash"})
+
+
+def _update_conversion_keys(self, conversion_id: int, status: Optional[str] = None, **kwargs):
+    """Claves de datos que modifica update_conversion()."""
+    keys = ["conversions", ("conversion", conversion_id)]
+    if _DUPLICATE_KEY_COLUMNS.intersection(kwargs):
+        keys.append("duplicate_keys")
+    return keys
+
+
+def _conversion_row_keys(self, conversion_id: int, *args, **kwargs):
+    """Claves de lectura de una fila de conversions."""
+    return (("conversion", conversion_id), ("conversion", None))
+
+
+def _table_keys(table: str):
+    """Función de claves para escrituras que solo modifican `table`."""
+    return lambda self, *args, **kwargs: (table,)
+
 
 class ConversionTracker:
     """Gestiona el tracking de conversiones PDF en base de datos SQLite."""
     
-    def __init__(self, db_dir: str = "sources/metadata"):
+    def __init__(self, db_dir: str = "sources/metadata", write_behind: bool = False):
         """
         Inicializa tracker.
         
         Args:
             db_dir: Directorio donde se guardará conversion_tracker.db
+            write_behind: Encolar escrituras (estados, errores, reportes) y
+                aplicarlas en lotes desde un hilo escritor en segundo plano
         """
         db_dir_path = Path(db_dir)
         db_dir_path.mkdir(parents=True, exist_ok=True)
         self.db_path = db_dir_path / "conversion_tracker.db"
-        self.conn = None
+        # Una conexión por hilo (sqlite3 no comparte conexiones entre hilos)
+        self._local = threading.local()
+        self._conn_lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        # Conexiones heredadas por fork: se conservan sin usarlas ni cerrarlas
+        self._inherited: List[sqlite3.Connection] = []
+        self._pid = os.getpid()
+        # Write-behind: cola FIFO de escrituras y un único hilo escritor
+        self._write_behind = write_behind
+        self._write_queue: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._write_error: Optional[BaseException] = None
+        # Escrituras encoladas por clave de datos (ver _flushed)
+        self._pending: Counter = Counter()
+        self._pending_lock = threading.Lock()
+        # Hook de atexit con referencia débil: no mantiene vivo al tracker
+        self._close_at_exit = functools.partial(_close_at_exit, weakref.ref(self))
+        # Caché en memoria: ruta → (inode, tamaño, mtime_ns, sha256)
+        self._hash_cache: Dict[str, Tuple[int, int, int, str]] = {}
+        # Caché en memoria del hash parcial: ruta → (inode, tamaño, mtime_ns, hash)
+        self._partial_cache: Dict[str, Tuple[int, int, int, str]] = {}
         self._init_db()
     
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """
+        Conexión del hilo actual (se abre en el primer uso).
+        
+        Cada hilo obtiene su propia conexión y, tras un fork (pool de
+        procesos), el hijo descarta las del padre y abre las suyas.
+        """
+        if self._pid != os.getpid():
+            self._after_fork()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.tx_depth = 0
+            with self._conn_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def _after_fork(self):
+        """
+        Descarta las conexiones heredadas del proceso padre.
+        
+        No se cierran: cerrar en el hijo una conexión abierta en el padre
+        puede hacer checkpoint o liberar locks que pertenecen al padre. Se
+        mantienen referenciadas para que el recolector tampoco las cierre.
+        """
+        self._inherited.extend(self._connections)
+        self._local = threading.local()
+        self._conn_lock = threading.Lock()
+        self._connections = []
+        # Las escrituras pendientes del padre las aplica el padre
+        self._write_queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._write_error = None
+        self._pending = Counter()
+        self._pending_lock = threading.Lock()
+        self._pid = os.getpid()
+    
+    @property
+    def _tx_depth(self) -> int:
+        """Profundidad de transaction() anidadas en el hilo actual."""
+        return getattr(self._local, "tx_depth", 0)
+    
+    @_tx_depth.setter
+    def _tx_depth(self, value: int):
+        self._local.tx_depth = value
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Abre una conexión configurada para escritores concurrentes.
+        
+        - WAL: lectores (dashboard) no bloquean a escritores y viceversa
+        - busy_timeout: esperar el lock en vez de fallar con "database is locked"
+        - synchronous=NORMAL: en WAL solo hace fsync en checkpoints, sin
+          riesgo de corrupción (una caída puede perder el último commit)
+        """
+        conn = sqlite3.connect(
+            str(self.db_path),
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            # Cada hilo usa su conexión; close() puede cerrarlas desde otro hilo
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        # Solo surte efecto en una base nueva (antes de escribir el encabezado);
+        # las bases existentes lo adoptan con el primer compact()
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+    
+    def _commit(self):
+        """Confirma la escritura salvo que esté agrupada en transaction()."""
+        if self._tx_depth == 0:
+            self.conn.commit()
+    
+    @contextmanager
+    def transaction(self) -> Iterator["ConversionTracker"]:
+        """
+        Agrupa varias escrituras en una sola transacción (un solo commit).
+        
+        Las llamadas anidadas se unen a la transacción externa. Si ocurre
+        una excepción se revierte todo el grupo.
+        
+        Ejemplo:
+            >>> with tracker.transaction():
+            ...     tracker.update_conversion(conv_id, status="success")
+            ...     tracker.add_error(other_id, "timeout", "...")
+        """
+        if self._tx_depth == 0 and self._write_behind and not self._in_writer():
+            # Las escrituras del grupo van directo a la base: antes aplicar
+            # las encoladas para conservar el orden
+            self.flush()
+        if self._tx_depth == 0 and not self.conn.in_transaction:
+            # IMMEDIATE: tomar el lock de escritura al inicio evita
+            # SQLITE_BUSY al pasar de lectura a escritura en WAL
+            self.conn.execute("BEGIN IMMEDIATE")
+        self._tx_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self.conn.rollback()
+            raise
+        else:
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self.conn.commit()
+    
+    def _in_writer(self) -> bool:
+        """True si el hilo actual es el escritor en segundo plano."""
+        return threading.current_thread() is self._writer
+    
+    def _enqueue(self, method, args: tuple, kwargs: dict, keys: tuple):
+        """Encola una escritura y arranca el hilo escritor si hace falta."""
+        if self._pid != os.getpid():
+            self._after_fork()
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._writer_loop,
+                    name="ConversionTracker-writer",
+                    daemon=True
+                )
+                self._writer.start()
+                # Garantiza que la cola se vacíe al terminar el proceso
+                atexit.unregister(self._close_at_exit)
+                atexit.register(self._close_at_exit)
+        with self._pending_lock:
+            self._pending.update(keys)
+        self._write_queue.put((method, args, kwargs, keys))
+    
+    def _writer_loop(self):
+        """
+        Aplica la cola en orden FIFO, agrupando hasta WRITE_BEHIND_BATCH_SIZE
+        escrituras por transacción. Si un lote falla se revierte y se
+        reintenta escritura por escritura, para perder solo la que falla.
+        """
+        write_queue = self._write_queue
+        while True:
+            batch = [write_queue.get()]
+            while batch[-1] is not None and len(batch) < WRITE_BEHIND_BATCH_SIZE:
+                try:
+                    batch.append(write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stop = batch[-1] is None
+            ops = batch[:-1] if stop else batch
+            try:
+                self._apply_writes(ops)
+            finally:
+                with self._pending_lock:
+                    for op in ops:
+                        self._pending.subtract(op[3])
+                for _ in batch:
+                    write_queue.task_done()
+            if stop:
+                break
+        
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            with self._conn_lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            conn.close()
+    
+    def _apply_writes(self, ops: list):
+        """Ejecuta un lote de escrituras encoladas en una transacción."""
+        if not ops:
+            return
+        try:
+            with self.transaction():
+                for method, args, kwargs, _ in ops:
+                    method(self, *args, **kwargs)
+            return
+        except Exception as error:
+            if len(ops) == 1:
+                self._record_write_error(ops[0], error)
+                return
+        for op in ops:
+            try:
+                with self.transaction():
+                    op[0](self, *op[1], **op[2])
+            except Exception as error:
+                self._record_write_error(op, error)
+    
+    def _record_write_error(self, op, error: Exception):
+        """Guarda el primer error del escritor para propagarlo en flush()."""
+        logger.error(f"❌ Escritura diferida fallida ({op[0].__name__}): {error}")
+        if self._write_error is None:
+            self._write_error = error
+    
+    def _flush_pending(self, keys: Iterable):
+        """Vacía la cola solo si alguna escritura pendiente modifica `keys`."""
+        pending = self._pending
+        if any(pending[key] > 0 for key in keys):
+            self.flush()
+    
+    def flush(self):
+        """
+        Espera a que el hilo escritor aplique todas las escrituras encoladas.
+        
+        Raises:
+            La primera excepción ocurrida en el escritor desde el último flush()
+        """
+        if self._pid != os.getpid():
+            self._after_fork()
+        if self._writer is not None and not self._in_writer():
+            self._write_queue.join()
+        error, self._write_error = self._write_error, None
+        if error is not None:
+            raise error
+    
     def _init_db(self):
         """Inicializa la base de datos con tablas necesarias."""
-        self.conn = sqlite3.connect(str(self.db_path))
-        self.conn.row_factory = sqlite3.Row
         cursor = self.conn.cursor()
         
         # Tabla principal de conversiones
@@ -44,6 +560,7 @@ class ConversionTracker:
                 pdf_path TEXT NOT NULL,
                 pdf_hash TEXT NOT NULL UNIQUE,
                 pdf_size_bytes INTEGER,
+                partial_hash TEXT,
                 status TEXT NOT NULL,
                 created_at TEXT NOT NULL,
                 updated_at TEXT NOT NULL,
@@ -58,7 +575,8 @@ class ConversionTracker:
                 notes TEXT,
                 pdf_type TEXT DEFAULT 'unknown',
                 profile_used TEXT,
-                fidelity_score REAL
+                fidelity_score REAL,
+                near_duplicate_of INTEGER
             )
         """)
         
@@ -91,50 +609,373 @@ class ConversionTracker:
             )
         """)
         
+        # Tabla de mapas de clasificación por página (PageMap serializado)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS page_maps (
+                pdf_hash TEXT PRIMARY KEY,
+                page_count INTEGER NOT NULL,
+                pdf_type TEXT,
+                data BLOB NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        """)
+        
+        # Caché persistente de hashes (ruta + inode + tamaño + mtime)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                path TEXT PRIMARY KEY,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        
+        # Métricas estructuradas por conversión (clave/valor tipado)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS conversion_metrics (
+                conversion_id INTEGER NOT NULL,
+                key TEXT NOT NULL,
+                value_num REAL,
+                value_text TEXT,
+                PRIMARY KEY (conversion_id, key),
+                FOREIGN KEY (conversion_id) REFERENCES conversions(id)
+            ) WITHOUT ROWID
+        """)
+        
+        # Registro por página (tiempos y tamaños para encontrar páginas lentas)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS conversion_pages (
+                conversion_id INTEGER NOT NULL,
+                page_number INTEGER NOT NULL,
+                strategy TEXT,
+                char_count INTEGER,
+                word_count INTEGER,
+                table_count INTEGER,
+                render_seconds REAL,
+                output_bytes INTEGER,
+                PRIMARY KEY (conversion_id, page_number),
+                FOREIGN KEY (conversion_id) REFERENCES conversions(id)
+            ) WITHOUT ROWID
+        """)
+        
+        # Firmas MinHash de casi-duplicados (ver near_duplicates.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS document_signatures (
+                conversion_id INTEGER PRIMARY KEY,
+                num_perm INTEGER NOT NULL,
+                shingle_count INTEGER NOT NULL,
+                signature BLOB NOT NULL,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (conversion_id) REFERENCES conversions(id)
+            )
+        """)
+        # Índice LSH: (banda, bucket) → conversiones candidatas
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS signature_bands (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                conversion_id INTEGER NOT NULL,
+                PRIMARY KEY (band, bucket, conversion_id)
+            ) WITHOUT ROWID
+        """)
+        
+        # Resumen por estado para get_statistics (mantenido por triggers)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS conversion_stats (
+                status TEXT PRIMARY KEY,
+                count INTEGER NOT NULL DEFAULT 0,
+                confidence_sum REAL NOT NULL DEFAULT 0,
+                confidence_count INTEGER NOT NULL DEFAULT 0,
+                pages INTEGER NOT NULL DEFAULT 0,
+                size_bytes INTEGER NOT NULL DEFAULT 0,
+                with_tables INTEGER NOT NULL DEFAULT 0,
+                with_equations INTEGER NOT NULL DEFAULT 0,
+                scanned INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_stats_insert
+            AFTER INSERT ON conversions
+            BEGIN
+                {_stats_add_sql("NEW")}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_stats_update
+            AFTER UPDATE OF {_STATS_SOURCE_COLUMNS} ON conversions
+            BEGIN
+                {_stats_subtract_sql("OLD")}
+                {_stats_add_sql("NEW")}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_stats_delete
+            AFTER DELETE ON conversions
+            BEGIN
+                {_stats_subtract_sql("OLD")}
+            END
+        """)
+        # Borrar una conversión borra sus páginas (sin depender de PRAGMA foreign_keys)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_pages_delete
+            AFTER DELETE ON conversions
+            BEGIN
+                DELETE FROM conversion_pages WHERE conversion_id = OLD.id;
+            END
+        """)
+        
         # Índices para búsqueda rápida
+        # pdf_hash ya tiene el índice UNIQUE; este lo cubre para el GROUP BY
+        # del dashboard (duplicados) sin leer la tabla
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_pdf_hash 
-            ON conversions(pdf_hash)
+            CREATE INDEX IF NOT EXISTS idx_hash_covering 
+            ON conversions(pdf_hash, updated_at, pdf_filename)
         """)
+        # Filtro por estado + agregados por tipo (dashboard --stats)
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_status 
-            ON conversions(status)
+            CREATE INDEX IF NOT EXISTS idx_status_scanned 
+            ON conversions(status, is_scanned, confidence_score, conversion_time_seconds)
         """)
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_created_at 
             ON conversions(created_at)
         """)
+        # Conversiones recientes (ORDER BY updated_at DESC LIMIT n)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_updated_at 
+            ON conversions(updated_at)
+        """)
+        # Páginas más lentas del corpus (ORDER BY render_seconds DESC LIMIT n)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_pages_render 
+            ON conversion_pages(render_seconds)
+        """)
+        # Agregados por métrica (AVG/MIN/MAX de una clave)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_metrics_key 
+            ON conversion_metrics(key, value_num)
+        """)
+        
+        self._migrate_schema(cursor)
+        
+        # Prefiltro de duplicados: tamaño + hash parcial
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_size_partial 
+            ON conversions(pdf_size_bytes, partial_hash)
+        """)
         
         self.conn.commit()
         logger.info(f"Base de datos inicializada: {self.db_path}")
     
-    def _calculate_hash(self, pdf_path: Path) -> str:
-        """Calcula SHA-256 hash del PDF para detección de duplicados."""
+    def _migrate_schema(self, cursor: sqlite3.Cursor):
+        """Migra bases creadas con versiones anteriores del esquema."""
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        
+        columns = {row['name'] for row in cursor.execute("PRAGMA table_info(conversions)")}
+        
+        # v1: columna partial_hash para el prefiltro de duplicados
+        if 'partial_hash' not in columns:
+            cursor.execute("ALTER TABLE conversions ADD COLUMN partial_hash TEXT")
+        
+        # v2: índices redundantes reemplazados por idx_hash_covering
+        # (pdf_hash ya es UNIQUE) e idx_status_scanned (status es su prefijo)
+        if version < 2:
+            cursor.execute("DROP INDEX IF EXISTS idx_pdf_hash")
+            cursor.execute("DROP INDEX IF EXISTS idx_status")
+            # Estadísticas para que el planificador elija los índices nuevos
+            cursor.execute("ANALYZE conversions")
+        
+        # v3: métricas que antes solo estaban en el JSON de notes
+        if version < 3:
+            try:
+                cursor.execute(_BACKFILL_METRICS_SQL)
+                logger.info(f"Métricas migradas desde notes: {cursor.rowcount} valores")
+            except sqlite3.OperationalError as e:
+                # SQLite sin JSON1: las métricas nuevas se registran igual
+                logger.warning(f"⚠️  No se pudieron migrar métricas desde notes: {e}")
+        
+        # v4: resumen conversion_stats (las filas previas no pasaron por triggers)
+        if version < 4:
+            self._rebuild_statistics(cursor)
+        
+        # v5: enlace a la conversión de la que un PDF es casi-duplicado
+        if 'near_duplicate_of' not in columns:
+            cursor.execute("ALTER TABLE conversions ADD COLUMN near_duplicate_of INTEGER")
+        
+        # v6: páginas de conversiones borradas antes de trg_pages_delete
+        if version < 6:
+            cursor.execute("""
+                DELETE FROM conversion_pages
+                WHERE conversion_id NOT IN (SELECT id FROM conversions)
+            """)
+        
+        # v7: bandas LSH de 16x8 a 32x4 (las firmas guardadas siguen valiendo)
+        if version < 7:
+            self._rebuild_signature_bands(cursor)
+        
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        logger.info(f"Esquema migrado de v{version} a v{SCHEMA_VERSION}")
+    
+    @staticmethod
+    def _file_key(pdf_path: Path) -> Tuple[str, Tuple[int, int, int]]:
+        """Clave de caché de un archivo: (ruta absoluta, (inode, tamaño, mtime_ns))."""
+        path_key = str(Path(pdf_path).resolve())
+        stat = os.stat(path_key)
+        return path_key, (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    
+    def _cached_hash(self, path_key: str, file_key: Tuple[int, int, int]) -> Optional[str]:
+        """Busca el SHA-256 memoizado sin leer el archivo (memoria y file_hashes)."""
+        cached = self._hash_cache.get(path_key)
+        if cached and cached[:3] == file_key:
+            return cached[3]
+        
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT inode, size, mtime_ns, sha256 FROM file_hashes WHERE path = ?",
+            (path_key,)
+        )
+        row = cursor.fetchone()
+        if row and (row['inode'], row['size'], row['mtime_ns']) == file_key:
+            self._hash_cache[path_key] = (*file_key, row['sha256'])
+            return row['sha256']
+        return None
+    
+    def _calculate_hash(self, pdf_path: Path, key: Optional[Tuple] = None) -> str:
+        """
+        Calcula SHA-256 hash del PDF para detección de duplicados.
+        
+        Memoizado por (ruta, inode, tamaño, mtime_ns) en memoria y en la
+        tabla file_hashes: cada archivo se lee como máximo una vez por
+        cambio de contenido, incluso entre ejecuciones.
+        
+        Args:
+            pdf_path: Ruta del PDF
+            key: Resultado de _file_key() si ya se calculó (evita otro stat)
+        """
+        path_key, file_key = key or self._file_key(pdf_path)
+        pdf_hash = self._cached_hash(path_key, file_key)
+        if pdf_hash is not None:
+            return pdf_hash
+        
+        pdf_hash = self._hash_file(path_key)
+        self.conn.execute(
+            _MEMOIZE_HASH_SQL,
+            (path_key, *file_key, pdf_hash, datetime.utcnow().isoformat())
+        )
+        self._commit()
+        
+        self._hash_cache[path_key] = (*file_key, pdf_hash)
+        return pdf_hash
+    
+    def file_hash(self, pdf_path: Path) -> str:
+        """
+        SHA-256 del PDF (memoizado: tras add_conversion() del mismo archivo
+        se obtiene de memoria, sin leerlo ni esperar la cola write-behind).
+        """
+        return self._calculate_hash(Path(pdf_path))
+    
+    def _calculate_partial_hash(self, pdf_path: Path, key: Optional[Tuple] = None) -> str:
+        """
+        Hash rápido (BLAKE2b) del tamaño + primeros y últimos PARTIAL_HASH_BYTES.
+        
+        Solo sirve como prefiltro: una coincidencia se confirma con SHA-256.
+        """
+        path_key, file_key = key or self._file_key(pdf_path)
+        cached = self._partial_cache.get(path_key)
+        if cached and cached[:3] == file_key:
+            return cached[3]
+        
+        size = file_key[1]
+        partial = hashlib.blake2b(str(size).encode(), digest_size=16)
+        with open(path_key, "rb") as f:
+            partial.update(f.read(PARTIAL_HASH_BYTES))
+            if size > PARTIAL_HASH_BYTES:
+                f.seek(max(PARTIAL_HASH_BYTES, size - PARTIAL_HASH_BYTES))
+                partial.update(f.read(PARTIAL_HASH_BYTES))
+        
+        partial_hash = partial.hexdigest()
+        self._partial_cache[path_key] = (*file_key, partial_hash)
+        return partial_hash
+    
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        """SHA-256 completo con lecturas grandes sobre un buffer reutilizable."""
         sha256_hash = hashlib.sha256()
-        with open(pdf_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
+        buffer = bytearray(HASH_BUFFER_SIZE)
+        view = memoryview(buffer)
+        with open(path, "rb", buffering=0) as f:
+            while True:
+                read = f.readinto(buffer)
+                if not read:
+                    break
+                sha256_hash.update(view[:read])
         return sha256_hash.hexdigest()
     
+    def _find_by_hash(self, pdf_hash: str) -> Optional[int]:
+        """Devuelve el ID de la conversión con ese hash, si existe."""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT id FROM conversions WHERE pdf_hash = ?",
+            (pdf_hash,)
+        )
+        result = cursor.fetchone()
+        return result['id'] if result else None
+    
+    @_flushed(keys=lambda self, pdf_path: ("duplicate_keys",))
     def is_duplicate(self, pdf_path: Path) -> Tuple[bool, Optional[int]]:
         """
         Verifica si el PDF ya fue procesado.
         
+        Detección en dos niveles: si el SHA-256 no está memoizado, primero
+        se compara el tamaño y un hash parcial (inicio + final del archivo)
+        contra el índice idx_size_partial; el SHA-256 completo solo se
+        calcula cuando el prefiltro coincide con algún registro.
+        
         Returns:
             (is_duplicate, conversion_id): Tupla con booleano y ID si existe
         """
-        pdf_hash = self._calculate_hash(pdf_path)
+        path_key, file_key = self._file_key(pdf_path)
+        pdf_hash = self._cached_hash(path_key, file_key)
+        
+        if pdf_hash is None:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                "SELECT partial_hash FROM conversions WHERE pdf_size_bytes = ?",
+                (file_key[1],)
+            )
+            candidates = {row['partial_hash'] for row in cursor.fetchall()}
+            if not candidates:
+                return False, None
+            
+            partial_hash = self._calculate_partial_hash(pdf_path)
+            # None = registro anterior al prefiltro: requiere hash completo
+            if partial_hash not in candidates and None not in candidates:
+                return False, None
+            
+            pdf_hash = self._calculate_hash(pdf_path)
+            self._backfill_partial_hash(pdf_hash, partial_hash)
+        
+        existing_id = self._find_by_hash(pdf_hash)
+        if existing_id is not None:
+            return True, existing_id
+        return False, None
+    
+    @_deferred(keys=lambda self, *args: ("conversions", ("conversion", None), "duplicate_keys"))
+    def _backfill_partial_hash(self, pdf_hash: str, partial_hash: str):
+        """Completa partial_hash en registros creados antes del prefiltro."""
         cursor = self.conn.cursor()
         cursor.execute(
-            "SELECT id, status FROM conversions WHERE pdf_hash = ?",
-            (pdf_hash,)
+            "UPDATE conversions SET partial_hash = ? WHERE pdf_hash = ? AND partial_hash IS NULL",
+            (partial_hash, pdf_hash)
         )
-        result = cursor.fetchone()
-        
-        if result:
-            return True, result['id']
-        return False, None
+        if cursor.rowcount:
+            self._commit()
     
+    @_flushed(keys=lambda self, *args, **kwargs: ("duplicate_keys",))
     def add_conversion(
         self,
         pdf_path: Path,
@@ -158,43 +999,120 @@ class ConversionTracker:
         
         cursor = self.conn.cursor()
         
-        # Verificar duplicado
-        is_dup, existing_id = self.is_duplicate(pdf_path)
-        if is_dup:
+        # Verificar duplicado (reutiliza el hash ya calculado)
+        existing_id = self._find_by_hash(pdf_hash)
+        if existing_id is not None:
             logger.warning(f"PDF duplicado detectado: {pdf_path.name} (ID: {existing_id})")
             return existing_id
         
-        cursor.execute("""
-            INSERT INTO conversions (
-                pdf_filename, pdf_path, pdf_hash, pdf_size_bytes,
-                status, created_at, updated_at,
-                pages, has_tables, has_equations, is_scanned,
-                language, notes, pdf_type, profile_used, fidelity_score
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        cursor.execute(
+            _INSERT_CONVERSION_SQL,
+            self._conversion_row(
+                pdf_path, pdf_hash, pdf_size,
+                self._calculate_partial_hash(pdf_path), status, now, kwargs
+            )
+        )
+        
+        self._commit()
+        conversion_id = cursor.lastrowid
+        logger.info(f"Conversión registrada: {pdf_path.name} (ID: {conversion_id})")
+        return conversion_id
+    
+    def _conversion_row(
+        self,
+        pdf_path: Path,
+        pdf_hash: str,
+        pdf_size: int,
+        partial_hash: str,
+        status: str,
+        now: str,
+        fields: Dict
+    ) -> tuple:
+        """Parámetros de _INSERT_CONVERSION_SQL para un PDF."""
+        return (
             pdf_path.name,
             str(pdf_path),
             pdf_hash,
             pdf_size,
+            partial_hash,
             status,
             now,
             now,
-            kwargs.get('pages', 0),
-            kwargs.get('has_tables', False),
-            kwargs.get('has_equations', False),
-            kwargs.get('is_scanned', False),
-            kwargs.get('language', 'unknown'),
-            kwargs.get('notes', ''),
-            kwargs.get('pdf_type', 'unknown'),
-            kwargs.get('profile_used'),
-            kwargs.get('fidelity_score')
-        ))
+            *(fields.get(name, default) for name, default in CONVERSION_INSERT_FIELDS)
+        )
+    
+    def _ids_by_hash(self, hashes: Iterable[str]) -> Dict[str, int]:
+        """Mapa pdf_hash → id para los hashes ya registrados."""
+        hashes = list(hashes)
+        found: Dict[str, int] = {}
+        for start in range(0, len(hashes), SQL_IN_CHUNK):
+            chunk = hashes[start:start + SQL_IN_CHUNK]
+            rows = self.conn.execute(
+                f"SELECT id, pdf_hash FROM conversions "
+                f"WHERE pdf_hash IN ({', '.join('?' * len(chunk))})",
+                chunk
+            )
+            found.update((row['pdf_hash'], row['id']) for row in rows)
+        return found
+    
+    @_flushed
+    def add_conversions_many(self, records: Iterable[Dict]) -> List[int]:
+        """
+        Registra muchas conversiones en una sola transacción.
         
-        self.conn.commit()
-        conversion_id = cursor.lastrowid
-        logger.info(f"Conversión registrada: {pdf_path.name} (ID: {conversion_id})")
-        return conversion_id
+        Cada registro es un dict con 'pdf_path', 'status' opcional (default
+        "pending") y los mismos campos opcionales que add_conversion().
+        Los PDFs ya registrados o repetidos dentro del lote no se insertan
+        de nuevo.
+        
+        Args:
+            records: Registros a insertar
+        
+        Returns:
+            IDs en el mismo orden que records (el ID existente para duplicados)
+        """
+        now = datetime.utcnow().isoformat()
+        prepared = []
+        # Hashes nuevos: se memoizan dentro de la transacción del lote
+        # (fuera de ella, _calculate_hash haría un commit por archivo)
+        new_hashes = []
+        for record in records:
+            pdf_path = Path(record['pdf_path'])
+            key = self._file_key(pdf_path)
+            pdf_hash = self._cached_hash(*key)
+            if pdf_hash is None:
+                pdf_hash = self._hash_file(key[0])
+                new_hashes.append((key[0], *key[1], pdf_hash, now))
+                self._hash_cache[key[0]] = (*key[1], pdf_hash)
+            prepared.append((pdf_path, key, pdf_hash, record))
+        
+        with self.transaction():
+            if new_hashes:
+                self.conn.executemany(_MEMOIZE_HASH_SQL, new_hashes)
+            ids = self._ids_by_hash({pdf_hash for _, _, pdf_hash, _ in prepared})
+            rows = []
+            pending = set()
+            for pdf_path, key, pdf_hash, record in prepared:
+                if pdf_hash in ids or pdf_hash in pending:
+                    continue
+                pending.add(pdf_hash)
+                rows.append(self._conversion_row(
+                    pdf_path, pdf_hash, key[1][1],
+                    self._calculate_partial_hash(pdf_path, key),
+                    record.get('status', 'pending'), now, record
+                ))
+            
+            if rows:
+                self.conn.executemany(_INSERT_CONVERSION_SQL, rows)
+                ids.update(self._ids_by_hash(pending))
+        
+        logger.info(
+            f"Conversiones registradas en lote: {len(rows)} nuevas, "
+            f"{len(prepared) - len(rows)} duplicadas"
+        )
+        return [ids[pdf_hash] for _, _, pdf_hash, _ in prepared]
     
+    @_deferred(keys=_update_conversion_keys, validate=_validate_update_conversion)
     def update_conversion(
         self,
         conversion_id: int,
@@ -207,30 +1125,60 @@ class ConversionTracker:
         Args:
             conversion_id: ID del registro
             status: Nuevo estado (opcional)
-            **kwargs: Campos a actualizar
+            **kwargs: Campos a actualizar (ver CONVERSION_UPDATE_COLUMNS)
+        
+        Raises:
+            ValueError: Si algún campo no es una columna actualizable
         """
+        if status:
+            kwargs = {"status": status, **kwargs}
+        query = _update_conversion_sql(tuple(kwargs))
         now = datetime.utcnow().isoformat()
-        cursor = self.conn.cursor()
         
-        # Construir query dinámicamente
-        updates = ["updated_at = ?"]
-        values = [now]
+        self.conn.execute(query, (now, *kwargs.values(), conversion_id))
+        self._commit()
+        logger.info(f"Conversión actualizada: ID {conversion_id}")
+    
+    @_flushed
+    def update_conversions_many(self, updates: Iterable[Tuple[int, Dict]]) -> int:
+        """
+        Actualiza muchas conversiones en una sola transacción.
         
-        if status:
-            updates.append("status = ?")
-            values.append(status)
+        Las actualizaciones se agrupan por conjunto de columnas y cada grupo
+        se ejecuta con executemany() sobre la misma sentencia.
         
-        for key, value in kwargs.items():
-            updates.append(f"{key} = ?")
-            values.append(value)
+        Args:
+            updates: Pares (conversion_id, {columna: valor}); como en
+                update_conversion(), un status None o vacío no se cambia
         
-        values.append(conversion_id)
+        Returns:
+            Número de filas actualizadas
         
-        query = f"UPDATE conversions SET {', '.join(updates)} WHERE id = ?"
-        cursor.execute(query, values)
-        self.conn.commit()
-        logger.info(f"Conversión actualizada: ID {conversion_id}")
+        Raises:
+            ValueError: Si alguna columna no está en CONVERSION_UPDATE_COLUMNS
+        """
+        now = datetime.utcnow().isoformat()
+        groups: Dict[Tuple[str, ...], List[tuple]] = {}
+        for conversion_id, fields in updates:
+            if "status" in fields and not fields["status"]:
+                # Igual que update_conversion(): un status vacío no se cambia
+                fields = {name: value for name, value in fields.items() if name != "status"}
+            groups.setdefault(tuple(fields), []).append(
+                (now, *fields.values(), conversion_id)
+            )
+        
+        # Validar todas las columnas antes de escribir nada
+        queries = {columns: _update_conversion_sql(columns) for columns in groups}
+        
+        updated = 0
+        with self.transaction():
+            for columns, rows in groups.items():
+                updated += self.conn.executemany(queries[columns], rows).rowcount
+        
+        logger.info(f"Conversiones actualizadas en lote: {updated}")
+        return updated
     
+    @_deferred(keys=_table_keys("validation_reports"))
     def add_validation_report(
         self,
         conversion_id: int,
@@ -261,9 +1209,10 @@ class ConversionTracker:
             json.dumps(report_json, ensure_ascii=False)
         ))
         
-        self.conn.commit()
+        self._commit()
         logger.info(f"Reporte de validación registrado para conversión ID {conversion_id}")
     
+    @_deferred(keys=_table_keys("conversion_errors"))
     def add_error(
         self,
         conversion_id: int,
@@ -281,9 +1230,275 @@ class ConversionTracker:
             ) VALUES (?, ?, ?, ?, ?)
         """, (conversion_id, now, error_type, error_message, step or 'unknown'))
         
-        self.conn.commit()
+        self._commit()
         logger.error(f"Error registrado para conversión ID {conversion_id}: {error_type}")
     
+    @_deferred(keys=_table_keys("conversion_metrics"))
+    def record_metrics(self, conversion_id: int, metrics: Dict):
+        """
+        Guarda las métricas de una conversión en conversion_metrics.
+        
+        Reemplaza las métricas anteriores de la conversión. Los dicts
+        anidados se aplanan con '.' (ej: {"detection": {"native_ratio": 1.0}}
+        → "detection.native_ratio").
+        
+        Args:
+            conversion_id: ID del registro
+            metrics: Métricas (números, booleanos, textos o dicts anidados)
+        """
+        rows = [(conversion_id, *row) for row in _flatten_metrics(metrics)]
+        with self.transaction():
+            self.conn.execute(
+                "DELETE FROM conversion_metrics WHERE conversion_id = ?", (conversion_id,)
+            )
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO conversion_metrics (
+                    conversion_id, key, value_num, value_text
+                ) VALUES (?, ?, ?, ?)
+            """, rows)
+        logger.info(f"Métricas registradas para conversión ID {conversion_id}: {len(rows)}")
+    
+    @_flushed
+    def get_metrics(self, conversion_id: int) -> Dict:
+        """Obtiene las métricas aplanadas de una conversión ({clave: valor})."""
+        cursor = self.conn.execute(
+            "SELECT key, value_num, value_text FROM conversion_metrics WHERE conversion_id = ?",
+            (conversion_id,)
+        )
+        return {
+            row['key']: row['value_num'] if row['value_num'] is not None else row['value_text']
+            for row in cursor
+        }
+    
+    @_flushed
+    def get_metric_stats(self, key: str, status: Optional[str] = None) -> Dict:
+        """
+        Agrega una métrica numérica sobre todas las conversiones en SQLite.
+        
+        Args:
+            key: Clave aplanada (ej: "tables_extracted", "detection.native_ratio")
+            status: Filtrar por estado de la conversión (opcional)
+        
+        Returns:
+            Dict con count, sum, avg, min y max
+        """
+        query = """
+            SELECT COUNT(value_num) as count, SUM(value_num) as sum,
+                   AVG(value_num) as avg, MIN(value_num) as min, MAX(value_num) as max
+            FROM conversion_metrics m
+        """
+        params: Tuple = (key,)
+        if status:
+            query += " JOIN conversions c ON c.id = m.conversion_id WHERE m.key = ? AND c.status = ?"
+            params = (key, status)
+        else:
+            query += " WHERE m.key = ?"
+        return dict(self.conn.execute(query, params).fetchone())
+    
+    @_deferred(keys=_table_keys("conversion_pages"))
+    def add_page_records(
+        self,
+        conversion_id: int,
+        pages: List[Dict],
+        replace: bool = True
+    ):
+        """
+        Registra las métricas por página de una conversión.
+        
+        Args:
+            conversion_id: ID del registro
+            pages: Lista de dicts con 'page_number' y los campos de
+                PAGE_RECORD_FIELDS (los que falten quedan en NULL)
+            replace: Borrar antes las páginas previas de la conversión
+                (reconversión con --force)
+        """
+        columns = ", ".join(PAGE_RECORD_FIELDS)
+        sql = (
+            f"INSERT OR REPLACE INTO conversion_pages "
+            f"(conversion_id, page_number, {columns}) "
+            f"VALUES (?, ?, {', '.join('?' * len(PAGE_RECORD_FIELDS))})"
+        )
+        rows = [
+            (conversion_id, page['page_number'],
+             *(page.get(field) for field in PAGE_RECORD_FIELDS))
+            for page in pages
+        ]
+        
+        with self.transaction():
+            if replace:
+                self.conn.execute(
+                    "DELETE FROM conversion_pages WHERE conversion_id = ?", (conversion_id,)
+                )
+            for start in range(0, len(rows), PAGE_RECORD_BATCH_SIZE):
+                self.conn.executemany(sql, rows[start:start + PAGE_RECORD_BATCH_SIZE])
+        logger.info(f"Páginas registradas para conversión ID {conversion_id}: {len(rows)}")
+    
+    @_deferred(keys=_table_keys("conversion_pages"))
+    def delete_page_records(self, conversion_id: int):
+        """Elimina los registros por página de una conversión."""
+        self.conn.execute(
+            "DELETE FROM conversion_pages WHERE conversion_id = ?", (conversion_id,)
+        )
+        self._commit()
+    
+    @_flushed
+    def get_page_records(self, conversion_id: int) -> List[Dict]:
+        """Obtiene los registros por página de una conversión, en orden."""
+        cursor = self.conn.execute(
+            "SELECT * FROM conversion_pages WHERE conversion_id = ? ORDER BY page_number",
+            (conversion_id,)
+        )
+        return [dict(row) for row in cursor]
+    
+    @_flushed
+    def get_slowest_pages(self, limit: int = 20, strategy: Optional[str] = None) -> List[Dict]:
+        """
+        Páginas con mayor tiempo de render en todo el corpus.
+        
+        Args:
+            limit: Número de páginas a devolver
+            strategy: Filtrar por estrategia ("native", "scanned", ...)
+        
+        Returns:
+            Registros de conversion_pages con pdf_filename, de más lenta a más rápida
+        """
+        query = """
+            SELECT p.*, c.pdf_filename
+            FROM conversion_pages p
+            JOIN conversions c ON c.id = p.conversion_id
+        """
+        params: Tuple = (limit,)
+        if strategy:
+            query += " WHERE p.strategy = ?"
+            params = (strategy, limit)
+        query += " ORDER BY p.render_seconds DESC LIMIT ?"
+        return [dict(row) for row in self.conn.execute(query, params)]
+    
+    @_deferred(keys=lambda self, pdf_hash, page_map: (("page_map", pdf_hash),))
+    def save_page_map(self, pdf_hash: str, page_map) -> None:
+        """
+        Guarda el mapa de clasificación por página de un PDF.
+        
+        Args:
+            pdf_hash: SHA-256 del PDF
+            page_map: PageMap de pdf_type_detector (usa to_bytes())
+        """
+        now = datetime.utcnow().isoformat()
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO page_maps (
+                pdf_hash, page_count, pdf_type, data, created_at
+            ) VALUES (?, ?, ?, ?, ?)
+        """, (pdf_hash, len(page_map), page_map.pdf_type.value,
+              page_map.to_bytes(), now))
+        self._commit()
+        logger.info(f"Mapa de páginas guardado: {pdf_hash[:12]}... ({len(page_map)} páginas)")
+    
+    @_flushed(keys=lambda self, pdf_hash: (("page_map", pdf_hash),))
+    def get_page_map(self, pdf_hash: str) -> Optional[bytes]:
+        """
+        Obtiene el mapa de páginas serializado de un PDF.
+        
+        Returns:
+            Bytes para PageMap.from_bytes() o None si no existe
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT data FROM page_maps WHERE pdf_hash = ?", (pdf_hash,))
+        result = cursor.fetchone()
+        return bytes(result['data']) if result else None
+    
+    @_deferred(keys=_table_keys("document_signatures"))
+    def save_signature(self, conversion_id: int, signature):
+        """
+        Guarda la firma MinHash de una conversión y sus bandas LSH.
+        
+        Args:
+            conversion_id: ID del registro
+            signature: MinHashSignature de near_duplicates (usa to_bytes()
+                y band_keys())
+        """
+        now = datetime.utcnow().isoformat()
+        with self.transaction():
+            self.conn.execute(
+                "DELETE FROM signature_bands WHERE conversion_id = ?", (conversion_id,)
+            )
+            self.conn.execute("""
+                INSERT OR REPLACE INTO document_signatures (
+                    conversion_id, num_perm, shingle_count, signature, created_at
+                ) VALUES (?, ?, ?, ?, ?)
+            """, (conversion_id, len(signature), signature.shingle_count,
+                  signature.to_bytes(), now))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO signature_bands (band, bucket, conversion_id) VALUES (?, ?, ?)",
+                [(band, bucket, conversion_id) for band, bucket in signature.band_keys()]
+            )
+        logger.info(f"Firma MinHash guardada para conversión ID {conversion_id}")
+    
+    @staticmethod
+    def _rebuild_signature_bands(cursor: sqlite3.Cursor):
+        """Recalcula signature_bands desde document_signatures con la división LSH actual."""
+        from near_duplicates import MinHashSignature
+        
+        cursor.execute("DELETE FROM signature_bands")
+        rows = cursor.execute(
+            "SELECT conversion_id, signature FROM document_signatures"
+        ).fetchall()
+        for row in rows:
+            signature = MinHashSignature.from_bytes(bytes(row['signature']))
+            cursor.executemany(
+                "INSERT OR IGNORE INTO signature_bands (band, bucket, conversion_id) VALUES (?, ?, ?)",
+                [(band, bucket, row['conversion_id']) for band, bucket in signature.band_keys()]
+            )
+    
+    @_flushed(keys=lambda self, *args, **kwargs: ("document_signatures",))
+    def get_signature_candidates(
+        self,
+        band_keys: List[Tuple[int, int]],
+        exclude_id: Optional[int] = None
+    ) -> List[Tuple[int, bytes, int]]:
+        """
+        Conversiones que comparten al menos una banda LSH.
+        
+        Las firmas cuya conversión ya no existe (huérfanas) no se devuelven.
+        
+        Args:
+            band_keys: Lista de (banda, bucket) de la firma buscada
+            exclude_id: Conversión a excluir (la propia, al reconvertir)
+        
+        Returns:
+            Lista de (conversion_id, firma serializada, shingle_count)
+        """
+        if not band_keys:
+            return []
+        pairs = " OR ".join("(b.band = ? AND b.bucket = ?)" for _ in band_keys)
+        params = [value for key in band_keys for value in key]
+        cursor = self.conn.execute(f"""
+            SELECT s.conversion_id, s.signature, s.shingle_count
+            FROM document_signatures s
+            JOIN conversions c ON c.id = s.conversion_id
+            WHERE s.conversion_id IN (
+                SELECT b.conversion_id FROM signature_bands b WHERE {pairs}
+            )
+        """, params)
+        return [
+            (row['conversion_id'], bytes(row['signature']), row['shingle_count'])
+            for row in cursor
+            if row['conversion_id'] != exclude_id
+        ]
+    
+    @_flushed
+    def get_near_duplicates(self) -> List[Dict]:
+        """Conversiones marcadas como casi-duplicadas, con el original."""
+        cursor = self.conn.execute("""
+            SELECT c.id, c.pdf_filename, c.status, c.near_duplicate_of,
+                   o.pdf_filename AS original_filename
+            FROM conversions c
+            JOIN conversions o ON o.id = c.near_duplicate_of
+            ORDER BY c.id
+        """)
+        return [dict(row) for row in cursor]
+    
+    @_flushed(keys=_conversion_row_keys)
     def get_conversion(self, conversion_id: int) -> Optional[Dict]:
         """Obtiene un registro de conversión por ID."""
         cursor = self.conn.cursor()
@@ -291,62 +1506,197 @@ class ConversionTracker:
         result = cursor.fetchone()
         return dict(result) if result else None
     
+    @_flushed
     def get_conversions_by_status(self, status: str) -> List[Dict]:
         """Obtiene todas las conversiones con un estado específico."""
         cursor = self.conn.cursor()
         cursor.execute("SELECT * FROM conversions WHERE status = ?", (status,))
         return [dict(row) for row in cursor.fetchall()]
     
+    def _rebuild_statistics(self, cursor: sqlite3.Cursor):
+        """Recalcula conversion_stats desde conversions (una pasada completa)."""
+        names = ", ".join(name for name, _ in _STATS_COLUMNS)
+        sums = ", ".join(f"SUM({expr.format(row='c')})" for _, expr in _STATS_COLUMNS)
+        cursor.execute("DELETE FROM conversion_stats")
+        cursor.execute(
+            f"INSERT INTO conversion_stats (status, {names}) "
+            f"SELECT c.status, {sums} FROM conversions c GROUP BY c.status"
+        )
+    
+    def rebuild_statistics(self):
+        """
+        Recalcula el resumen de get_statistics desde cero.
+        
+        Solo hace falta si conversions se modificó sin los triggers (p. ej.
+        restaurando una copia antigua de la tabla).
+        """
+        with self.transaction():
+            self._rebuild_statistics(self.conn.cursor())
+        logger.info("Resumen de estadísticas recalculado")
+    
+    @_flushed
     def get_statistics(self) -> Dict:
-        """Genera estadísticas de conversiones."""
-        cursor = self.conn.cursor()
+        """
+        Genera estadísticas de conversiones.
+        
+        Lee el resumen por estado de conversion_stats (mantenido por
+        triggers), así que el costo no depende del número de conversiones.
+        """
+        rows = self.conn.execute(
+            "SELECT * FROM conversion_stats WHERE count > 0 ORDER BY status"
+        ).fetchall()
+        
+        def total(column: str):
+            return sum(row[column] for row in rows)
         
-        stats = {
-            "total_conversions": 0,
-            "by_status": {},
-            "average_confidence": 0,
-            "total_pages": 0,
-            "total_size_mb": 0,
-            "with_tables": 0,
-            "with_equations": 0,
-            "scanned_pdfs": 0
+        confidence_count = total('confidence_count')
+        average_confidence = (
+            total('confidence_sum') / confidence_count if confidence_count else 0
+        )
+        
+        return {
+            "total_conversions": total('count'),
+            "by_status": {row['status']: row['count'] for row in rows},
+            "average_confidence": round(average_confidence, 2),
+            "total_pages": total('pages'),
+            "total_size_mb": round(total('size_bytes') / (1024 * 1024), 2),
+            "with_tables": total('with_tables'),
+            "with_equations": total('with_equations'),
+            "scanned_pdfs": total('scanned')
         }
+    
+    def _archive_table_sql(self, table: str) -> str:
+        """CREATE TABLE de la copia de archivo de `table` (mismas columnas + archived_at)."""
+        columns = [
+            f"{row['name']} {row['type']}{' PRIMARY KEY' if row['pk'] else ''}"
+            for row in self.conn.execute(f"PRAGMA main.table_info({table})")
+        ]
+        return (
+            f"CREATE TABLE IF NOT EXISTS archive.{table} "
+            f"({', '.join(columns)}, archived_at TEXT NOT NULL)"
+        )
+    
+    @_flushed
+    def archive_rows(
+        self,
+        archive_path: Optional[str] = None,
+        older_than_days: int = ARCHIVE_AFTER_DAYS,
+        dry_run: bool = False
+    ) -> Dict[str, int]:
+        """
+        Mueve errores antiguos o resueltos y reportes superados a una base de archivo.
         
-        # Total conversiones
-        cursor.execute("SELECT COUNT(*) as count FROM conversions")
-        stats["total_conversions"] = cursor.fetchone()['count']
+        Args:
+            archive_path: Base de archivo (default: ARCHIVE_DB_NAME junto al tracker)
+            older_than_days: Antigüedad a partir de la cual se archiva un error
+            dry_run: Solo contar las filas que se moverían
         
-        # Por estado
-        cursor.execute("SELECT status, COUNT(*) as count FROM conversions GROUP BY status")
-        stats["by_status"] = {row['status']: row['count'] for row in cursor.fetchall()}
+        Returns:
+            Filas archivadas por tabla
+        """
+        archive_path = Path(archive_path) if archive_path else self.db_path.parent / ARCHIVE_DB_NAME
+        params = {
+            "cutoff": (datetime.utcnow() - timedelta(days=older_than_days)).isoformat(),
+            "now": datetime.utcnow().isoformat()
+        }
         
-        # Promedios y totales
-        cursor.execute("""
-            SELECT 
-                AVG(confidence_score) as avg_conf,
-                SUM(pages) as total_pages,
-                SUM(pdf_size_bytes) as total_bytes,
-                SUM(CASE WHEN has_tables = 1 THEN 1 ELSE 0 END) as with_tables,
-                SUM(CASE WHEN has_equations = 1 THEN 1 ELSE 0 END) as with_equations,
-                SUM(CASE WHEN is_scanned = 1 THEN 1 ELSE 0 END) as scanned
-            FROM conversions
-        """)
-        result = cursor.fetchone()
+        if dry_run:
+            return {
+                table: self.conn.execute(
+                    f"SELECT COUNT(*) FROM {table} t WHERE {condition}", params
+                ).fetchone()[0]
+                for table, condition in ARCHIVE_CRITERIA.items()
+            }
+        
+        # ATTACH no se permite dentro de una transacción
+        self.conn.execute("ATTACH DATABASE ? AS archive", (str(archive_path),))
+        try:
+            moved = {}
+            with self.transaction():
+                for table, condition in ARCHIVE_CRITERIA.items():
+                    self.conn.execute(self._archive_table_sql(table))
+                    names = ", ".join(
+                        row['name'] for row in self.conn.execute(f"PRAGMA main.table_info({table})")
+                    )
+                    # En WAL el commit no es atómico entre bases: si se interrumpe
+                    # entre ambas, repetir no duplica filas (OR IGNORE sobre el id)
+                    self.conn.execute(f"""
+                        INSERT OR IGNORE INTO archive.{table} ({names}, archived_at)
+                        SELECT {names}, :now FROM main.{table} t WHERE {condition}
+                    """, params)
+                    moved[table] = self.conn.execute(
+                        f"DELETE FROM main.{table} AS t WHERE {condition}", params
+                    ).rowcount
+        finally:
+            self.conn.execute("DETACH DATABASE archive")
+        
+        logger.info(f"Filas archivadas en {archive_path.name}: {moved}")
+        return moved
+    
+    def _file_size(self) -> int:
+        """Tamaño en disco de la base más su WAL."""
+        wal_path = Path(f"{self.db_path}-wal")
+        return self.db_path.stat().st_size + (wal_path.stat().st_size if wal_path.exists() else 0)
+    
+    @_flushed
+    def compact(self) -> Dict:
+        """
+        Compacta la base: libera páginas vacías, actualiza las estadísticas
+        del planificador (ANALYZE) y trunca el WAL.
+        
+        Una base creada sin auto_vacuum incremental se convierte con un
+        VACUUM completo (reescribe el archivo, una sola vez); después solo
+        se ejecuta incremental_vacuum.
+        
+        Returns:
+            Dict con vacuum ("full"/"incremental"), páginas libres liberadas
+            y tamaño en bytes antes y después
+        """
+        size_before = self._file_size()
+        free_pages = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
         
-        if result:
-            stats["average_confidence"] = round(result['avg_conf'] or 0, 2)
-            stats["total_pages"] = result['total_pages'] or 0
-            stats["total_size_mb"] = round((result['total_bytes'] or 0) / (1024 * 1024), 2)
-            stats["with_tables"] = result['with_tables'] or 0
-            stats["with_equations"] = result['with_equations'] or 0
-            stats["scanned_pdfs"] = result['scanned'] or 0
+        if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self.conn.execute("VACUUM")
+            vacuum = "full"
+        else:
+            self.conn.execute("PRAGMA incremental_vacuum").fetchall()
+            vacuum = "incremental"
         
-        return stats
+        self.conn.execute("ANALYZE")
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        
+        result = {
+            "vacuum": vacuum,
+            "freed_pages": free_pages,
+            "size_before": size_before,
+            "size_after": self._file_size()
+        }
+        logger.info(f"Base compactada ({vacuum}): {size_before} → {result['size_after']} bytes")
+        return result
     
     def close(self):
-        """Cierra la conexión a la base de datos."""
-        if self.conn:
-            self.conn.close()
+        """
+        Cierra las conexiones de todos los hilos de este proceso.
+        
+        En modo write-behind primero aplica las escrituras pendientes y
+        detiene el hilo escritor.
+        """
+        if self._pid != os.getpid():
+            self._after_fork()
+        writer = self._writer
+        if writer is not None and writer.is_alive() and not self._in_writer():
+            self._write_queue.put(None)
+            writer.join()
+        if writer is not None:
+            atexit.unregister(self._close_at_exit)
+        self._writer = None
+        with self._conn_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+        if connections:
             logger.info("Base de datos cerrada")
     
     def __enter__(self):
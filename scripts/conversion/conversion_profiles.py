@@ -68,6 +68,7 @@ class NormalizationProfile:
     page_marker_pattern: Optional[str] = None  # Regex para "Página X"
     footer_pattern: Optional[str] = None
     header_pattern: Optional[str] = None
+    strip_boilerplate: bool = True  # Líneas repetidas en los bordes de casi todas las páginas
     
     # Reglas de detección
     min_chars_for_heading: int = 3
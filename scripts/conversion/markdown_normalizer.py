@@ -9,16 +9,123 @@ Resuelve 3 problemas críticos:
 3. Marcadores "Página X" innecesarios
 """
 
+import os
 import re
+import glob
+import time
+import hashlib
 import logging
-from typing import List, Dict, Tuple, Optional
-from dataclasses import dataclass
+import sqlite3
+import threading
+import zlib
+import multiprocessing as mp
+from collections import deque
+from itertools import islice
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, Dict, Tuple, Optional, TextIO
+from dataclasses import asdict, dataclass, is_dataclass
 from pathlib import Path
 import json
 
+if TYPE_CHECKING:
+    from conversion_profiles import NormalizationProfile
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Cambios guardados en memoria por documento (el resto solo se cuenta)
+MAX_LOGGED_CHANGES = 200
+
+# ========== PATRONES (compilados una sola vez) ==========
+#
+# Todos corren en tiempo lineal (revisado con entradas adversarias, ver
+# bench_normalizer.py --pathological): anclados al inicio de línea, los
+# grupos repetidos empiezan con un '.' literal y cada `\s*` queda entre
+# clases disjuntas o antes de `$`, así que no hay retroceso catastrófico
+
+# Versión de las reglas de normalización: subirla al cambiar el
+# comportamiento de alguna fase invalida la caché de bloques
+NORMALIZER_VERSION = 1
+
+# Modo por lotes (normalize_markdown_files): sufijos de salida y reporte,
+# y buffer de lectura para el hash de entrada
+NORMALIZED_SUFFIX = "_normalized"
+BATCH_REPORT_SUFFIX = "_normalization.json"
+SECTIONS_SUFFIX = "_sections.json"  # Árbol de secciones (section_tree=True)
+OUTPUT_BATCH_LINES = 1024  # Líneas de salida por lote (validación y árbol de secciones)
+HASH_BUFFER_SIZE = 1024 * 1024
+
+# Caché de bloques (normalize(cache=...)): ubicación por defecto, un corte
+# de bloque cada N encabezados (en promedio) y espera ante bloqueos
+DEFAULT_CACHE_PATH = Path("sources/metadata/normalization_cache.db")
+NORMALIZATION_BLOCK_SPACING = 8
+CACHE_BUSY_TIMEOUT_MS = 30000
+
+# Fase 0: boilerplate entre páginas (encabezados y pies repetidos). Se
+# examinan las primeras y últimas líneas con contenido de cada página
+BOILERPLATE_EDGE_LINES = 3  # Líneas examinadas en cada borde de página
+BOILERPLATE_MIN_PAGES = 4  # Con menos páginas no hay frecuencia confiable
+BOILERPLATE_PAGE_FRACTION = 0.5  # Fracción de páginas en que debe repetirse
+BOILERPLATE_MAX_LINE_LENGTH = 120  # Encabezados/pies son cortos
+_NUMBER_RUN_RE = re.compile(r'\d+')
+_ROMAN_LINE_RE = re.compile(r'[ivxlcdm]+')
+# Aproximación de tokens (palabras y signos sueltos); no hay tokenizer
+_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+# Fase 1: metadata no semántica
+_PAGE_MARKER_RE = re.compile(r'^#+\s*(?:Página|Page)\s*\d+\s*$', re.MULTILINE)
+_SEPARATOR_RE = re.compile(r'^---\s*$\n', re.MULTILINE)
+# Footer/header. Se aplican en orden y por separado: `\s*` cruza saltos de
+# línea, así que cada pasada ve las líneas vacías que dejó la anterior
+_FOOTER_PATTERNS = tuple(re.compile(pattern, re.MULTILINE) for pattern in (
+    r'^#{1,6}\s*(?:©|®|™|All rights|Derechos reservados).*$',
+    r'^#{1,6}\s*(?:Footer|Header|Pie de página).*$',
+    r'^#{1,6}\s*(?:\d+|-|—)\s*$',  # Solo números o guiones
+    r'^#{1,6}\s*[ivxIVX]+\s*$',  # Solo números romanos
+))
+# Límites de ventana para limpiar en streaming: ningún patrón puede cruzar
+# una línea con contenido que no empiece con '#' ni con uno de estos
+# caracteres (con los que sigue un patrón tras "##" + saltos de línea)
+_CONTINUATION_CHARS = frozenset("-—©®™PADFHivxIVX")
+# Líneas '#' que la limpieza puede borrar o extender a la línea siguiente
+_CLEANUP_CANDIDATE_RE = re.compile(
+    r'#+\s*$'                                  # solo almohadillas
+    r'|#+\s*(?:Página|Page)\s*(?:\d+\s*)?$'    # marcador (aun sin número)
+    r'|#{1,6}\s*(?:©|®|™|All rights|Derechos reservados|Footer|Header|Pie de página)'
+    r'|#{1,6}\s*(?:\d+|-|—|[ivxIVX]+)\s*$'
+)
+
+# Fase 2: encabezados markdown y heurística de mayúsculas
+_MD_HEADING_RE = re.compile(r'^(#+)\s+(.+)$')
+_LETTER_THEN_LOWER_RE = re.compile(r'^[A-Z]\s+[a-z]')
+
+# Numeración de encabezados: una sola alternativa por gramática, en orden de
+# prioridad (decimal, letra, romano, palabra clave). Un match devuelve el
+# nivel semántico y el texto de la numeración
+_NUMBERING_RE = re.compile(r"""
+      (?P<decimal>\d+(?:\.\d+)*)[.\s:]+                              # 1.2.3
+    | (?P<letter>[A-Z])(?:\.(?P<letter_sub>\d+(?:\.\d+)*))?[.\s:]+    # A, A.1.2
+    | (?P<roman>[IVXLCDMivxlcdm]+)[.\s:]+                            # I, II, iv
+    | (?:Capítulo|Chapter|CAPÍTULO|CHAPTER|Parte|Part|PARTE|PART
+        |Sección|Section|SECCIÓN|SECTION|Anexo|Annex|ANEXO|ANNEX)
+      \s+(?P<keyword_number>\d+)                                      # Capítulo 1
+    | (?:Capítulo|Chapter|CAPÍTULO|CHAPTER|Parte|Part|PARTE|PART)
+      \s+(?P<keyword_roman>[IVX]+)                                    # Parte II
+    | (?:Sección|Section|SECCIÓN|SECTION|Apéndice|Appendix|APÉNDICE|APPENDIX)
+      \s+(?P<keyword_letter>[A-Z])                                    # Apéndice A
+""", re.VERBOSE)
+
+# Validación
+_H1_RE = re.compile(r'^#\s+', re.MULTILINE)
+_DUPLICATE_HASHES_RE = re.compile(r'^###+\s*##', re.MULTILINE)
+_METADATA_MARKER_RE = re.compile(r'^#{1,6}\s*(?:Página|Page)\s*\d', re.MULTILINE)
+_HEADING_HASHES_RE = re.compile(r'^(#+)\s', re.MULTILINE)
+
+_ROMAN_VALUES = {
+    'I': 1, 'V': 5, 'X': 10, 'L': 50,
+    'C': 100, 'D': 500, 'M': 1000
+}
+
 
 @dataclass
 class HeadingInfo:
@@ -32,47 +139,603 @@ class HeadingInfo:
     line_number: int
 
 
+class ChangeLog:
+    """
+    Registro acotado de cambios de una normalización.
+    
+    Guarda en memoria los primeros `limit` cambios y cuenta todos por
+    tipo. Si se indica `stream`, cada cambio se escribe completo como una
+    línea JSON (JSONL) sin quedar en memoria.
+    """
+    
+    def __init__(self, limit: int = MAX_LOGGED_CHANGES, stream: Optional[TextIO] = None):
+        self.limit = limit
+        self.stream = stream
+        self.entries: List[Dict] = []
+        self.counts: Dict[str, int] = {}
+        self.total = 0
+    
+    def append(self, change: Dict):
+        """Registra un cambio."""
+        self.total += 1
+        change_type = change.get("type", "unknown")
+        self.counts[change_type] = self.counts.get(change_type, 0) + 1
+        if len(self.entries) < self.limit:
+            self.entries.append(change)
+        if self.stream is not None:
+            self.stream.write(json.dumps(change, ensure_ascii=False) + "\n")
+    
+    def extend(self, changes: Callable[[], List[Dict]], counts: Dict[str, int],
+               adjust: Callable[[Dict], Dict]):
+        """
+        Registra un lote de cambios ya contados por tipo.
+        
+        changes() solo se llama si algún cambio se va a guardar o escribir,
+        y adjust se aplica solo a esos (ver _normalize_blocks).
+        """
+        room = self.limit - len(self.entries)
+        if self.stream is not None or room > 0:
+            batch = changes()
+            self.entries.extend(adjust(change) for change in batch[:max(room, 0)])
+            if self.stream is not None:
+                for change in batch:
+                    self.stream.write(json.dumps(adjust(change), ensure_ascii=False) + "\n")
+        self.total += sum(counts.values())
+        for change_type, count in counts.items():
+            self.counts[change_type] = self.counts.get(change_type, 0) + count
+    
+    def __len__(self) -> int:
+        return self.total
+    
+    @property
+    def truncated(self) -> bool:
+        """¿Hubo más cambios de los que se guardaron en memoria?"""
+        return self.total > len(self.entries)
+
+
+class _HeadingLine(str):
+    """
+    Línea de encabezado emitida por la fase 4.
+    
+    La fase 5 emite las líneas '#' tal cual (mismo objeto), así el árbol
+    de secciones reconoce los encabezados en la salida sin volver a
+    analizar el texto. Para todo lo demás es un str.
+    """
+
+
+class _SectionTreeBuilder:
+    """
+    Árbol de secciones de la salida, armado mientras se emite.
+    
+    Recibe los encabezados en orden (nivel final, numeración y título, ya
+    resueltos en las fases 2-4) y la salida por lotes de líneas. Los
+    offsets son sobre la salida unida con '\n': línea física desde 0 y
+    byte UTF-8; end_line/end_byte son exclusivos (siguiente sección de
+    nivel igual o menor, o el final del documento).
+    
+    Bytes y líneas se cuentan por tramo entre encabezados con un join,
+    no línea a línea: el árbol cuesta poco más que recorrer la salida.
+    """
+    
+    def __init__(self, headings: Iterable[Tuple[int, Optional[str], str]]):
+        self._headings = iter(headings)
+        self._sections: List[Dict] = []
+        self._open: List[Dict] = []  # Secciones abiertas, de la raíz hacia adentro
+        self._line = 0
+        self._byte = 0
+    
+    def feed(self, lines: List[str], headings: Optional[List[int]] = None):
+        """
+        Procesa las siguientes líneas de salida.
+        
+        headings: índices de los encabezados en lines (default: las
+        líneas _HeadingLine; la caché los guarda aparte)
+        """
+        if headings is None:
+            headings = [i for i, line in enumerate(lines) if type(line) is _HeadingLine]
+        start = 0
+        for index in headings:
+            self._advance(lines[start:index])
+            start = index
+            level, numbering, title = next(self._headings)
+            if level <= 6:  # 7+ '#' no es encabezado markdown
+                self._close(level, self._line, self._byte)
+                section = {"level": level, "numbering": numbering, "title": title,
+                           "line": self._line, "byte": self._byte}
+                parent = self._open[-1].setdefault("children", []) if self._open else self._sections
+                parent.append(section)
+                self._open.append(section)
+        self._advance(lines[start:])
+    
+    def report(self) -> Dict:
+        """Árbol final: total de líneas y bytes de la salida y secciones raíz."""
+        size = max(self._byte - 1, 0)  # Sin '\n' tras la última línea
+        lines = self._line if size else 0
+        self._close(0, lines, size)
+        return {"lines": lines, "bytes": size, "sections": self._sections}
+    
+    def _advance(self, lines: List[str]):
+        """Suma las líneas físicas y bytes de un tramo (cada línea + '\n')."""
+        if not lines:
+            return
+        text = '\n'.join(lines)
+        self._line += text.count('\n') + 1
+        self._byte += (len(text) if text.isascii() else len(text.encode('utf-8'))) + 1
+    
+    def _close(self, level: int, line: int, byte: int):
+        """Cierra las secciones abiertas de nivel >= level."""
+        while self._open and self._open[-1]["level"] >= level:
+            section = self._open.pop()
+            section["end_line"] = line
+            section["end_byte"] = byte
+            if "children" in section:
+                # children al final: el JSON se lee de arriba hacia abajo
+                section["children"] = section.pop("children")
+
+
+class _LineValidator:
+    """
+    Checks de fidelidad calculados por lotes de líneas de la salida.
+    
+    Da el mismo resultado que aplicar las regex de validación al texto
+    completo, sin recorrerlo línea a línea en Python: cada lote se une una
+    vez y las regex se evalúan solo donde pueden empezar (inicios de línea
+    '#', ubicados con str.find). Sus espacios pueden cruzar saltos
+    de línea, así que una línea '#' se evalúa cuando ya llegaron las dos
+    líneas con contenido siguientes (o el final); si no, pasa al lote
+    siguiente.
+    """
+    
+    def __init__(self):
+        self.has_h1 = False
+        self.duplicate_hashes = False
+        self.metadata_markers = False
+        self.valid_hierarchy = True
+        self.triple_newline = False
+        self._current_level = 0
+        self._pending: List[str] = []  # Desde la primera línea '#' sin evaluar
+        self._tail: Optional[str] = None  # Últimos 2 caracteres de la salida
+    
+    def feed(self, lines: List[str]):
+        """Procesa las siguientes líneas de salida."""
+        if not lines:
+            return
+        text = '\n'.join(lines)
+        
+        # "\n\n\n" en el lote o en su unión con la salida anterior
+        if not self.triple_newline:
+            self.triple_newline = '\n\n\n' in text or (
+                self._tail is not None and '\n\n\n' in f"{self._tail}\n{text[:2]}"
+            )
+        self._tail = text[-2:] if self._tail is None else f"{self._tail}\n{text}"[-2:]
+        
+        if self._pending:
+            lines = self._pending + lines
+            text = '\n'.join(lines)
+        elif not text.startswith('#') and '\n#' not in text:
+            return
+        
+        # Las líneas '#' sin dos líneas con contenido después quedan pendientes
+        content = 0
+        cut = 0
+        for index in range(len(lines) - 1, -1, -1):
+            line = lines[index]
+            if line and not line.isspace():
+                content += 1
+                if content == 2:
+                    cut = index
+                    break
+        self._pending = next(
+            (lines[index:] for index in range(cut, len(lines))
+             if lines[index].startswith('#') or '\n#' in lines[index]),
+            []
+        )
+        limit = len(text) - len('\n'.join(self._pending)) if self._pending else len(text) + 1
+        self._check(text, limit)
+    
+    def report(self) -> Dict:
+        """Reporte de validación (mismo formato que MarkdownNormalizer._validate)."""
+        if self._pending:
+            text = '\n'.join(self._pending)
+            self._pending = []
+            self._check(text, len(text) + 1)
+        
+        checks = {
+            "has_h1": self.has_h1,
+            "no_duplicate_hashes": not self.duplicate_hashes,
+            "valid_hierarchy": self.valid_hierarchy,
+            "no_metadata_markers": not self.metadata_markers,
+            "proper_spacing": not self.triple_newline
+        }
+        
+        score = sum(checks.values()) / len(checks) * 100
+        
+        return {
+            "fidelity_score": score,
+            "checks": checks,
+            "warnings": [k for k, v in checks.items() if not v]
+        }
+    
+    def _check(self, text: str, limit: int):
+        """Aplica las regex de validación en las líneas '#' de text antes de limit."""
+        for pos in _hash_line_starts(text):
+            if pos >= limit:
+                return
+            if not self.has_h1 and _H1_RE.match(text, pos):
+                self.has_h1 = True
+            if not self.duplicate_hashes and _DUPLICATE_HASHES_RE.match(text, pos):
+                self.duplicate_hashes = True
+            if not self.metadata_markers and _METADATA_MARKER_RE.match(text, pos):
+                self.metadata_markers = True
+            
+            # Jerarquía: no puede saltar más de un nivel hacia abajo
+            if not self.valid_hierarchy:
+                continue
+            match = _HEADING_HASHES_RE.match(text, pos)
+            if not match:
+                continue
+            level = len(match.group(1))
+            
+            # Primer encabezado puede ser cualquier nivel
+            if self._current_level and level > self._current_level + 1:
+                logger.warning(f"⚠️  Salto de jerarquía: H{self._current_level} → H{level}")
+                self.valid_hierarchy = False
+                continue
+            
+            self._current_level = level
+
+
 class MarkdownNormalizer:
     """Normalizador robusto de Markdown con fidelidad."""
     
-    def __init__(self):
+    def __init__(self, max_logged_changes: int = MAX_LOGGED_CHANGES,
+                 profile: Optional["NormalizationProfile"] = None):
+        """
+        Args:
+            max_logged_changes: Cambios guardados en memoria por documento
+            profile: Perfil de normalización (conversion_profiles). Sus
+                patrones se compilan aquí y las fases que desactiva no se
+                ejecutan; usar get_normalizer() para compilarlo una sola vez
+        """
+        self.max_logged_changes = max_logged_changes
         self.heading_map = {}  # Mapeo: (semantic_level) → (markdown_level)
-        self.changes_log = []
+        self.changes_log = ChangeLog(max_logged_changes)
+        
+        # Reglas del perfil (sin perfil: comportamiento estándar)
+        self.profile = profile
+        self.cleanup_metadata = not (profile and profile.preserve_metadata)
+        self.merge_fragmented_lines = profile.merge_fragmented_lines if profile else True
+        self.min_line_length_for_merge = profile.min_line_length_for_merge if profile else 0
+        self.max_heading_level = max(1, min(profile.max_heading_level, 6)) if profile else 6
+        self.uppercase_is_heading = profile.uppercase_is_heading if profile else True
+        self._profile_line_re = _compile_profile_patterns(profile) if profile else None
+        self.strip_boilerplate = self.cleanup_metadata and (
+            profile.strip_boilerplate if profile else True
+        )
+        self.boilerplate_stats = _empty_boilerplate_stats()
+        
+        # Huella de las reglas efectivas (reportes por lotes: ver
+        # normalize_markdown_files); incluye NORMALIZER_VERSION
+        self.rules_id = _block_key([
+            NORMALIZER_VERSION, self.cleanup_metadata, self.merge_fragmented_lines,
+            self.min_line_length_for_merge, self.max_heading_level,
+            self.uppercase_is_heading, self.strip_boilerplate,
+            self._profile_line_re.pattern if self._profile_line_re is not None else None
+        ], [])
+    
+    def normalize(self, markdown: str, changes_stream: Optional[TextIO] = None,
+                  cache: Optional["NormalizationCache"] = None,
+                  section_tree: bool = False) -> Dict:
+        """
+        Pipeline completo de normalización.
+        
+        El estado (heading_map, changes_log) es por documento: se reinicia
+        en cada llamada, así un mismo normalizador sirve para miles de
+        documentos con memoria constante.
+        
+        Args:
+            markdown: Markdown a normalizar
+            changes_stream: Archivo de texto donde escribir todos los cambios
+                en JSONL (opcional; en memoria solo quedan max_logged_changes)
+            cache: Caché de bloques (ver _normalize_blocks); el resultado
+                es idéntico, solo se recalculan los bloques que cambiaron
+            section_tree: Agregar sections, el árbol de secciones con
+                offsets en la salida (ver _SectionTreeBuilder)
+        
+        Returns:
+            Dict con markdown, validation, changes (primeros cambios),
+            changes_count, changes_by_type, heading_map y boilerplate
+            (y cache con aciertos por etapa si se usó caché)
+        """
+        self._reset(changes_stream)
+        lines = markdown.split('\n')
+        for index in self._phase0_detect_boilerplate(lines):
+            lines[index] = ''
+        
+        if cache is not None:
+            return self._normalize_blocks(lines, cache, section_tree)
+        
+        # El texto ya está en memoria: limpiar una sola vez para ambas pasadas
+        cleaned = list(self._phase1_cleanup_metadata(lines))
+        output = []
+        result = self._normalize_lines(lambda: iter(cleaned), output.extend, section_tree)
+        return {"markdown": '\n'.join(output), **result}
+    
+    def normalize_stream(self, open_lines: Callable[[], Iterable[str]],
+                         write_line: Callable[[str], None],
+                         changes_stream: Optional[TextIO] = None,
+                         section_tree: bool = False) -> Dict:
+        """
+        Normaliza en streaming, sin tener el documento en memoria.
+        
+        Pasada 1 recorre las líneas y guarda solo los encabezados (para el
+        mapeo global de jerarquía); pasada 2 vuelve a leerlas y emite cada
+        línea normalizada y fusionada a write_line. La memoria depende del
+        número de encabezados, no del tamaño del documento. Con
+        strip_boilerplate una pasada previa cuenta los bordes de página.
+        
+        Args:
+            open_lines: Devuelve un iterador nuevo sobre las líneas de
+                entrada (sin salto de línea); se llama una vez por pasada
+            write_line: Recibe cada línea de salida (sin salto de línea)
+            changes_stream: Igual que en normalize()
+            section_tree: Igual que en normalize()
+        
+        Returns:
+            Igual que normalize(), sin la clave markdown
+        """
+        self._reset(changes_stream)
+        removed = self._phase0_detect_boilerplate(open_lines())
+        
+        def open_cleaned() -> Iterator[str]:
+            lines = open_lines()
+            if removed:
+                lines = ('' if index in removed else line for index, line in enumerate(lines))
+            return self._phase1_cleanup_metadata(lines)
+        
+        def write_lines(batch: List[str]):
+            for line in batch:
+                write_line(line)
+        
+        return self._normalize_lines(open_cleaned, write_lines, section_tree)
+    
+    def _reset(self, changes_stream: Optional[TextIO]):
+        """Reinicia el estado por documento."""
+        self.heading_map = {}
+        self.changes_log = ChangeLog(self.max_logged_changes, changes_stream)
+        self.boilerplate_stats = _empty_boilerplate_stats()
     
-    def normalize(self, markdown: str) -> Dict:
-        """Pipeline completo de normalización."""
+    def _normalize_lines(self, open_cleaned: Callable[[], Iterable[str]],
+                         write_lines: Callable[[List[str]], None],
+                         section_tree: bool = False) -> Dict:
+        """
+        Fases 2-5 y validación en dos pasadas sobre las líneas limpias.
         
+        La salida se emite a write_lines en lotes de OUTPUT_BATCH_LINES;
+        validación y árbol de secciones procesan cada lote entero.
+        """
         logger.info("="*60)
         logger.info("🔄 NORMALIZANDO MARKDOWN")
         logger.info("="*60)
         
-        # Fase 1: Limpieza de metadata
-        cleaned = self._phase1_cleanup_metadata(markdown)
-        logger.info(f"✅ Fase 1: {len(cleaned.splitlines())} líneas después limpieza")
-        
-        # Fase 2: Detección de encabezados
-        lines = cleaned.splitlines()
-        heading_info = self._phase2_detect_headings(lines)
+        # Pasada 1 - Fases 0, 1 y 2: limpieza y detección de encabezados
+        line_count = 0
+        heading_info = {}
+        for line_num, line in enumerate(open_cleaned()):
+            info = self._detect_heading(line_num, line)
+            if info is not None:
+                heading_info[line_num] = info
+            line_count += 1
+        stats = self.boilerplate_stats
+        if stats["lines_removed"]:
+            logger.info(f"✅ Fase 0: {stats['lines_removed']} líneas repetidas entre páginas "
+                        f"({stats['bytes_saved']} bytes, ~{stats['tokens_saved']} tokens)")
+        logger.info(f"✅ Fase 1: {line_count} líneas después limpieza")
         logger.info(f"✅ Fase 2: {len(heading_info)} encabezados detectados")
         
         # Fase 3: Análisis de profundidad
         self.heading_map = self._phase3_analyze_hierarchy(heading_info)
         logger.info(f"✅ Fase 3: Mapeo de jerarquía completado")
         
-        # Fase 4: Aplicar normalización
-        normalized_lines = self._phase4_apply_normalization(lines, heading_info)
+        # Pasada 2 - Fases 4 y 5: normalizar, fusionar, validar y emitir
+        validator = _LineValidator()
+        sections = _SectionTreeBuilder(self._section_headings(heading_info)) if section_tree else None
+        lines = self._phase4_apply_normalization(open_cleaned(), heading_info)
+        if self.merge_fragmented_lines:
+            lines = self._phase5_merge_fragmented_lines(lines)
+        for batch in iter(lambda: list(islice(lines, OUTPUT_BATCH_LINES)), []):
+            write_lines(batch)
+            validator.feed(batch)
+            if sections is not None:
+                sections.feed(batch)
         logger.info(f"✅ Fase 4: Normalización aplicada")
+        if self.merge_fragmented_lines:
+            logger.info(f"✅ Fase 5: Líneas fragmentadas fusionadas")
+        else:
+            logger.info(f"⏭️  Fase 5: Omitida por el perfil")
+        
+        result = self._result(validator.report())
+        if sections is not None:
+            result["sections"] = sections.report()
+        return result
+    
+    def _normalize_blocks(self, lines: List[str], cache: "NormalizationCache",
+                          section_tree: bool = False) -> Dict:
+        """
+        Fases 1-5 por bloques memoizados en cache.
+        
+        Los bloques se cortan en líneas '#' que la fase 1 nunca modifica
+        (_split_blocks): ahí se reinician las ventanas de limpieza, el
+        colapso de blancos y la fusión de párrafos, así que la salida es
+        la concatenación de las salidas de cada bloque. Dos etapas:
+        
+        - A (fases 1-2): clave = texto del bloque, línea siguiente, posición
+          y reglas de limpieza/detección. Guarda líneas limpias y encabezados
+        - B (fases 4-5): clave = etapa A, reglas de fusión y la parte del
+          mapeo de jerarquía que usan sus encabezados. Guarda la salida y
+          sus cambios
+        
+        El mapeo global (fase 3) y la validación se recalculan siempre.
+        Cambiar un patrón del perfil o el boilerplate solo invalida los
+        bloques con líneas afectadas; cambiar la fusión, solo la etapa B.
+        Con section_tree, la etapa B guarda además qué líneas de su salida
+        son encabezados (la caché solo tiene texto, sin _HeadingLine).
+        """
+        logger.info("="*60)
+        logger.info("🔄 NORMALIZANDO MARKDOWN (caché de bloques)")
+        logger.info("="*60)
+        
+        # Los patrones del perfil vacían líneas: aplicarlos antes de cortar,
+        # así un cambio de patrón solo altera el texto de los bloques tocados
+        if self.cleanup_metadata and self._profile_line_re is not None:
+            lines = list(self._drop_profile_lines(lines))
+        blocks = _split_blocks(lines)
+        next_lines = [block[0] for block in blocks[1:]] + [None]
+        
+        # Etapa A - Fases 1 y 2: limpieza y detección por bloque
+        rules_a = [NORMALIZER_VERSION, "A", self.cleanup_metadata, self.uppercase_is_heading]
+        keys_a = [_block_key(rules_a + [i == 0, next_line], block)
+                  for i, (block, next_line) in enumerate(zip(blocks, next_lines))]
+        entries_a = {key: meta for key, (meta, _) in cache.get_many(keys_a, lines=False).items()}
+        hits_a = len(entries_a)
+        cleaned_blocks = {}  # Líneas limpias: solo se leen si falta la etapa B
+        for i, (key, block, next_line) in enumerate(zip(keys_a, blocks, next_lines)):
+            if key not in entries_a:
+                cleaned, headings = self._clean_block(block, i == 0, next_line)
+                entries_a[key] = {"count": len(cleaned), "headings": headings}
+                cleaned_blocks[key] = cleaned
+                cache.put(key, entries_a[key], cleaned)
+        
+        # Fase 3: mapeo global con los encabezados de todos los bloques
+        heading_info = {}
+        block_headings = []
+        offset = 0
+        for key in keys_a:
+            entry = entries_a[key]
+            local = {}
+            for row in entry["headings"]:
+                local[row[0]] = _heading_from_row(row)
+                heading_info[offset + row[0]] = _heading_from_row(row, offset)
+            block_headings.append(local)
+            offset += entry["count"]
+        logger.info(f"✅ Fase 1: {offset} líneas después limpieza")
+        logger.info(f"✅ Fase 2: {len(heading_info)} encabezados detectados")
+        self.heading_map = self._phase3_analyze_hierarchy(heading_info)
+        logger.info(f"✅ Fase 3: Mapeo de jerarquía completado")
         
-        # Fase 5: Fusión de líneas fragmentadas
-        normalized_lines = self._phase5_merge_fragmented_lines(normalized_lines)
-        logger.info(f"✅ Fase 5: Líneas fragmentadas fusionadas")
+        # Etapa B - Fases 4 y 5: solo cambian si cambia la parte del mapeo
+        # (o el nivel máximo) que usan los encabezados del bloque
+        keys_b = []
+        for key, local in zip(keys_a, block_headings):
+            depths = sorted({len(info.semantic_level) for info in local.values() if info.semantic_level})
+            used_map = [[depth, self.heading_map.get(depth)] for depth in depths]
+            keys_b.append(_block_key([NORMALIZER_VERSION, "B", key, self.merge_fragmented_lines,
+                                      self.min_line_length_for_merge,
+                                      self.max_heading_level if local else None, used_map], []))
+        entries_b = cache.get_many(keys_b)
+        hits_b = len(entries_b)
+        block_sections = {}  # Índices de encabezados en la salida de cada bloque
+        if section_tree:
+            stored = cache.get_many([key_b + ":sections" for key_b in keys_b], lines=False)
+            block_sections = {key[:-len(":sections")]: meta for key, (meta, _) in stored.items()}
+        missing = [key for key, key_b in zip(keys_a, keys_b)
+                   if (key_b not in entries_b or (section_tree and key_b not in block_sections))
+                   and key not in cleaned_blocks]
+        for key, (_, cleaned) in cache.get_many(missing).items():
+            cleaned_blocks[key] = cleaned
         
-        # Convertir a string
-        normalized = '\n'.join(normalized_lines)
+        validator = _LineValidator()
+        sections = _SectionTreeBuilder(self._section_headings(heading_info)) if section_tree else None
+        output = []
+        offset = 0
+        new_changes = {}  # Cambios de los bloques recalculados (aún sin guardar)
+        for key_a, key_b, local in zip(keys_a, keys_b, block_headings):
+            if key_b in entries_b and (not section_tree or key_b in block_sections):
+                counts, block_output = entries_b[key_b]
+            else:
+                block_output, changes = self._normalize_block(cleaned_blocks[key_a], local)
+                counts = _count_changes(changes)
+                new_changes[key_b] = changes
+                if key_b not in entries_b:
+                    cache.put(key_b, counts, block_output)
+                if section_tree:
+                    block_sections[key_b] = [i for i, line in enumerate(block_output)
+                                             if type(line) is _HeadingLine]
+                    cache.put(key_b + ":sections", block_sections[key_b])
+            validator.feed(block_output)
+            if sections is not None:
+                sections.feed(block_output, block_sections[key_b])
+            output.extend(block_output)
+            
+            # Los cambios de un bloque se guardan y se leen solo cuando se
+            # registran (primeros max_logged_changes o changes_stream)
+            def block_changes(key_a=key_a, key_b=key_b, local=local) -> List[Dict]:
+                changes_key = key_b + ":changes"
+                if key_b in new_changes:
+                    changes = new_changes.pop(key_b)
+                else:
+                    stored = cache.get_many([changes_key], lines=False)
+                    if changes_key in stored:
+                        return stored[changes_key][0]
+                    if key_a not in cleaned_blocks:
+                        cleaned_blocks[key_a] = cache.get_many([key_a])[key_a][1]
+                    _, changes = self._normalize_block(cleaned_blocks[key_a], local)
+                cache.put(changes_key, changes)
+                return changes
+            
+            self.changes_log.extend(
+                block_changes, counts,
+                lambda change, offset=offset: _offset_change(change, offset)
+            )
+            offset += entries_a[key_a]["count"]
+        cache.commit()
         
-        # Validación final
-        validation = self._validate(normalized)
+        logger.info(f"✅ Fases 4-5: {len(blocks)} bloques "
+                    f"(caché: {hits_a} limpieza, {hits_b} normalización)")
+        result = self._result(validator.report())
+        if sections is not None:
+            result["sections"] = sections.report()
+        result["cache"] = {"blocks": len(blocks), "phase1_hits": hits_a, "phase4_hits": hits_b}
+        return {"markdown": '\n'.join(output), **result}
+    
+    def _clean_block(self, block: List[str], first: bool,
+                     next_line: Optional[str]) -> Tuple[List[str], List[list]]:
+        """Etapa A de un bloque: líneas limpias y encabezados (línea relativa)."""
+        if next_line is None:
+            cleaned = list(self._phase1_cleanup_metadata(block, strip_start=first))
+        else:
+            # La línea siguiente da el contexto de la última ventana de
+            # limpieza; su salida (ella misma, es un límite) se descarta
+            cleaned = list(self._phase1_cleanup_metadata(
+                block + [next_line], strip_start=first, strip_end=False
+            ))
+            del cleaned[len(cleaned) - len(_physical_lines(next_line)):]
         
+        headings = []
+        for line_num, line in enumerate(cleaned):
+            info = self._detect_heading(line_num, line)
+            if info is not None:
+                headings.append([line_num, info.original_text, info.original_level,
+                                 info.semantic_level, info.numbering_pattern,
+                                 info.is_detected_heading, info.confidence])
+        return cleaned, headings
+    
+    def _normalize_block(self, cleaned: List[str],
+                         heading_info: Dict[int, HeadingInfo]) -> Tuple[List[str], List[Dict]]:
+        """Etapa B de un bloque: salida de fases 4-5 y sus cambios (línea relativa)."""
+        log = self.changes_log
+        self.changes_log = changes = []
+        try:
+            lines = self._phase4_apply_normalization(cleaned, heading_info)
+            if self.merge_fragmented_lines:
+                lines = self._phase5_merge_fragmented_lines(lines)
+            output = list(lines)
+        finally:
+            self.changes_log = log
+        return output, changes
+    
+    def _result(self, validation: Dict) -> Dict:
+        """Registra el resultado final y arma el dict común de normalize*."""
         logger.info("="*60)
         logger.info(f"📊 RESULTADO FINAL")
         logger.info(f"  Fidelidad: {validation['fidelity_score']:.1f}%")
@@ -80,210 +743,323 @@ class MarkdownNormalizer:
         logger.info("="*60)
         
         return {
-            "markdown": normalized,
             "validation": validation,
-            "changes": self.changes_log,
-            "heading_map": self.heading_map
+            "changes": self.changes_log.entries,
+            "changes_count": self.changes_log.total,
+            "changes_by_type": dict(self.changes_log.counts),
+            "heading_map": self.heading_map,
+            "boilerplate": dict(self.boilerplate_stats)
         }
     
+    # ========== FASE 0: BOILERPLATE ENTRE PÁGINAS ==========
+    
+    def _phase0_detect_boilerplate(self, lines: Iterable[str]) -> Dict[int, int]:
+        """
+        Detecta líneas repetidas en los bordes de la mayoría de páginas.
+        
+        Las páginas son los bloques entre separadores "---" (los que emite
+        _join_with_page_separators). De cada una se toman las primeras y
+        últimas BOILERPLATE_EDGE_LINES líneas con contenido; una clave
+        (_boilerplate_key) que aparece en al menos BOILERPLATE_PAGE_FRACTION
+        de las páginas es boilerplate. Cada línea eliminada se cuenta en
+        boilerplate_stats y se registra como cambio.
+        
+        Returns:
+            {índice de línea: página} de las líneas a eliminar
+        """
+        if not self.strip_boilerplate:
+            return {}
+        
+        edges = []  # (página, índice, línea, clave) de los bordes candidatos
+        keys: Dict[str, Optional[str]] = {}  # Clave por texto: el boilerplate se repite
+        pages = 0
+        for pages, index, line in _page_edges(lines):
+            if line in keys:
+                key = keys[line]
+            else:
+                key = keys[line] = _boilerplate_key(line)
+            if key is not None:
+                edges.append((pages, index, line, key))
+        
+        if pages < BOILERPLATE_MIN_PAGES:
+            return {}
+        
+        # Páginas distintas por clave (los bordes llegan en orden de página)
+        page_counts: Dict[str, int] = {}
+        last_page: Dict[str, int] = {}
+        for page, _, _, key in edges:
+            if last_page.get(key) != page:
+                last_page[key] = page
+                page_counts[key] = page_counts.get(key, 0) + 1
+        min_count = pages * BOILERPLATE_PAGE_FRACTION
+        boilerplate = {key for key, count in page_counts.items() if count >= min_count}
+        
+        stats = self.boilerplate_stats
+        stats["pages"] = pages
+        stats["patterns"] = len(boilerplate)
+        removed = {}
+        for page, index, line, key in edges:
+            if key in boilerplate:
+                removed[index] = page
+                stats["lines_removed"] += 1
+                stats["bytes_saved"] += len(line.encode('utf-8')) + 1
+                stats["tokens_saved"] += estimate_tokens(line)
+                self.changes_log.append({
+                    "type": "boilerplate_removed",
+                    "page": page,
+                    "text": line.strip()[:60]
+                })
+        return removed
+    
     # ========== FASE 1: LIMPIEZA DE METADATA ==========
     
-    def _phase1_cleanup_metadata(self, markdown: str) -> str:
-        """Elimina metadata no semántica."""
+    def _phase1_cleanup_metadata(self, lines: Iterable[str], strip_start: bool = True,
+                                 strip_end: bool = True) -> Iterator[str]:
+        """
+        Elimina metadata no semántica.
+        
+        Equivale a aplicar los patrones de fase 1 al texto completo,
+        colapsar líneas en blanco, strip() y splitlines(), pero línea a
+        línea: los patrones solo se aplican a ventanas entre líneas límite
+        (ver _is_cleanup_boundary), que ningún match puede cruzar.
+        strip_start/strip_end en False limpian un tramo interior del
+        documento (sin quitar blancos de sus extremos).
+        """
+        last = None  # Última línea con contenido (pendiente del strip final)
+        blanks = []  # Líneas en blanco después de `last`
+        previous_empty = False
+        
+        if self.cleanup_metadata:
+            if self._profile_line_re is not None:
+                lines = self._drop_profile_lines(lines)
+            lines = self._cleanup_windows(lines)
+        
+        for line in lines:
+            # Múltiples líneas en blanco → una sola
+            if not line:
+                if previous_empty:
+                    continue
+                previous_empty = True
+            else:
+                previous_empty = False
+            
+            # strip() del documento: descartar blancos al inicio y al final
+            if not line or line.isspace():
+                if last is not None:
+                    blanks.append(line)
+                elif not strip_start:
+                    yield from _physical_lines(line)
+                continue
+            if last is None:
+                if strip_start:
+                    line = line.lstrip()
+            else:
+                yield from _physical_lines(last)
+                for blank in blanks:
+                    yield from _physical_lines(blank)
+                blanks = []
+            last = line
+        
+        if last is not None and strip_end:
+            yield from _physical_lines(last.rstrip())
+        elif last is not None:
+            yield from _physical_lines(last)
+            for blank in blanks:
+                yield from _physical_lines(blank)
+    
+    def _drop_profile_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        """Vacía las líneas que coinciden con los patrones del perfil."""
+        matches = self._profile_line_re.fullmatch
+        for line in lines:
+            yield '' if matches(line) else line
+    
+    def _cleanup_windows(self, lines: Iterable[str]) -> Iterator[str]:
+        """Aplica los patrones de fase 1 ventana por ventana."""
+        before = None
+        window = []
+        
+        for line in lines:
+            if self._is_cleanup_boundary(line):
+                yield from self._cleanup_window(before, window, line)
+                yield line
+                before = line
+                window = []
+            else:
+                window.append(line)
+        
+        yield from self._cleanup_window(before, window, None)
+    
+    @staticmethod
+    def _is_cleanup_boundary(line: str) -> bool:
+        """¿Ningún patrón de fase 1 puede tocar ni cruzar esta línea?"""
+        if line.startswith('#'):
+            return not _CLEANUP_CANDIDATE_RE.match(line)
+        
+        stripped = line.lstrip()
+        if not stripped:
+            return False  # `\s*` cruza líneas en blanco
+        return stripped[0] not in _CONTINUATION_CHARS and not stripped[0].isdigit()
+    
+    def _cleanup_window(self, before: Optional[str], window: List[str],
+                        after: Optional[str]) -> List[str]:
+        """
+        Limpia las líneas entre dos límites.
+        
+        Los límites se incluyen en el texto para que `^`, `$` y los saltos
+        de línea a su alrededor se comporten igual que en el documento
+        completo; ningún patrón los modifica.
+        """
+        # Todos los patrones empiezan con '#' o '---' al inicio de línea
+        if not any(line.startswith(('#', '-')) for line in window):
+            return window
+        
+        text = '\n'.join(
+            ([before] if before is not None else []) + window + ([after] if after is not None else [])
+        )
         
         # Patrón: "Página X", "Page X", etc.
-        markdown = re.sub(r'^#+\s*(?:Página|Page)\s*\d+\s*$', '', markdown, flags=re.MULTILINE)
+        text = _PAGE_MARKER_RE.sub('', text)
         
         # Patrón: "---" (separadores vacíos solos)
-        markdown = re.sub(r'^---\s*$\n', '', markdown, flags=re.MULTILINE)
+        text = _SEPARATOR_RE.sub('', text)
         
         # Footer/header patterns
-        patterns_to_remove = [
-            r'^#{1,6}\s*(?:©|®|™|All rights|Derechos reservados).*$',
-            r'^#{1,6}\s*(?:Footer|Header|Pie de página).*$',
-            r'^#{1,6}\s*(?:\d+|-|—)\s*$',  # Solo números o guiones
-            r'^#{1,6}\s*[ivxIVX]+\s*$',  # Solo números romanos
-        ]
-        
-        for pattern in patterns_to_remove:
-            markdown = re.sub(pattern, '', markdown, flags=re.MULTILINE)
-        
-        # Múltiples líneas en blanco → una sola
-        markdown = re.sub(r'\n\n+', '\n\n', markdown)
+        for pattern in _FOOTER_PATTERNS:
+            text = pattern.sub('', text)
         
-        return markdown.strip()
+        if before is not None:
+            text = text[len(before) + 1:]
+        if after is None:
+            return text.split('\n')
+        # Lo que queda antes de `after` termina en '\n' (o está vacío)
+        return text[:len(text) - len(after)].split('\n')[:-1]
     
     # ========== FASE 2: DETECCIÓN DE ENCABEZADOS ==========
     
-    def _phase2_detect_headings(self, lines: List[str]) -> Dict[int, HeadingInfo]:
-        """Detecta encabezados por múltiples heurísticas."""
+    def _detect_heading(self, line_num: int, line: str) -> Optional[HeadingInfo]:
+        """
+        Detecta si una línea es encabezado por múltiples heurísticas.
         
-        heading_info = {}
+        Solo mira la línea, así la pasada 1 guarda únicamente encabezados.
+        """
         
-        for line_num, line in enumerate(lines):
-            # Ya es markdown heading?
-            md_match = re.match(r'^(#+)\s+(.+)$', line)
-            if md_match:
-                level = len(md_match.group(1))
-                text = md_match.group(2).strip()
-                
-                # FILTRO: Si es un párrafo que NO debería ser encabezado, omitir
-                # Ej: "## A Dios y a la virgencita..." es párrafo, NO encabezado
-                is_paragraph_like = (
-                    len(text) > 100 or  # Muy largo para ser encabezado
-                    (text.startswith('A ') and not text[2:3].isupper()) or  # "A dios...", "A mis..."
-                    text.endswith(('.', ','))  # Termina con puntuación (párrafo)
-                )
-                
-                if is_paragraph_like:
-                    # No es encabezado, omitir
-                    continue
-                
-                # Detectar patrón semántico
-                semantic = self._extract_semantic_level(text)
-                
-                heading_info[line_num] = HeadingInfo(
-                    original_text=text,
-                    original_level=level,
-                    semantic_level=semantic,
-                    numbering_pattern=self._extract_numbering(text),
-                    is_detected_heading=True,
-                    confidence=0.95,
-                    line_number=line_num
-                )
+        # Ya es markdown heading?
+        md_match = _MD_HEADING_RE.match(line)
+        if md_match:
+            level = len(md_match.group(1))
+            text = md_match.group(2).strip()
             
-            # Heurística 1: TEXTO EN MAYÚSCULAS (probablemente encabezado)
-            # Pero EVITAR párrafos largos que casualmente comienzan con mayúsculas
-            elif (line.strip() and line.isupper() and 10 <= len(line) <= 150 and 
-                  not line.startswith('A ') and  # Párrafos "A Dios...", "A mis padres..."
-                  not re.match(r'^[A-Z]\s+[a-z]', line)):  # "A mis...", "A nuestros..."
-                heading_info[line_num] = HeadingInfo(
-                    original_text=line,
-                    original_level=2,  # Default H2
-                    semantic_level=None,
-                    numbering_pattern=None,
-                    is_detected_heading=False,
-                    confidence=0.70,
-                    line_number=line_num
-                )
+            # FILTRO: Si es un párrafo que NO debería ser encabezado, omitir
+            # Ej: "## A Dios y a la virgencita..." es párrafo, NO encabezado
+            is_paragraph_like = (
+                len(text) > 100 or  # Muy largo para ser encabezado
+                (text.startswith('A ') and not text[2:3].isupper()) or  # "A dios...", "A mis..."
+                text.endswith(('.', ','))  # Termina con puntuación (párrafo)
+            )
+            
+            if is_paragraph_like:
+                # No es encabezado, omitir
+                return None
+            
+            # Detectar patrón semántico (nivel + numeración en un match)
+            semantic, numbering = self._parse_numbering(text)
+            
+            return HeadingInfo(
+                original_text=text,
+                original_level=level,
+                semantic_level=semantic,
+                numbering_pattern=numbering,
+                is_detected_heading=True,
+                confidence=0.95,
+                line_number=line_num
+            )
         
-        return heading_info
+        # Heurística 1: TEXTO EN MAYÚSCULAS (probablemente encabezado)
+        # Pero EVITAR párrafos largos que casualmente comienzan con mayúsculas
+        if (self.uppercase_is_heading and line.strip() and line.isupper() and 10 <= len(line) <= 150 and 
+              not line.startswith('A ') and  # Párrafos "A Dios...", "A mis padres..."
+              not _LETTER_THEN_LOWER_RE.match(line)):  # "A mis...", "A nuestros..."
+            return HeadingInfo(
+                original_text=line,
+                original_level=2,  # Default H2
+                semantic_level=None,
+                numbering_pattern=None,
+                is_detected_heading=False,
+                confidence=0.70,
+                line_number=line_num
+            )
+        
+        return None
     
-    def _extract_semantic_level(self, text: str) -> Optional[Tuple[int, ...]]:
+    def _parse_numbering(self, text: str) -> Tuple[Optional[Tuple[int, ...]], Optional[str]]:
         """
-        Extrae nivel semántico de numeración en múltiples formatos.
+        Extrae nivel semántico y numeración con un solo match de _NUMBERING_RE.
         
         Soporta:
         - Decimal: 1.2.3 → (1, 2, 3)
-        - Letras: A.1, B.2.1 → (10, 1), (11, 2, 1)
-        - Romano: I, II.1, III.2.1 → (1,), (2, 1), (3, 2, 1)
-        - Palabras: Capítulo 1, Parte II → (1,), (2,)
-        - Mixto: 1.A.2 → (1, 10, 2)
+        - Letras: A.1, B.2.1 → (100, 1), (101, 2, 1)
+        - Romano: II, III.1, iv → (202,), (203,), (204,) ("I" solo se lee como letra)
+        - Palabras: Capítulo 1, Parte II, Apéndice A → (1,), (202,), (100,)
+        
+        Las letras usan offset 100 y los romanos offset 200 para distinguir
+        el tipo de numeración en la fase 3.
+        
+        Returns:
+            (nivel semántico, numeración) o (None, None) si no hay numeración
         """
+        match = _NUMBERING_RE.match(text)
+        if not match:
+            return None, None
+        
+        groups = match.groupdict()
         
         # 1. PATRÓN DECIMAL: 1, 1.1, 1.2.3
-        decimal_pattern = r'^(\d+(?:\.\d+)*)[.\s:]+'
-        match = re.match(decimal_pattern, text)
-        if match:
-            numbering = match.group(1)
-            parts = tuple(int(x) for x in numbering.split('.'))
-            return parts
-        
-        # 2. PATRÓN CON LETRAS: A, A.1, B.2.3
-        # Formato común en apéndices, anexos
-        letter_pattern = r'^([A-Z])(?:\.(\d+(?:\.\d+)*))?[.\s:]+'
-        match = re.match(letter_pattern, text)
-        if match:
-            letter = match.group(1)
-            # Convertir letra a número (A=1, B=2, ..., Z=26)
-            # Para distinguir de números normales, usar offset 100
-            letter_num = ord(letter) - ord('A') + 100
-            
-            if match.group(2):  # Hay números después: A.1.2
-                sub_nums = tuple(int(x) for x in match.group(2).split('.'))
-                return (letter_num,) + sub_nums
-            else:  # Solo letra: A
-                return (letter_num,)
-        
-        # 3. PATRÓN ROMANO: I, II, III, IV, etc.
-        # Común en capítulos de libros, partes principales
-        roman_pattern = r'^([IVXLCDMivxlcdm]+)[.\s:]+'
-        match = re.match(roman_pattern, text)
-        if match:
-            roman = match.group(1).upper()
-            try:
-                num = self._roman_to_int(roman)
-                # Usar offset 200 para distinguir de otros tipos
-                return (200 + num,)
-            except ValueError:
-                pass  # No es romano válido
-        
-        # 4. PALABRAS CLAVE: "Capítulo 1", "Parte II", "Sección A"
-        keyword_patterns = [
-            (r'^(?:Capítulo|Chapter|CAPÍTULO|CHAPTER)\s+(\d+)', 1),  # Capítulo 1
-            (r'^(?:Capítulo|Chapter|CAPÍTULO|CHAPTER)\s+([IVX]+)', 200),  # Capítulo I
-            (r'^(?:Parte|Part|PARTE|PART)\s+(\d+)', 1),  # Parte 1
-            (r'^(?:Parte|Part|PARTE|PART)\s+([IVX]+)', 200),  # Parte II
-            (r'^(?:Sección|Section|SECCIÓN|SECTION)\s+(\d+)', 1),  # Sección 1
-            (r'^(?:Sección|Section|SECCIÓN|SECTION)\s+([A-Z])', 100),  # Sección A
-            (r'^(?:Apéndice|Appendix|APÉNDICE|APPENDIX)\s+([A-Z])', 100),  # Apéndice A
-            (r'^(?:Anexo|Annex|ANEXO|ANNEX)\s+(\d+)', 1),  # Anexo 1
-        ]
-        
-        for pattern, offset in keyword_patterns:
-            match = re.match(pattern, text)
-            if match:
-                value = match.group(1)
-                if value.isdigit():
-                    return (int(value) + offset - 1,)  # offset=1 no cambia
-                elif value.isalpha() and value.isupper():
-                    if offset == 200:  # Romano
-                        try:
-                            return (offset + self._roman_to_int(value),)
-                        except ValueError:
-                            pass
-                    elif offset == 100:  # Letra
-                        return (offset + ord(value) - ord('A'),)
+        if groups['decimal']:
+            numbering = groups['decimal']
+            return tuple(int(x) for x in numbering.split('.')), numbering
         
-        return None
+        # 2. PATRÓN CON LETRAS: A, A.1, B.2.3 (apéndices, anexos)
+        if groups['letter']:
+            letter_num = ord(groups['letter']) - ord('A') + 100
+            if groups['letter_sub']:  # Hay números después: A.1.2
+                sub_nums = tuple(int(x) for x in groups['letter_sub'].split('.'))
+                return (letter_num,) + sub_nums, f"{groups['letter']}.{groups['letter_sub']}"
+            return (letter_num,), groups['letter']
+        
+        # 3. PALABRAS CLAVE: "Capítulo 1", "Anexo 2"
+        if groups['keyword_number']:
+            return (int(groups['keyword_number']),), groups['keyword_number']
+        
+        # 4. PALABRAS CLAVE: "Sección A", "Apéndice B"
+        if groups['keyword_letter']:
+            value = groups['keyword_letter']
+            return (100 + ord(value) - ord('A'),), value
+        
+        # 5. PATRÓN ROMANO: I, II, III ("Capítulo IV", "Parte II")
+        roman = groups['roman'] or groups['keyword_roman']
+        try:
+            return (200 + self._roman_to_int(roman),), roman
+        except ValueError:
+            return None, None  # No es romano válido
+    
+    def _extract_semantic_level(self, text: str) -> Optional[Tuple[int, ...]]:
+        """Extrae nivel semántico de numeración (ver _parse_numbering)."""
+        return self._parse_numbering(text)[0]
     
     def _extract_numbering(self, text: str) -> Optional[str]:
-        """Extrae string de numeración en cualquier formato."""
-        
-        # Probar múltiples patrones
-        patterns = [
-            r'^(\d+(?:\.\d+)*)',  # 1.2.3
-            r'^([A-Z](?:\.\d+)*)',  # A.1.2
-            r'^([IVXLCDMivxlcdm]+)',  # I, II, III
-            r'^(?:Capítulo|Chapter|CAPÍTULO|CHAPTER)\s+(\d+|[IVX]+)',
-            r'^(?:Parte|Part|PARTE|PART)\s+(\d+|[IVX]+)',
-            r'^(?:Sección|Section|SECCIÓN|SECTION)\s+(\d+|[A-Z])',
-            r'^(?:Apéndice|Appendix|APÉNDICE|APPENDIX)\s+([A-Z])',
-            r'^(?:Anexo|Annex|ANEXO|ANNEX)\s+(\d+)',
-        ]
-        
-        for pattern in patterns:
-            match = re.match(pattern, text)
-            if match:
-                return match.group(1)
-        
-        return None
+        """Extrae string de numeración en cualquier formato (ver _parse_numbering)."""
+        return self._parse_numbering(text)[1]
     
     def _roman_to_int(self, roman: str) -> int:
         """Convierte números romanos a enteros."""
-        roman_values = {
-            'I': 1, 'V': 5, 'X': 10, 'L': 50, 
-            'C': 100, 'D': 500, 'M': 1000
-        }
-        
         total = 0
         prev_value = 0
         
         for char in reversed(roman.upper()):
-            if char not in roman_values:
+            if char not in _ROMAN_VALUES:
                 raise ValueError(f"Carácter romano inválido: {char}")
             
-            value = roman_values[char]
+            value = _ROMAN_VALUES[char]
             if value < prev_value:
                 total -= value
             else:
@@ -357,7 +1133,7 @@ class MarkdownNormalizer:
         # Crear mapeo: profundidad → nivel H
         for i, depth in enumerate(sorted_depths):
             markdown_level = base_offset + i
-            heading_map[depth] = min(markdown_level, 6)  # H6 máximo
+            heading_map[depth] = min(markdown_level, self.max_heading_level)  # H6 o el máximo del perfil
         
         logger.info(f"  Mapeo de profundidad: {heading_map}")
         logger.info(f"  Offset base: {base_offset} (has_h1={has_h1})")
@@ -366,181 +1142,561 @@ class MarkdownNormalizer:
     
     # ========== FASE 4: APLICAR NORMALIZACIÓN ==========
     
-    def _phase4_apply_normalization(self, lines: List[str], 
-                                     heading_info: Dict[int, HeadingInfo]) -> List[str]:
+    def _phase4_apply_normalization(self, lines: Iterable[str], 
+                                     heading_info: Dict[int, HeadingInfo]) -> Iterator[str]:
         """Aplica normalización de jerarquía."""
         
-        normalized_lines = []
-        
         for line_num, line in enumerate(lines):
-            if line_num in heading_info:
-                info = heading_info[line_num]
-                
-                # Determinar nivel correcto
-                if info.semantic_level:
-                    depth = len(info.semantic_level)
-                    new_level = self.heading_map.get(depth, depth + 1)
-                    
-                    # Log información de transformación
-                    if depth in self.heading_map:
-                        self.changes_log.append({
-                            "line": line_num,
-                            "type": "semantic_mapping",
-                            "semantic_level": info.semantic_level,
-                            "depth": depth,
-                            "mapped_to": f"H{new_level}",
-                            "numbering": info.numbering_pattern
-                        })
-                else:
-                    # Sin numeración semántica, mantener original
-                    new_level = info.original_level
-                
-                # Reconstruir línea
-                new_hashes = '#' * new_level
-                normalized_line = f"{new_hashes} {info.original_text}"
-                
-                # Log de cambios de nivel
-                if new_level != info.original_level:
-                    self.changes_log.append({
-                        "line": line_num,
-                        "type": "heading_level_change",
-                        "from": f"H{info.original_level}",
-                        "to": f"H{new_level}",
-                        "text": info.original_text[:50],
-                        "reason": "semantic_depth_mapping" if info.semantic_level else "unknown"
-                    })
-                
-                normalized_lines.append(normalized_line)
-            else:
-                normalized_lines.append(line)
+            info = heading_info.get(line_num)
+            if info is None:
+                yield line
+                continue
+            
+            # Determinar nivel correcto
+            new_level = self._target_level(info)
+            
+            # Log información de transformación
+            if info.semantic_level and len(info.semantic_level) in self.heading_map:
+                depth = len(info.semantic_level)
+                self.changes_log.append({
+                    "line": line_num,
+                    "type": "semantic_mapping",
+                    "semantic_level": info.semantic_level,
+                    "depth": depth,
+                    "mapped_to": f"H{self.heading_map[depth]}",
+                    "numbering": info.numbering_pattern
+                })
+            
+            # Reconstruir línea (marcada para el árbol de secciones)
+            new_hashes = '#' * new_level
+            normalized_line = _HeadingLine(f"{new_hashes} {info.original_text}")
+            
+            # Log de cambios de nivel
+            if new_level != info.original_level:
+                self.changes_log.append({
+                    "line": line_num,
+                    "type": "heading_level_change",
+                    "from": f"H{info.original_level}",
+                    "to": f"H{new_level}",
+                    "text": info.original_text[:50],
+                    "reason": "semantic_depth_mapping" if info.semantic_level else "unknown"
+                })
+            
+            yield normalized_line
+    
+    def _target_level(self, info: HeadingInfo) -> int:
+        """Nivel markdown final de un encabezado (mapeo de fase 3 y nivel máximo)."""
+        if info.semantic_level:
+            depth = len(info.semantic_level)
+            level = self.heading_map.get(depth, depth + 1)
+        else:
+            # Sin numeración semántica, mantener original
+            level = info.original_level
         
-        return normalized_lines
+        # Nivel máximo del perfil (7+ '#' no es encabezado markdown: no tocar)
+        if self.max_heading_level < level <= 6:
+            level = self.max_heading_level
+        return level
+    
+    def _section_headings(self, heading_info: Dict[int, HeadingInfo]) -> Iterator[Tuple[int, Optional[str], str]]:
+        """Encabezados en orden de salida para _SectionTreeBuilder."""
+        for line_num in sorted(heading_info):
+            info = heading_info[line_num]
+            yield self._target_level(info), info.numbering_pattern, info.original_text
     
     # ========== FASE 5: FUSIÓN DE LÍNEAS FRAGMENTADAS ==========
     
-    def _phase5_merge_fragmented_lines(self, lines: List[str]) -> List[str]:
-        """Fusiona líneas fragmentadas que pertenecen al mismo párrafo."""
+    def _phase5_merge_fragmented_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        """
+        Fusiona líneas fragmentadas que pertenecen al mismo párrafo.
         
-        merged = []
-        i = 0
+        Solo retiene el párrafo abierto. Las líneas en blanco que siguen a
+        un párrafo se descartan (se buscan continuaciones más allá de ellas);
+        las que siguen a un encabezado se mantienen.
         
-        while i < len(lines):
-            current = lines[i]
-            
-            # Si es encabezado o línea en blanco, dejar como está
-            if current.startswith('#') or not current.strip():
-                merged.append(current)
-                i += 1
-                continue
-            
-            # Heurística: ¿próxima línea continúa este párrafo?
-            # Indicadores:
-            # 1. Línea actual NO termina con puntuación fuerte
-            # 2. Próxima línea NO es encabezado
-            # 3. Próxima línea NO comienza con mayúscula (nueva oración)
-            
-            while i + 1 < len(lines):
-                next_line = lines[i + 1]
-                
+        El párrafo se guarda como lista de fragmentos y se une una sola vez
+        al cerrarlo: tiempo lineal aun con OCR de una palabra por línea.
+        """
+        
+        paragraph = []  # Fragmentos del párrafo abierto
+        length = 0  # len(' '.join(paragraph))
+        head = ''  # Primeros 61 caracteres del párrafo (para el log)
+        min_length = self.min_line_length_for_merge
+        
+        for line in lines:
+            if paragraph:
                 # Verificar si próxima línea existe y no está vacía
-                if not next_line.strip():
-                    i += 1
+                if not line.strip():
                     continue
                 
-                # ¿Debe fusionar?
+                # Heurística: ¿próxima línea continúa este párrafo?
+                # Indicadores:
+                # 1. Línea actual NO termina con puntuación fuerte
+                # 2. Próxima línea NO es encabezado
+                # 3. Próxima línea NO comienza con mayúscula (nueva oración)
+                # 4. Línea actual alcanza el largo mínimo del perfil (las
+                #    líneas cortas rara vez son cortes de página)
                 should_merge = (
-                    current.strip() and  # Línea actual no vacía
-                    not next_line.startswith('#') and  # No es encabezado
-                    not current.rstrip().endswith(('.', '!', '?', ':', ';')) and  # No termina con puntuación
-                    (len(next_line) > 0 and not next_line[0].isupper())  # Próxima NO comienza con mayúscula
+                    not line.startswith('#') and  # No es encabezado
+                    not paragraph[-1].rstrip().endswith(('.', '!', '?', ':', ';')) and  # No termina con puntuación
+                    not line[0].isupper() and  # Próxima NO comienza con mayúscula
+                    (not min_length or len(paragraph[-1].strip()) >= min_length)
                 )
                 
                 if should_merge:
-                    current = current.rstrip() + " " + next_line.strip()
-                    i += 1
+                    if len(paragraph) == 1:
+                        paragraph[0] = paragraph[0].rstrip()
+                        length = len(paragraph[0])
+                        head = paragraph[0][:61]
+                    fragment = line.strip()
+                    paragraph.append(fragment)
+                    length += 1 + len(fragment)
+                    if len(head) <= 60:
+                        head = (head + " " + fragment)[:61]
                     
                     self.changes_log.append({
                         "type": "line_merge",
-                        "result": current[:60] + "..." if len(current) > 60 else current
+                        "result": head[:60] + "..." if length > 60 else head
                     })
-                else:
-                    break
+                    continue
+                
+                yield ' '.join(paragraph)
+                paragraph = []
             
-            merged.append(current)
-            i += 1
+            # Si es encabezado o línea en blanco, dejar como está
+            if line.startswith('#') or not line.strip():
+                yield line
+            else:
+                paragraph = [line]
         
-        return merged
+        if paragraph:
+            yield ' '.join(paragraph)
     
     # ========== VALIDACIÓN ==========
     
     def _validate(self, markdown: str) -> Dict:
         """Valida fidelidad del markdown."""
-        
-        checks = {
-            "has_h1": bool(re.search(r'^#\s+', markdown, re.MULTILINE)),
-            "no_duplicate_hashes": not bool(re.search(r'^###+\s*##', markdown, re.MULTILINE)),
-            "valid_hierarchy": self._check_valid_hierarchy(markdown),
-            "no_metadata_markers": not bool(re.search(r'^#{1,6}\s*(?:Página|Page)\s*\d', markdown, re.MULTILINE)),
-            "proper_spacing": not bool(re.search(r'\n\n\n+', markdown))
-        }
-        
-        score = sum(checks.values()) / len(checks) * 100
-        
-        return {
-            "fidelity_score": score,
-            "checks": checks,
-            "warnings": [k for k, v in checks.items() if not v]
-        }
+        validator = _LineValidator()
+        validator.feed(markdown.split('\n'))
+        return validator.report()
+
+
+# Normalizadores compilados por hilo y contenido del perfil (None = estándar)
+_NORMALIZERS = threading.local()
+
+
+def get_normalizer(profile: Optional["NormalizationProfile"] = None) -> MarkdownNormalizer:
+    """
+    Normalizador compilado para un perfil, cacheado por sus valores.
+    
+    La primera llamada compila los patrones, fases y umbrales del perfil;
+    las siguientes con un perfil de mismos valores reutilizan la instancia
+    (un perfil editado o distinto con el mismo nombre compila otra). Sin
+    perfil devuelve el normalizador estándar.
+    
+    Cada instancia guarda estado del documento en curso, así que la caché
+    es por hilo: cada hilo compila y usa sus propias instancias (y cada
+    worker de multiprocessing, las de su proceso).
+    """
+    key = _profile_key(profile) if profile is not None else None
+    cache = getattr(_NORMALIZERS, "by_key", None)
+    if cache is None:
+        cache = _NORMALIZERS.by_key = {}
+    normalizer = cache.get(key)
+    if normalizer is None:
+        normalizer = cache[key] = MarkdownNormalizer(profile=profile)
+        if profile is not None:
+            logger.info(f"🧩 Normalizador compilado para perfil: {profile.name}")
+    return normalizer
+
+
+def _profile_key(profile: "NormalizationProfile") -> str:
+    """Clave de caché con todos los campos del perfil (JSON canónico)."""
+    fields = asdict(profile) if is_dataclass(profile) else vars(profile)
+    return json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _compile_profile_patterns(profile: "NormalizationProfile") -> Optional[re.Pattern]:
+    """
+    Une page_marker/footer/header del perfil en una regex de línea completa.
+    
+    Coinciden líneas enteras, con '#' y espacios opcionales alrededor
+    (ej: "Página\\s+\\d+" elimina "Página 3" y "## Página 3").
+    """
+    patterns = [pattern for pattern in (
+        profile.page_marker_pattern, profile.footer_pattern, profile.header_pattern
+    ) if pattern]
+    if not patterns:
+        return None
+    
+    try:
+        return re.compile(r'#*\s*(?:' + '|'.join(f'(?:{pattern})' for pattern in patterns) + r')\s*')
+    except re.error as e:
+        raise ValueError(f"Patrón inválido en perfil '{profile.name}': {e}") from e
+
+
+def _split_blocks(lines: List[str]) -> List[List[str]]:
+    """
+    Corta las líneas en bloques para la caché.
+    
+    Cada bloque (salvo el primero) empieza en una línea '#' que la fase 1
+    no puede borrar ni extender (no coincide con _CLEANUP_CANDIDATE_RE),
+    elegida por su contenido: 1 de cada NORMALIZATION_BLOCK_SPACING en
+    promedio (crc32, estable entre procesos). Los cortes no dependen de lo
+    que hay antes, así editar un bloque no desplaza los siguientes.
+    """
+    starts = [0] + [
+        index for index, line in enumerate(lines)
+        if index and line.startswith('#')
+        and zlib.crc32(line.encode('utf-8', 'surrogatepass')) % NORMALIZATION_BLOCK_SPACING == 0
+        and not _CLEANUP_CANDIDATE_RE.match(line)
+    ]
+    starts.append(len(lines))
+    return [lines[start:end] for start, end in zip(starts, starts[1:])]
+
+
+def _block_key(rules: list, block: List[str]) -> str:
+    """Clave de caché: hash de las reglas (serializables en JSON) y el bloque."""
+    digest = hashlib.blake2b(json.dumps(rules).encode('ascii'), digest_size=16)
+    # JSON escapa '\0' y las líneas no contienen '\n': la concatenación es unívoca
+    digest.update(b'\0')
+    digest.update('\n'.join(block).encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+def _count_changes(changes: List[Dict]) -> Dict[str, int]:
+    """Cambios por tipo (igual que ChangeLog.counts)."""
+    counts: Dict[str, int] = {}
+    for change in changes:
+        change_type = change.get("type", "unknown")
+        counts[change_type] = counts.get(change_type, 0) + 1
+    return counts
+
+
+def _heading_from_row(row: list, offset: int = 0) -> HeadingInfo:
+    """HeadingInfo desde una fila de la etapa A (JSON: listas en vez de tuplas)."""
+    line_num, text, level, semantic, numbering, detected, confidence = row
+    return HeadingInfo(
+        original_text=text,
+        original_level=level,
+        semantic_level=tuple(semantic) if semantic is not None else None,
+        numbering_pattern=numbering,
+        is_detected_heading=detected,
+        confidence=confidence,
+        line_number=offset + line_num
+    )
+
+
+def _offset_change(change: Dict, offset: int) -> Dict:
+    """Cambio de un bloque con la línea relativa llevada al documento."""
+    if "line" not in change:
+        return change
+    change = dict(change, line=change["line"] + offset)
+    if change.get("semantic_level") is not None:
+        change["semantic_level"] = tuple(change["semantic_level"])
+    return change
+
+
+class NormalizationCache:
+    """
+    Caché SQLite de resultados por bloque de MarkdownNormalizer.
     
-    def _check_valid_hierarchy(self, markdown: str) -> bool:
-        """Valida que la jerarquía sea semánticamente correcta."""
+    Cada entrada tiene metadata JSON y, opcionalmente, una lista de
+    líneas guardada como texto (sin JSON: es lo más voluminoso). Las
+    claves ya incluyen NORMALIZER_VERSION y las reglas del perfil: un
+    cambio de reglas no invalida nada, solo deja de encontrar las
+    entradas viejas. Borrar el archivo es seguro. Varios procesos pueden
+    compartirlo (WAL); cada uno debe abrir su propia instancia.
+    """
+    
+    def __init__(self, db_path: Path = DEFAULT_CACHE_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=CACHE_BUSY_TIMEOUT_MS / 1000)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS blocks (
+                key TEXT PRIMARY KEY,
+                meta TEXT NOT NULL,
+                line_count INTEGER,
+                lines TEXT
+            )
+        """)
+        self.conn.commit()
+        self._pending: Dict[str, Tuple[str, Optional[int], Optional[str]]] = {}
+    
+    def get_many(self, keys: List[str], lines: bool = True) -> Dict[str, Tuple[object, Optional[List[str]]]]:
+        """
+        Entradas encontradas para keys: {clave: (metadata, líneas)}.
         
-        current_level = 0
-        for match in re.finditer(r'^(#+)\s', markdown, re.MULTILINE):
-            level = len(match.group(1))
-            
-            # Primer encabezado puede ser cualquier nivel
-            if current_level == 0:
-                current_level = level
+        Las claves ausentes se omiten; con lines=False no se leen las
+        líneas (quedan en None).
+        """
+        found = {}
+        columns = "key, meta, line_count, lines" if lines else "key, meta, NULL, NULL"
+        unique = list(dict.fromkeys(keys))
+        # Lotes por debajo del límite de parámetros de SQLite
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT {columns} FROM blocks WHERE key IN ({', '.join('?' * len(batch))})", batch
+            )
+            for key, meta, line_count, text in rows:
+                block_lines = None
+                if line_count is not None:
+                    block_lines = text.split('\n') if line_count else []
+                found[key] = (json.loads(meta), block_lines)
+        return found
+    
+    def put(self, key: str, meta: object, lines: Optional[List[str]] = None):
+        """Guarda una entrada (se escribe en commit())."""
+        self._pending[key] = (
+            json.dumps(meta, ensure_ascii=False),
+            len(lines) if lines is not None else None,
+            '\n'.join(lines) if lines is not None else None
+        )
+    
+    def commit(self):
+        """Escribe las entradas pendientes en una transacción."""
+        if not self._pending:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO blocks (key, meta, line_count, lines) VALUES (?, ?, ?, ?)",
+                [(key, *values) for key, values in self._pending.items()]
+            )
+        self._pending = {}
+    
+    def close(self):
+        """Escribe lo pendiente y cierra la conexión."""
+        self.commit()
+        self.conn.close()
+    
+    def __enter__(self) -> "NormalizationCache":
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _empty_boilerplate_stats() -> Dict[str, int]:
+    """Contadores de fase 0 de un documento."""
+    return {"pages": 0, "patterns": 0, "lines_removed": 0, "bytes_saved": 0, "tokens_saved": 0}
+
+
+def _page_edges(lines: Iterable[str]) -> Iterator[Tuple[int, int, str]]:
+    """
+    (página, índice, línea) de los bordes de cada página con contenido.
+    
+    Bordes: primeras y últimas BOILERPLATE_EDGE_LINES líneas con contenido
+    entre separadores "---". Las listas se recorren por índices (solo se
+    visitan los bordes); otros iterables, línea a línea en streaming.
+    """
+    edge = BOILERPLATE_EDGE_LINES
+    page = 0
+    
+    if isinstance(lines, list):
+        separators = [i for i, line in enumerate(lines)
+                      if line.startswith('---') and line.rstrip() == '---']
+        for start, end in zip([-1] + separators, separators + [len(lines)]):
+            head = []
+            index = start + 1
+            while index < end and len(head) < edge:
+                if lines[index] and not lines[index].isspace():
+                    head.append(index)
+                index += 1
+            if not head:
                 continue
-            
-            # No puede saltar más de un nivel hacia abajo
-            if level > current_level + 1:
-                logger.warning(f"⚠️  Salto de jerarquía: H{current_level} → H{level}")
-                return False
-            
-            current_level = level
-        
-        return True
+            tail = []
+            last = end - 1
+            while last >= index and len(tail) < edge:
+                if lines[last] and not lines[last].isspace():
+                    tail.append(last)
+                last -= 1
+            page += 1
+            for i in head + tail[::-1]:
+                yield page, i, lines[i]
+        return
+    
+    head = []
+    tail = deque(maxlen=edge)
+    for index, line in enumerate(lines):
+        if line.startswith('---') and line.rstrip() == '---':
+            if head:
+                page += 1
+                for i, edge_line in (*head, *tail):
+                    yield page, i, edge_line
+            head = []
+            tail.clear()
+        elif line and not line.isspace():
+            if len(head) < edge:
+                head.append((index, line))
+            else:
+                tail.append((index, line))
+    if head:
+        page += 1
+        for i, edge_line in (*head, *tail):
+            yield page, i, edge_line
+
+
+def _boilerplate_key(line: str) -> Optional[str]:
+    """
+    Clave para comparar una línea de borde entre páginas (None si no aplica).
+    
+    Ignora mayúsculas, espacios y números ("Página 3 de 90" y "Página 4 de
+    90" comparten clave). Excluye tablas, bloques de código y las líneas
+    que la fase 1 ya elimina.
+    """
+    if line.startswith('#') and _CLEANUP_CANDIDATE_RE.match(line):
+        return None
+    text = ' '.join(line.split()).casefold()
+    if len(text) > BOILERPLATE_MAX_LINE_LENGTH or text.startswith(('|', '```', '~~~')):
+        return None
+    if _ROMAN_LINE_RE.fullmatch(text):
+        return '0'  # Numeración romana de páginas preliminares
+    return _NUMBER_RUN_RE.sub('0', text)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimación de tokens de text: palabras y signos de puntuación.
+    
+    Aproxima tokenizers BPE/WordPiece en español sin depender de ellos;
+    sirve para comparar ahorros, no para presupuestar contexto.
+    """
+    return len(_TOKEN_RE.findall(text))
+
+
+def _hash_line_starts(text: str) -> Iterator[int]:
+    """
+    Posiciones de las líneas de text que empiezan con '#'.
+    
+    Equivale a re.finditer(r'^#', text, re.MULTILINE), pero str.find
+    salta directo a cada "\n#" (la regex prueba cada posición: ~10x).
+    """
+    if text.startswith('#'):
+        yield 0
+    pos = text.find('\n#')
+    while pos != -1:
+        yield pos + 1
+        pos = text.find('\n#', pos + 1)
+
+
+def _physical_lines(line: str) -> List[str]:
+    """
+    Parte de str.splitlines() que aporta una línea ya separada por '\\n'.
+    
+    Una línea que termina en otro separador (\\u2028, \\x0c, ...) aporta
+    además la línea vacía que queda entre ese separador y el '\\n'.
+    """
+    return (line + '\n').splitlines()
+
+
+def _iter_file_lines(path: Path) -> Iterator[str]:
+    """Líneas de un archivo sin salto final (igual que f.read().split('\\n'))."""
+    with open(path, 'r', encoding='utf-8') as f:
+        line = ''
+        for line in f:
+            yield line[:-1] if line.endswith('\n') else line
+        if line == '' or line.endswith('\n'):
+            yield ''
 
 
 def normalize_markdown_file(markdown_path: Path, 
-                            output_path: Optional[Path] = None) -> Dict:
-    """Normaliza un archivo markdown."""
+                            output_path: Optional[Path] = None,
+                            stream_changes: bool = False,
+                            profile: Optional["NormalizationProfile"] = None,
+                            cache: Optional[NormalizationCache] = None,
+                            report_path: Optional[Path] = None,
+                            input_hash: Optional[str] = None,
+                            section_tree: bool = False) -> Dict:
+    """
+    Normaliza un archivo markdown en streaming (ver normalize_stream).
     
-    # Leer markdown
-    with open(markdown_path, 'r', encoding='utf-8') as f:
-        markdown = f.read()
+    Lee el archivo dos veces y escribe la salida línea a línea en un
+    temporal que reemplaza a output_path al terminar; el markdown
+    normalizado no queda en memoria ni en el resultado. Con cache el
+    documento se normaliza en memoria por bloques memoizados (ver
+    MarkdownNormalizer._normalize_blocks).
     
-    # Normalizar
-    normalizer = MarkdownNormalizer()
-    result = normalizer.normalize(markdown)
+    Args:
+        markdown_path: Markdown de entrada
+        output_path: Salida (default: <stem>_normalized.md)
+        stream_changes: Escribir todos los cambios en <salida>_changes.jsonl
+        profile: Perfil de normalización (ver get_normalizer)
+        cache: Caché de bloques para re-normalizar tras cambiar reglas
+        report_path: Reporte JSON (default: <salida>_report.json)
+        input_hash: SHA-256 de la entrada si ya se calculó
+        section_tree: Escribir el árbol de secciones en <salida>_sections.json
     
-    # Guardar
+    Returns:
+        Dict con validation, changes, changes_count, changes_by_type,
+        heading_map y boilerplate
+    """
+    markdown_path = Path(markdown_path)
     if output_path is None:
         output_path = markdown_path.parent / f"{markdown_path.stem}_normalized.md"
+    output_path = Path(output_path)
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(result['markdown'])
+    normalizer = get_normalizer(profile)
+    if input_hash is None:
+        input_hash = _file_sha256(markdown_path)
+    tmp_path = output_path.parent / f".{output_path.name}.tmp"
+    changes_path = output_path.parent / f"{output_path.stem}_changes.jsonl"
     
-    # Guardar reporte
-    report_path = output_path.parent / f"{output_path.stem}_report.json"
-    with open(report_path, 'w', encoding='utf-8') as f:
-        json.dump({
-            "validation": result['validation'],
-            "changes_count": len(result['changes']),
-            "changes": result['changes'][:20]  # Primeros 20 cambios
-        }, f, indent=2, ensure_ascii=False)
+    try:
+        # newline='\n': los offsets del árbol de secciones son sobre '\n'
+        with open(tmp_path, 'w', encoding='utf-8', newline='\n') as out, \
+             (open(changes_path, 'w', encoding='utf-8') if stream_changes else nullcontext()) as changes_stream:
+            separator = ''
+            
+            def write_line(line: str):
+                nonlocal separator
+                out.write(separator + line)
+                separator = '\n'
+            
+            if cache is not None:
+                result = normalizer.normalize(
+                    markdown_path.read_text(encoding='utf-8'), changes_stream,
+                    cache=cache, section_tree=section_tree
+                )
+                write_line(result.pop("markdown"))
+            else:
+                result = normalizer.normalize_stream(
+                    lambda: _iter_file_lines(markdown_path), write_line, changes_stream,
+                    section_tree=section_tree
+                )
+    except BaseException:
+        # La salida anterior (si existe) queda intacta
+        tmp_path.unlink(missing_ok=True)
+        raise
+    
+    # Reemplazo atómico (permite output_path == markdown_path)
+    os.replace(tmp_path, output_path)
+    if stream_changes:
+        logger.info(f"📝 Cambios completos en: {changes_path}")
+    if section_tree:
+        sections_path = _sections_path(output_path)
+        # Compacto (una línea): lo leen programas, puede tener miles de secciones
+        _write_json_atomic(sections_path, {"markdown": output_path.name, **result["sections"]}, indent=None)
+        logger.info(f"🌳 Árbol de secciones en: {sections_path}")
+    
+    # Guardar reporte (la entrada y las reglas permiten omitir re-normalizaciones)
+    if report_path is None:
+        report_path = output_path.parent / f"{output_path.stem}_report.json"
+    _write_json_atomic(Path(report_path), {
+        "input": str(markdown_path),
+        "input_sha256": input_hash,
+        "normalizer_version": NORMALIZER_VERSION,
+        "rules": normalizer.rules_id,
+        "profile": profile.name if profile is not None else None,
+        "validation": result['validation'],
+        "changes_count": result['changes_count'],
+        "changes_by_type": result['changes_by_type'],
+        "boilerplate": result['boilerplate'],
+        "changes": result['changes'][:20]  # Primeros 20 cambios
+    })
     
     logger.info(f"✅ Markdown normalizado guardado en: {output_path}")
     logger.info(f"📊 Reporte en: {report_path}")
@@ -548,7 +1704,278 @@ def normalize_markdown_file(markdown_path: Path,
     return result
 
 
+def _sections_path(output_path: Path) -> Path:
+    """Archivo del árbol de secciones de una salida normalizada."""
+    return output_path.parent / f"{output_path.stem}{SECTIONS_SUFFIX}"
+
+
+def _file_sha256(path: Path) -> str:
+    """SHA-256 del contenido de un archivo."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_BUFFER_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path: Path, data: Dict, indent: Optional[int] = 2):
+    """Escribe JSON en un temporal y lo reemplaza (nunca queda a medias)."""
+    tmp_path = path.parent / f".{path.name}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False,
+                  separators=None if indent is not None else (',', ':'))
+    os.replace(tmp_path, path)
+
+
+def _expand_inputs(inputs: Iterable) -> List[Path]:
+    """
+    Archivos .md de una lista de archivos, directorios o globs.
+    
+    De los directorios se toman los *.md de primer nivel, salvo las
+    salidas previas (*_normalized.md). Sin repetidos, en orden.
+    """
+    paths = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            paths.extend(p for p in sorted(path.glob("*.md"))
+                         if not p.stem.endswith(NORMALIZED_SUFFIX))
+        elif path.is_file():
+            paths.append(path)
+        else:
+            paths.extend(Path(p) for p in sorted(glob.glob(str(item), recursive=True))
+                         if p.endswith(".md"))
+    return list(dict.fromkeys(paths))
+
+
+def _report_matches(report_path: Path, input_hash: str, rules_id: str) -> bool:
+    """¿El último reporte es de esta misma entrada y estas mismas reglas?"""
+    try:
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (
+        report.get("input_sha256") == input_hash
+        and report.get("normalizer_version") == NORMALIZER_VERSION
+        and report.get("rules") == rules_id
+    )
+
+
+# Estado de cada proceso del pool (ver _init_batch_worker)
+_BATCH_WORKER: Dict = {}
+
+
+def _init_batch_worker(profile: Optional["NormalizationProfile"], cache_path: Optional[Path],
+                       force: bool, stream_changes: bool, section_tree: bool, verbose: bool):
+    """Inicializa un proceso del pool: perfil, caché propia y logging."""
+    if not verbose:
+        # El log por fase de miles de documentos tapa el progreso
+        logger.setLevel(logging.WARNING)
+    _BATCH_WORKER.update(
+        profile=profile,
+        cache=NormalizationCache(cache_path) if cache_path is not None else None,
+        force=force,
+        stream_changes=stream_changes,
+        section_tree=section_tree,
+    )
+
+
+def _normalize_batch_job(job: Tuple[Path, Path, Path]) -> Dict:
+    """Normaliza un archivo del lote (o lo omite si su reporte está al día)."""
+    markdown_path, output_path, report_path = job
+    start = time.perf_counter()
+    status = {"input": str(markdown_path), "output": str(output_path)}
+    try:
+        size = markdown_path.stat().st_size
+        input_hash = _file_sha256(markdown_path)
+        normalizer = get_normalizer(_BATCH_WORKER["profile"])
+        if (not _BATCH_WORKER["force"] and output_path.exists()
+                and (not _BATCH_WORKER["section_tree"] or _sections_path(output_path).exists())
+                and _report_matches(report_path, input_hash, normalizer.rules_id)):
+            return {**status, "status": "skipped", "bytes": size,
+                    "seconds": time.perf_counter() - start}
+        
+        result = normalize_markdown_file(
+            markdown_path, output_path,
+            stream_changes=_BATCH_WORKER["stream_changes"],
+            profile=_BATCH_WORKER["profile"],
+            cache=_BATCH_WORKER["cache"],
+            report_path=report_path,
+            input_hash=input_hash,
+            section_tree=_BATCH_WORKER["section_tree"]
+        )
+        return {**status, "status": "normalized", "bytes": size,
+                "seconds": time.perf_counter() - start,
+                "fidelity_score": result['validation']['fidelity_score']}
+    except Exception as e:
+        return {**status, "status": "error", "bytes": 0,
+                "seconds": time.perf_counter() - start, "error": str(e)}
+
+
+def normalize_markdown_files(inputs: Iterable,
+                             output_dir: Optional[Path] = None,
+                             reports_dir: Optional[Path] = None,
+                             profile: Optional["NormalizationProfile"] = None,
+                             workers: Optional[int] = None,
+                             force: bool = False,
+                             cache_path: Optional[Path] = None,
+                             stream_changes: bool = False,
+                             section_tree: bool = False,
+                             verbose: bool = False) -> Dict:
+    """
+    Normaliza muchos archivos en paralelo con normalize_markdown_file.
+    
+    Cada archivo se normaliza en un proceso del pool; salida y reporte
+    <stem>_normalization.json se escriben en temporales que se reemplazan
+    al terminar. Se omiten los archivos cuya salida existe y cuyo último
+    reporte tiene el mismo SHA-256 de entrada, NORMALIZER_VERSION y reglas
+    (ver MarkdownNormalizer.rules_id), salvo con force.
+    
+    Args:
+        inputs: Archivos .md, directorios o globs (ver _expand_inputs)
+        output_dir: Directorio de salida, con el nombre de la entrada
+            (default: <stem>_normalized.md junto a cada entrada)
+        reports_dir: Directorio de reportes (default: el de cada salida)
+        profile: Perfil de normalización (ver get_normalizer)
+        workers: Procesos (default: núcleos disponibles)
+        force: Normalizar aunque el reporte esté al día
+        cache_path: Caché de bloques compartida (ver NormalizationCache)
+        stream_changes: Escribir todos los cambios en <salida>_changes.jsonl
+        section_tree: Escribir el árbol de secciones en <salida>_sections.json
+        verbose: Mantener el log por fase de cada documento
+    
+    Returns:
+        Dict con files (estado por archivo), normalized, skipped, errors,
+        bytes, seconds, files_per_sec y mb_per_sec (de los normalizados)
+    """
+    jobs = []
+    for markdown_path in _expand_inputs(inputs):
+        if output_dir is not None:
+            output_path = Path(output_dir) / markdown_path.name
+        else:
+            output_path = markdown_path.parent / f"{markdown_path.stem}{NORMALIZED_SUFFIX}.md"
+        if output_path.resolve() == markdown_path.resolve():
+            # El hash de entrada del reporte dejaría de coincidir con el archivo
+            raise ValueError(f"La salida no puede reemplazar a la entrada: {markdown_path}")
+        report_dir = Path(reports_dir) if reports_dir is not None else output_path.parent
+        jobs.append((markdown_path, output_path, report_dir / f"{markdown_path.stem}{BATCH_REPORT_SUFFIX}"))
+    
+    # Dos entradas con el mismo nombre no pueden ir al mismo directorio
+    seen = {}
+    for markdown_path, output_path, report_path in jobs:
+        for target in (output_path, report_path):
+            if target in seen:
+                raise ValueError(f"{markdown_path} y {seen[target]} escriben en {target}")
+            seen[target] = markdown_path
+    for target in seen:
+        target.parent.mkdir(parents=True, exist_ok=True)
+    
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    init_args = (profile, Path(cache_path) if cache_path is not None else None,
+                 force, stream_changes, section_tree, verbose)
+    logger.info(f"📚 Normalizando {len(jobs)} archivos con {workers} procesos")
+    
+    start = time.perf_counter()
+    files = []
+    if workers == 1:
+        saved_level = logger.level
+        _init_batch_worker(*init_args)
+        try:
+            files = [_normalize_batch_job(job) for job in jobs]
+        finally:
+            if _BATCH_WORKER.get("cache") is not None:
+                _BATCH_WORKER["cache"].close()
+            _BATCH_WORKER.clear()
+            logger.setLevel(saved_level)
+    else:
+        with mp.Pool(workers, initializer=_init_batch_worker, initargs=init_args) as pool:
+            for status in pool.imap_unordered(_normalize_batch_job, jobs):
+                files.append(status)
+                if status["status"] == "error":
+                    logger.error(f"❌ {status['input']}: {status['error']}")
+    elapsed = time.perf_counter() - start
+    
+    normalized = [f for f in files if f["status"] == "normalized"]
+    normalized_bytes = sum(f["bytes"] for f in normalized)
+    summary = {
+        "files": files,
+        "normalized": len(normalized),
+        "skipped": sum(1 for f in files if f["status"] == "skipped"),
+        "errors": sum(1 for f in files if f["status"] == "error"),
+        "bytes": normalized_bytes,
+        "seconds": elapsed,
+        "files_per_sec": len(normalized) / elapsed if elapsed else 0.0,
+        "mb_per_sec": normalized_bytes / 1024 / 1024 / elapsed if elapsed else 0.0,
+    }
+    logger.info(f"✅ Lote: {summary['normalized']} normalizados, {summary['skipped']} omitidos, "
+                f"{summary['errors']} errores en {elapsed:.1f}s "
+                f"({summary['files_per_sec']:.1f} archivos/s, {summary['mb_per_sec']:.2f} MB/s)")
+    return summary
+
+
 if __name__ == "__main__":
+    import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Normalizador de Markdown (sin entradas: demo)")
+    parser.add_argument("inputs", nargs='*',
+                       help="Archivos .md, directorios o globs (ej: 'sources/**/*.md')")
+    parser.add_argument("--output-dir", type=Path,
+                       help="Directorio de salida (default: <stem>_normalized.md junto a la entrada)")
+    parser.add_argument("--reports-dir", type=Path,
+                       help="Directorio de reportes _normalization.json (default: el de la salida)")
+    parser.add_argument("--workers", type=int, help="Procesos (default: núcleos disponibles)")
+    parser.add_argument("--force", action="store_true",
+                       help="Normalizar aunque el reporte indique que la salida está al día")
+    parser.add_argument("--profile", type=str, help="Perfil de conversión (ej: academic_apa)")
+    parser.add_argument("--cache", nargs='?', const=DEFAULT_CACHE_PATH, type=Path,
+                       help=f"Caché de bloques (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--stream-changes", action="store_true",
+                       help="Escribir todos los cambios en <salida>_changes.jsonl")
+    parser.add_argument("--sections", action="store_true",
+                       help="Escribir el árbol de secciones en <salida>_sections.json")
+    parser.add_argument("--verbose", action="store_true", help="Log por fase de cada documento")
+    
+    args = parser.parse_args()
+    
+    # Comando: normalizar por lotes
+    if args.inputs:
+        profile = None
+        if args.profile:
+            from conversion_profiles import ProfileManager
+            conversion_profile = ProfileManager().get_profile(args.profile)
+            if conversion_profile is None:
+                print(f"❌ Perfil no encontrado: {args.profile}")
+                sys.exit(1)
+            profile = conversion_profile.normalization
+        
+        summary = normalize_markdown_files(
+            args.inputs,
+            output_dir=args.output_dir,
+            reports_dir=args.reports_dir,
+            profile=profile,
+            workers=args.workers,
+            force=args.force,
+            cache_path=args.cache,
+            stream_changes=args.stream_changes,
+            section_tree=args.sections,
+            verbose=args.verbose
+        )
+        
+        print("\n" + "="*60)
+        print("📚 NORMALIZACIÓN POR LOTES")
+        print("="*60)
+        print(f"✅ Normalizados: {summary['normalized']}")
+        print(f"⏭️  Omitidos (al día): {summary['skipped']}")
+        print(f"❌ Errores: {summary['errors']}")
+        for status in summary['files']:
+            if status['status'] == "error":
+                print(f"   {status['input']}: {status['error']}")
+        print(f"⏱️  {summary['seconds']:.2f}s · {summary['files_per_sec']:.1f} archivos/s · "
+              f"{summary['mb_per_sec']:.2f} MB/s")
+        sys.exit(1 if summary['errors'] else 0)
+    
     # Test con documento de ejemplo
     test_markdown = """## Página 1
 
@@ -583,7 +2010,7 @@ Este también debería ser H4.
 
 Texto del marco teórico.
 """
-    
+
     normalizer = MarkdownNormalizer()
     result = normalizer.normalize(test_markdown)
     
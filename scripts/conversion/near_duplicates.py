@@ -0,0 +1,285 @@
+"""
+Detección de Casi-Duplicados - MinHash + LSH
+
+Autor: VermiKhipu Academic RAG
+Fecha: Noviembre 2025
+
+is_duplicate() solo detecta PDFs idénticos byte a byte. El mismo paper
+descargado de dos repositorios, re-exportado o con una portada agregada
+tiene otro SHA-256 pero casi el mismo texto. Este módulo:
+
+1. Extrae barato el texto de las primeras páginas (pypdfium2, sin layout)
+2. Calcula una firma MinHash sobre shingles de palabras
+3. Indexa la firma por bandas (LSH) en el tracker
+4. Al ingresar un PDF, busca candidatos por banda y confirma con la
+   contención estimada de las firmas (|A∩B| / min(|A|, |B|))
+
+Se usa contención y no Jaccard porque una portada agregada desplaza el
+texto firmado: las primeras páginas de la copia pierden la última página
+del original y ganan la portada, y el Jaccard cae a ~0.65 aunque casi
+todo el texto de la copia esté en el original.
+"""
+
+import hashlib
+import logging
+import random
+import re
+import struct
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_pdfium = None
+
+# ========== Parámetros MinHash / LSH ==========
+# Páginas leídas: con 3 una portada agregada aún deja ~2/3 del texto en común
+# (Jaccard ~0.65, contención > 0.9)
+SIGNATURE_PAGES = 3
+# Palabras por shingle
+SHINGLE_SIZE = 5
+# Mínimo de shingles para firmar (PDFs escaneados sin capa de texto no firman)
+MIN_SHINGLES = 20
+# 128 permutaciones = 32 bandas x 4 filas: umbral LSH ≈ (1/32)^(1/4) ≈ 0.42
+# de Jaccard, bajo el ~0.65 de una portada agregada (contención 0.8 entre
+# textos de igual tamaño equivale a Jaccard 0.67)
+NUM_PERM = 128
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERM // LSH_BANDS
+# Contención estimada mínima para marcar casi-duplicado
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# Hashing universal (a*x + b) mod p con p primo de Mersenne 2^61 - 1
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(1)  # semilla fija: las firmas deben ser estables entre ejecuciones
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+del _rng
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_SIGNATURE_HEADER = struct.Struct("<4sBH")
+_SIGNATURE_MAGIC = b"MHSG"
+_SIGNATURE_VERSION = 1
+
+
+def _import_pdfium():
+    """Lazy import de pypdfium2."""
+    global _pdfium
+    if _pdfium is None:
+        try:
+            import pypdfium2
+            _pdfium = pypdfium2
+        except ImportError:
+            raise ImportError(
+                "pypdfium2 no instalado. Ejecutar: pip install pypdfium2"
+            )
+    return _pdfium
+
+
+@dataclass
+class MinHashSignature:
+    """
+    Firma MinHash de un documento.
+    
+    values guarda el mínimo de cada permutación (uint32). La fracción de
+    posiciones iguales entre dos firmas estima la similitud de Jaccard de
+    sus conjuntos de shingles.
+    """
+    values: array
+    shingle_count: int = 0
+    
+    def __len__(self) -> int:
+        return len(self.values)
+    
+    def similarity(self, other: "MinHashSignature") -> float:
+        """Similitud de Jaccard estimada con otra firma."""
+        if len(self.values) != len(other.values):
+            raise ValueError("Firmas con distinto número de permutaciones")
+        matches = sum(a == b for a, b in zip(self.values, other.values))
+        return matches / len(self.values)
+    
+    def containment(self, other: "MinHashSignature") -> float:
+        """
+        Contención estimada |A∩B| / min(|A|, |B|) con otra firma.
+        
+        Con J = |A∩B| / |A∪B| y |A∪B| = |A| + |B| - |A∩B| queda
+        |A∩B| = J (|A| + |B|) / (1 + J). Sin conteo de shingles en alguna
+        de las firmas se devuelve el Jaccard estimado.
+        """
+        jaccard = self.similarity(other)
+        if not self.shingle_count or not other.shingle_count:
+            return jaccard
+        intersection = jaccard * (self.shingle_count + other.shingle_count) / (1 + jaccard)
+        return min(1.0, intersection / min(self.shingle_count, other.shingle_count))
+    
+    def band_keys(self) -> List[Tuple[int, int]]:
+        """
+        Claves LSH (banda, bucket): documentos que comparten alguna
+        banda completa son candidatos a casi-duplicado.
+        """
+        keys = []
+        for band in range(LSH_BANDS):
+            rows = self.values[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+            digest = hashlib.blake2b(rows.tobytes(), digest_size=8).digest()
+            # Entero con signo: cabe en INTEGER de SQLite
+            keys.append((band, int.from_bytes(digest, "little", signed=True)))
+        return keys
+    
+    def to_bytes(self) -> bytes:
+        """Serializa la firma para guardarla como BLOB."""
+        values = array("I", self.values)
+        if struct.pack("=I", 1) != struct.pack("<I", 1):
+            values.byteswap()
+        header = _SIGNATURE_HEADER.pack(_SIGNATURE_MAGIC, _SIGNATURE_VERSION, len(values))
+        return header + values.tobytes()
+    
+    @classmethod
+    def from_bytes(cls, data: bytes, shingle_count: int = 0) -> "MinHashSignature":
+        """Reconstruye una firma serializada con to_bytes()."""
+        magic, version, count = _SIGNATURE_HEADER.unpack_from(data)
+        if magic != _SIGNATURE_MAGIC or version != _SIGNATURE_VERSION:
+            raise ValueError("Firma MinHash con formato desconocido")
+        values = array("I")
+        values.frombytes(data[_SIGNATURE_HEADER.size:_SIGNATURE_HEADER.size + count * 4])
+        if struct.pack("=I", 1) != struct.pack("<I", 1):
+            values.byteswap()
+        return cls(values=values, shingle_count=shingle_count)
+
+
+def extract_signature_text(pdf_path: Path, max_pages: int = SIGNATURE_PAGES) -> str:
+    """Texto plano de las primeras páginas (sin análisis de layout)."""
+    pdfium = _import_pdfium()
+    pdf = pdfium.PdfDocument(str(pdf_path))
+    try:
+        parts = []
+        for index in range(min(max_pages, len(pdf))):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            parts.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+        return "\n".join(parts)
+    finally:
+        pdf.close()
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> set:
+    """Hashes (uint32) de los shingles de `size` palabras del texto normalizado."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return set()
+    return {
+        int.from_bytes(
+            hashlib.blake2b(" ".join(words[i:i + size]).encode("utf-8"), digest_size=4).digest(),
+            "little"
+        )
+        for i in range(len(words) - size + 1)
+    }
+
+
+def compute_signature(text: str) -> Optional[MinHashSignature]:
+    """
+    Firma MinHash de un texto.
+    
+    Returns:
+        None si el texto tiene menos de MIN_SHINGLES shingles
+    """
+    hashes = shingle_hashes(text)
+    if len(hashes) < MIN_SHINGLES:
+        return None
+    
+    values = array("I", (
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ))
+    return MinHashSignature(values=values, shingle_count=len(hashes))
+
+
+class NearDuplicateDetector:
+    """
+    Busca y registra casi-duplicados usando las tablas de firmas del tracker.
+    
+    Ejemplo:
+        >>> detector = NearDuplicateDetector(tracker)
+        >>> signature, matches = detector.check(Path("paper.pdf"))
+        >>> if matches:
+        ...     print(f"Casi-duplicado de ID {matches[0][0]} ({matches[0][1]:.0%})")
+    """
+    
+    def __init__(self, tracker, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        """
+        Args:
+            tracker: ConversionTracker donde se guardan las firmas
+            threshold: Contención estimada mínima para considerar casi-duplicado
+        """
+        self.tracker = tracker
+        self.threshold = threshold
+    
+    def signature_for(self, pdf_path: Path) -> Optional[MinHashSignature]:
+        """Firma del PDF o None si no tiene texto suficiente o falla la lectura."""
+        try:
+            return compute_signature(extract_signature_text(pdf_path))
+        except Exception as e:
+            logger.warning(f"⚠️  No se pudo firmar {Path(pdf_path).name}: {e}")
+            return None
+    
+    def find(
+        self,
+        signature: MinHashSignature,
+        exclude_id: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Conversiones casi-duplicadas de una firma.
+        
+        Returns:
+            Lista de (conversion_id, contención), de mayor a menor contención
+        """
+        matches = []
+        for conversion_id, data, shingle_count in self.tracker.get_signature_candidates(
+            signature.band_keys(), exclude_id=exclude_id
+        ):
+            similarity = signature.containment(MinHashSignature.from_bytes(data, shingle_count))
+            if similarity >= self.threshold:
+                matches.append((conversion_id, similarity))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches
+    
+    def check(
+        self,
+        pdf_path: Path,
+        exclude_id: Optional[int] = None
+    ) -> Tuple[Optional[MinHashSignature], List[Tuple[int, float]]]:
+        """Firma un PDF y busca sus casi-duplicados."""
+        signature = self.signature_for(pdf_path)
+        if signature is None:
+            return None, []
+        return signature, self.find(signature, exclude_id=exclude_id)
+    
+    def register(self, conversion_id: int, signature: MinHashSignature):
+        """Guarda la firma y sus bandas LSH para futuras búsquedas."""
+        self.tracker.save_signature(conversion_id, signature)
+
+
+if __name__ == "__main__":
+    import sys
+    
+    logging.basicConfig(level=logging.INFO)
+    
+    if len(sys.argv) < 3:
+        print("Uso: python near_duplicates.py <pdf_a> <pdf_b>")
+        sys.exit(1)
+    
+    signatures = [compute_signature(extract_signature_text(Path(p))) for p in sys.argv[1:3]]
+    if None in signatures:
+        print("❌ Alguno de los PDFs no tiene texto suficiente para firmar")
+        sys.exit(1)
+    
+    print(f"📄 Shingles: {signatures[0].shingle_count} / {signatures[1].shingle_count}")
+    print(f"🔍 Jaccard estimado: {signatures[0].similarity(signatures[1]):.1%}")
+    print(f"🔍 Contención estimada: {signatures[0].containment(signatures[1]):.1%}")
@@ -12,9 +12,15 @@ Clasifica PDFs en 3 categorías para aplicar estrategia óptima:
 """
 
 import logging
+import re
+import struct
+import sys
+import time
+from array import array
+from dataclasses import dataclass, field
 from pathlib import Path
 from enum import Enum
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, List, Optional
 
 try:
     import pdfplumber
@@ -23,8 +29,38 @@ except ImportError:
         "pdfplumber no instalado. Ejecutar: pip install pdfplumber==0.11.4"
     )
 
+# Parser de bajo nivel (dependencia de pdfplumber) para el triage rápido
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import PDFStream, resolve1
+
 logger = logging.getLogger(__name__)
 
+# ========== Patrones para triage a nivel de objetos ==========
+# String literal (admite un nivel de paréntesis balanceados sin escapar)
+# y string hexadecimal
+_LITERAL_PATTERN = rb'\((?:[^()\\]|\\.|\((?:[^()\\]|\\.)*\))*\)'
+_HEX_PATTERN = rb'<[0-9A-Fa-f\s]*>'
+# Strings y arrays del content stream, con el operador que los sigue si
+# muestra texto (Tj, TJ, ' y "). Cada string se consume entero, así un
+# paréntesis o corchete dentro de un string no abre un operando falso
+_TEXT_SHOW_RE = re.compile(
+    rb'(' + _LITERAL_PATTERN + rb'|' + _HEX_PATTERN
+    + rb'|\[(?:[^\[\]()<]|' + _LITERAL_PATTERN + rb'|' + _HEX_PATTERN + rb')*\])'
+    rb'\s*(Tj|TJ|\'|")?',
+    re.DOTALL
+)
+# Strings dentro de un array TJ (los números de kerning no cuentan)
+_STRING_RE = re.compile(_LITERAL_PATTERN + rb'|' + _HEX_PATTERN, re.DOTALL)
+# Escapes de un string literal: \ddd, \n, \(... = 1 byte; \<fin de línea> = 0
+_ESCAPE_RE = re.compile(rb'\\(?:[0-7]{1,3}|\r\n|[\r\n]|.)', re.DOTALL)
+# Patrón típico de dibujo de imagen: "a b c d e f cm /Im0 Do"
+_IMAGE_DRAW_RE = re.compile(
+    rb'(-?[\d.]+)\s+(-?[\d.]+)\s+(-?[\d.]+)\s+(-?[\d.]+)\s+-?[\d.]+\s+-?[\d.]+\s+cm\s*'
+    rb'/([^\s/\[\]()<>{}%]+)\s*Do'
+)
+
 
 class PDFType(Enum):
     """Tipos de PDF según contenido."""
@@ -34,6 +70,104 @@ class PDFType(Enum):
     UNKNOWN = "unknown"    # No se pudo determinar
 
 
+# Códigos compactos de etiqueta por página (1 byte)
+_PAGE_LABEL_CODES = {
+    PDFType.UNKNOWN: 0,
+    PDFType.NATIVE: 1,
+    PDFType.SCANNED: 2,
+    PDFType.MIXED: 3,
+}
+_PAGE_LABELS = {code: pdf_type for pdf_type, code in _PAGE_LABEL_CODES.items()}
+
+# Cabecera binaria: magic, versión, tipo de documento, número de páginas
+_PAGE_MAP_HEADER = struct.Struct("<4sBBI")
+_PAGE_MAP_MAGIC = b"PMAP"
+_PAGE_MAP_VERSION = 1
+
+
+@dataclass
+class PageMap:
+    """
+    Mapa compacto de clasificación por página de un documento completo.
+    
+    Guarda por página: caracteres (uint32), cobertura de imagen en % (uint8)
+    y etiqueta (uint8). Se serializa a ~6 bytes por página para persistirlo
+    en el tracker (clave: hash del PDF) y reutilizarlo sin releer el PDF.
+    """
+    pdf_type: PDFType
+    chars: array = field(default_factory=lambda: array("I"))
+    image_coverage: array = field(default_factory=lambda: array("B"))
+    labels: array = field(default_factory=lambda: array("B"))
+    
+    def __len__(self) -> int:
+        return len(self.chars)
+    
+    def add_page(self, chars: int, image_coverage: float, label: PDFType):
+        """Agrega una página al mapa."""
+        self.chars.append(min(int(chars), 0xFFFFFFFF))
+        self.image_coverage.append(max(0, min(100, round(image_coverage * 100))))
+        self.labels.append(_PAGE_LABEL_CODES[label])
+    
+    def page(self, index: int) -> Dict[str, Any]:
+        """Devuelve la entrada de una página (índice base 0)."""
+        return {
+            "page": index + 1,
+            "chars": self.chars[index],
+            "image_coverage": self.image_coverage[index] / 100,
+            "label": _PAGE_LABELS[self.labels[index]].value
+        }
+    
+    def pages_with_label(self, label: PDFType) -> List[int]:
+        """Números de página (base 1) con la etiqueta indicada."""
+        code = _PAGE_LABEL_CODES[label]
+        return [i + 1 for i, value in enumerate(self.labels) if value == code]
+    
+    def to_bytes(self) -> bytes:
+        """Serializa el mapa (little-endian)."""
+        chars = array("I", self.chars)
+        if sys.byteorder == "big":
+            chars.byteswap()
+        header = _PAGE_MAP_HEADER.pack(
+            _PAGE_MAP_MAGIC, _PAGE_MAP_VERSION,
+            _PAGE_LABEL_CODES[self.pdf_type], len(self)
+        )
+        return header + chars.tobytes() + self.image_coverage.tobytes() + self.labels.tobytes()
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "PageMap":
+        """
+        Reconstruye un mapa serializado con to_bytes().
+        
+        Raises:
+            ValueError: Si los datos no son un mapa válido (formato
+                desconocido, truncado o con etiquetas inválidas)
+        """
+        if len(data) < _PAGE_MAP_HEADER.size:
+            raise ValueError("Mapa de páginas truncado (sin encabezado)")
+        magic, version, type_code, count = _PAGE_MAP_HEADER.unpack_from(data)
+        if magic != _PAGE_MAP_MAGIC or version != _PAGE_MAP_VERSION:
+            raise ValueError("Formato de mapa de páginas no reconocido")
+        
+        chars = array("I")
+        expected = _PAGE_MAP_HEADER.size + count * (chars.itemsize + 2)
+        if len(data) != expected:
+            raise ValueError(
+                f"Tamaño de mapa de páginas inválido: {len(data)} bytes, se esperaban {expected}"
+            )
+        
+        offset = _PAGE_MAP_HEADER.size
+        chars.frombytes(data[offset:offset + count * chars.itemsize])
+        if sys.byteorder == "big":
+            chars.byteswap()
+        offset += count * chars.itemsize
+        
+        coverage = array("B", data[offset:offset + count])
+        labels = array("B", data[offset + count:offset + 2 * count])
+        if type_code not in _PAGE_LABELS or any(code not in _PAGE_LABELS for code in set(labels)):
+            raise ValueError("Etiqueta de página desconocida en el mapa de páginas")
+        return cls(_PAGE_LABELS[type_code], chars, coverage, labels)
+
+
 class PDFTypeDetector:
     """
     Detector inteligente de tipo de PDF.
@@ -43,6 +177,10 @@ class PDFTypeDetector:
     2. Analizar densidad de caracteres por página
     3. Clasificar según umbrales empíricos
     
+    triage() ofrece una variante aún más rápida que inspecciona el PDF a
+    nivel de objetos (fuentes, operadores de texto, imágenes) sin parsear
+    layout, pensada para planificar conversiones de todo un corpus.
+    
     Umbrales (basados en testing empírico):
     - NATIVE: ≥ 95% páginas con > 100 caracteres
     - SCANNED: ≥ 80% páginas con < 50 caracteres
@@ -62,17 +200,25 @@ class PDFTypeDetector:
         """Inicializa el detector."""
         self.stats: Dict[str, Any] = {}
     
-    def detect(self, pdf_path: Path, quick: bool = False) -> Tuple[PDFType, Dict[str, Any]]:
+    def detect(
+        self,
+        pdf_path: Path,
+        quick: bool = False,
+        page_map: bool = False
+    ) -> Tuple[PDFType, Dict[str, Any]]:
         """
         Detecta el tipo de PDF.
         
         Args:
             pdf_path: Ruta al archivo PDF
             quick: Si True, analiza solo primeras 3 páginas (más rápido)
+            page_map: Si True, agrega en stats["page_map"] un PageMap de
+                      todas las páginas (triage a nivel de objetos, con los
+                      conteos exactos de las páginas muestreadas)
         
         Returns:
             Tuple con (tipo_pdf, estadísticas)
-            
+        
         Ejemplo:
             >>> detector = PDFTypeDetector()
             >>> pdf_type, stats = detector.detect(Path("paper.pdf"))
@@ -108,47 +254,304 @@ class PDFTypeDetector:
                         "is_empty": char_count < self.MAX_CHARS_SCANNED
                     })
                 
-                # Calcular métricas
-                pages_with_text = sum(1 for p in page_stats if p["has_text"])
-                pages_empty = sum(1 for p in page_stats if p["is_empty"])
-                
-                ratio_with_text = pages_with_text / pages_to_analyze
-                ratio_empty = pages_empty / pages_to_analyze
-                
-                # Clasificar según umbrales
-                if ratio_with_text >= self.NATIVE_THRESHOLD:
-                    pdf_type = PDFType.NATIVE
-                    strategy = "pdfplumber (rápido, alta fidelidad)"
-                elif ratio_empty >= self.SCANNED_THRESHOLD:
-                    pdf_type = PDFType.SCANNED
-                    strategy = "marker-pdf + EasyOCR + GPU (lento, OCR completo)"
-                else:
-                    pdf_type = PDFType.MIXED
-                    strategy = "docling (detección automática)"
-                
-                # Preparar estadísticas
-                self.stats = {
-                    "pdf_type": pdf_type.value,
-                    "total_pages": total_pages,
-                    "pages_analyzed": pages_to_analyze,
-                    "pages_with_text": pages_with_text,
-                    "pages_empty": pages_empty,
-                    "ratio_with_text": round(ratio_with_text, 3),
-                    "ratio_empty": round(ratio_empty, 3),
-                    "recommended_strategy": strategy,
-                    "page_details": page_stats
-                }
-                
-                logger.info(f"✅ Tipo detectado: {pdf_type.value.upper()} "
-                           f"({ratio_with_text:.1%} con texto)")
-                logger.info(f"📋 Estrategia: {strategy}")
-                
-                return pdf_type, self.stats
+                pdf_type, self.stats = self._classify(
+                    page_stats, total_pages, pages_to_analyze
+                )
+            
+            if page_map:
+                # Triage de todo el documento; las páginas muestreadas
+                # conservan el conteo exacto de pdfplumber
+                try:
+                    all_pages = self._scan_pages(pdf_path)
+                    for sampled in page_stats:
+                        index = sampled["page"] - 1
+                        if index < len(all_pages):
+                            all_pages[index]["chars"] = sampled["chars"]
+                    self.stats["page_map"] = self._build_page_map(pdf_type, all_pages)
+                except Exception as e:
+                    logger.warning(f"⚠️  No se pudo construir el mapa de páginas: {e}")
+            
+            logger.info(f"✅ Tipo detectado: {pdf_type.value.upper()} "
+                       f"({self.stats['ratio_with_text']:.1%} con texto)")
+            logger.info(f"📋 Estrategia: {self.stats['recommended_strategy']}")
+            
+            return pdf_type, self.stats
         
         except Exception as e:
             logger.error(f"❌ Error detectando tipo: {e}")
             return PDFType.UNKNOWN, {"error": str(e)}
     
+    def triage(
+        self,
+        pdf_path: Path,
+        max_pages: Optional[int] = None,
+        page_map: bool = False
+    ) -> Tuple[PDFType, Dict[str, Any]]:
+        """
+        Triage ultra-rápido a nivel de objetos PDF (sin análisis de layout).
+        
+        Recorre el árbol de páginas con el parser de bajo nivel de pdfminer e
+        inspecciona solo recursos de fuentes, operadores que muestran texto
+        (Tj, TJ, ', ") y tamaño de las imágenes (XObject). No interpreta
+        el contenido ni extrae palabras, por lo que analiza TODAS las páginas
+        en una fracción del tiempo de detect().
+        
+        El conteo de caracteres es una estimación (bytes de los strings de
+        texto), suficiente para aplicar los mismos umbrales que detect().
+        
+        Args:
+            pdf_path: Ruta al archivo PDF
+            max_pages: Límite opcional de páginas a inspeccionar
+            page_map: Si True, agrega en stats["page_map"] un PageMap
+        
+        Returns:
+            Tuple con (tipo_pdf, estadísticas)
+        """
+        if not pdf_path.exists():
+            logger.error(f"❌ PDF no encontrado: {pdf_path}")
+            return PDFType.UNKNOWN, {"error": "file_not_found"}
+        
+        try:
+            start = time.perf_counter()
+            page_stats = self._scan_pages(pdf_path, max_pages)
+            
+            if not page_stats:
+                return PDFType.UNKNOWN, {"error": "no_pages"}
+            
+            pdf_type, self.stats = self._classify(
+                page_stats, len(page_stats), len(page_stats)
+            )
+            self.stats["method"] = "triage"
+            self.stats["elapsed_seconds"] = round(time.perf_counter() - start, 4)
+            if page_map:
+                self.stats["page_map"] = self._build_page_map(pdf_type, page_stats)
+            
+            logger.info(f"⚡ Triage: {pdf_path.name} → {pdf_type.value.upper()} "
+                       f"({len(page_stats)} páginas en {self.stats['elapsed_seconds']:.3f}s)")
+            
+            return pdf_type, self.stats
+        
+        except Exception as e:
+            logger.error(f"❌ Error en triage: {e}")
+            return PDFType.UNKNOWN, {"error": str(e)}
+    
+    def classify_page_map(self, page_map: PageMap) -> Tuple[PDFType, Dict[str, Any]]:
+        """
+        Reconstruye la detección a partir de un PageMap persistido.
+        
+        Conserva la etiqueta de documento guardada, de modo que una
+        reconversión enruta igual que la conversión original sin releer
+        páginas del PDF.
+        """
+        page_stats = [
+            self._page_entry(i + 1, page_map.chars[i], page_map.image_coverage[i] / 100)
+            for i in range(len(page_map))
+        ]
+        if not page_stats:
+            return PDFType.UNKNOWN, {"error": "empty_page_map"}
+        
+        _, self.stats = self._classify(page_stats, len(page_stats), len(page_stats))
+        self.stats["pdf_type"] = page_map.pdf_type.value
+        self.stats["method"] = "page_map"
+        self.stats["page_details"] = page_stats[:self.MAX_PAGES_SAMPLE]
+        return page_map.pdf_type, self.stats
+    
+    def _scan_pages(self, pdf_path: Path, max_pages: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Inspecciona a nivel de objetos cada página del documento."""
+        page_stats = []
+        with open(pdf_path, "rb") as f:
+            document = PDFDocument(PDFParser(f))
+            for i, page in enumerate(PDFPage.create_pages(document)):
+                if max_pages is not None and i >= max_pages:
+                    break
+                chars, image_coverage = self._inspect_page_objects(page)
+                page_stats.append(self._page_entry(i + 1, chars, image_coverage))
+        return page_stats
+    
+    def _page_entry(self, page_number: int, chars: int, image_coverage: float) -> Dict[str, Any]:
+        """Entrada de estadísticas de una página analizada por objetos."""
+        return {
+            "page": page_number,
+            "chars": chars,
+            "has_text": chars > self.MIN_CHARS_NATIVE,
+            "is_empty": chars < self.MAX_CHARS_SCANNED,
+            "image_coverage": round(image_coverage, 3)
+        }
+    
+    def _page_label(self, chars: int) -> PDFType:
+        """Etiqueta individual de una página según los mismos umbrales."""
+        if chars > self.MIN_CHARS_NATIVE:
+            return PDFType.NATIVE
+        if chars < self.MAX_CHARS_SCANNED:
+            return PDFType.SCANNED
+        return PDFType.MIXED
+    
+    def _build_page_map(self, pdf_type: PDFType, page_stats: List[Dict[str, Any]]) -> PageMap:
+        """Construye el PageMap compacto a partir de estadísticas por página."""
+        page_map = PageMap(pdf_type)
+        for entry in page_stats:
+            page_map.add_page(
+                entry["chars"],
+                entry.get("image_coverage", 0.0),
+                self._page_label(entry["chars"])
+            )
+        return page_map
+    
+    def _classify(
+        self,
+        page_stats: List[Dict[str, Any]],
+        total_pages: int,
+        pages_analyzed: int
+    ) -> Tuple[PDFType, Dict[str, Any]]:
+        """Clasifica el documento según umbrales a partir de estadísticas por página."""
+        pages_with_text = sum(1 for p in page_stats if p["has_text"])
+        pages_empty = sum(1 for p in page_stats if p["is_empty"])
+        
+        ratio_with_text = pages_with_text / pages_analyzed
+        ratio_empty = pages_empty / pages_analyzed
+        
+        # Clasificar según umbrales
+        if ratio_with_text >= self.NATIVE_THRESHOLD:
+            pdf_type = PDFType.NATIVE
+            strategy = "pdfplumber (rápido, alta fidelidad)"
+        elif ratio_empty >= self.SCANNED_THRESHOLD:
+            pdf_type = PDFType.SCANNED
+            strategy = "marker-pdf + EasyOCR + GPU (lento, OCR completo)"
+        else:
+            pdf_type = PDFType.MIXED
+            strategy = "docling (detección automática)"
+        
+        stats = {
+            "pdf_type": pdf_type.value,
+            "total_pages": total_pages,
+            "pages_analyzed": pages_analyzed,
+            "pages_with_text": pages_with_text,
+            "pages_empty": pages_empty,
+            "ratio_with_text": round(ratio_with_text, 3),
+            "ratio_empty": round(ratio_empty, 3),
+            "recommended_strategy": strategy,
+            "page_details": page_stats
+        }
+        
+        return pdf_type, stats
+    
+    def _inspect_page_objects(self, page: PDFPage) -> Tuple[int, float]:
+        """
+        Inspecciona recursos y content streams de una página.
+        
+        Returns:
+            (caracteres_estimados, cobertura_de_imagen 0.0-1.0)
+        """
+        x0, y0, x1, y1 = (float(resolve1(v)) for v in page.mediabox)
+        page_area = abs((x1 - x0) * (y1 - y0)) or 1.0
+        
+        chars, images, drawn = self._scan_resources(page.resources, page.contents, depth=0)
+        
+        coverage = 0.0
+        for name, area in drawn:
+            if name in images:
+                coverage += area / page_area
+                images.pop(name)
+        # Imágenes sin matriz reconocible: aproximar por tamaño a 150 dpi
+        for width, height in images.values():
+            coverage += (width * height) / (page_area * (150 / 72) ** 2)
+        
+        return chars, min(coverage, 1.0)
+    
+    def _scan_resources(
+        self,
+        resources: Any,
+        contents: List[Any],
+        depth: int
+    ) -> Tuple[int, Dict[str, Tuple[int, int]], List[Tuple[str, float]]]:
+        """
+        Recorre fuentes, XObjects y operadores de texto de un nivel de recursos.
+        
+        Returns:
+            (caracteres_estimados, {nombre_imagen: (ancho, alto)}, [(nombre, área_dibujada)])
+        """
+        resources = resolve1(resources) or {}
+        fonts = resolve1(resources.get("Font")) or {}
+        xobjects = resolve1(resources.get("XObject")) or {}
+        
+        chars = 0
+        images: Dict[str, Tuple[int, int]] = {}
+        drawn: List[Tuple[str, float]] = []
+        
+        forms = []
+        for name, ref in xobjects.items():
+            xobject = resolve1(ref)
+            if not isinstance(xobject, PDFStream):
+                continue
+            subtype = getattr(xobject.get("Subtype"), "name", None)
+            if subtype == "Image":
+                width = resolve1(xobject.get("Width")) or 0
+                height = resolve1(xobject.get("Height")) or 0
+                images[name] = (int(width), int(height))
+            elif subtype == "Form" and depth < 2:
+                forms.append(xobject)
+        
+        # Sin fuentes ni imágenes no hace falta descomprimir el contenido
+        if fonts or images:
+            for stream in contents:
+                stream = resolve1(stream)
+                if not isinstance(stream, PDFStream):
+                    continue
+                data = stream.get_data()
+                if fonts:
+                    chars += self._count_text_chars(data)
+                if images:
+                    for match in _IMAGE_DRAW_RE.finditer(data):
+                        a, b, c, d = (float(v) for v in match.groups()[:4])
+                        drawn.append((match.group(5).decode("latin-1"), abs(a * d - b * c)))
+        
+        # Formularios anidados (texto dentro de XObjects tipo Form)
+        for form in forms:
+            form_chars, _, _ = self._scan_resources(
+                form.get("Resources"), [form], depth + 1
+            )
+            chars += form_chars
+        
+        return chars, images, drawn
+    
+    @staticmethod
+    def _count_text_chars(data: bytes) -> int:
+        """
+        Estima caracteres mostrados por Tj/TJ/'/" en un content stream.
+        
+        Cuenta los bytes decodificados de los strings operandos: sin
+        paréntesis, corchetes ni números de kerning, con cada escape como
+        un byte y cada par de dígitos hexadecimales como uno. Sin la
+        codificación de la fuente, un byte se toma como un carácter.
+        """
+        total = 0
+        for match in _TEXT_SHOW_RE.finditer(data):
+            if match.group(2) is None:
+                continue  # String de otro operador (p. ej. /ActualText)
+            operand = match.group(1)
+            if operand.startswith(b"["):
+                total += sum(PDFTypeDetector._string_length(string)
+                             for string in _STRING_RE.findall(operand))
+            else:
+                total += PDFTypeDetector._string_length(operand)
+        return total
+    
+    @staticmethod
+    def _string_length(string: bytes) -> int:
+        """Bytes decodificados de un string literal (...) o hexadecimal <...>."""
+        if string.startswith(b"<"):
+            digits = len(string[1:-1].translate(None, b" \t\r\n\f\x00"))
+            return (digits + 1) // 2  # Un dígito final impar se completa con 0
+        inner = string[1:-1]
+        if b"\\" not in inner:
+            return len(inner)
+        length = len(inner)
+        for escape in _ESCAPE_RE.finditer(inner):
+            escape = escape.group()
+            # \<fin de línea> continúa el string sin agregar bytes
+            length -= len(escape) if escape[1:2] in (b"\r", b"\n") else len(escape) - 1
+        return length
+    
     def is_native(self, pdf_path: Path, quick: bool = True) -> bool:
         """Verifica si PDF es nativo (shortcut)."""
         pdf_type, _ = self.detect(pdf_path, quick=quick)
@@ -178,14 +581,21 @@ if __name__ == "__main__":
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
     
-    if len(sys.argv) < 2:
-        print("Uso: python pdf_type_detector.py <archivo.pdf>")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    use_triage = "--triage" in sys.argv[1:]
+    
+    if not args:
+        print("Uso: python pdf_type_detector.py <archivo.pdf> [--triage]")
         print("Ejemplo: python pdf_type_detector.py ../../sources/originals/paper.pdf")
+        print("  --triage  Triage rápido a nivel de objetos (todas las páginas)")
         sys.exit(1)
     
-    pdf_path = Path(sys.argv[1])
+    pdf_path = Path(args[0])
     detector = PDFTypeDetector()
-    pdf_type, stats = detector.detect(pdf_path)
+    if use_triage:
+        pdf_type, stats = detector.triage(pdf_path)
+    else:
+        pdf_type, stats = detector.detect(pdf_path)
     
     print("\n" + "="*60)
     print("📊 ANÁLISIS DE TIPO DE PDF")
@@ -198,6 +608,8 @@ if __name__ == "__main__":
     print(f"Páginas vacías: {stats.get('pages_empty', 'N/A')}")
     print(f"Ratio texto: {stats.get('ratio_with_text', 0):.1%}")
     print(f"Estrategia: {stats.get('recommended_strategy', 'N/A')}")
+    if stats.get('method') == 'triage':
+        print(f"Tiempo triage: {stats.get('elapsed_seconds', 0):.3f}s")
     print("="*60)
     
     # Detalle por página
@@ -205,5 +617,6 @@ if __name__ == "__main__":
         print("\n📄 Detalle por página:")
         for page in stats['page_details']:
             status = "✅ TEXTO" if page['has_text'] else ("❌ VACÍA" if page['is_empty'] else "⚠️  POCO TEXTO")
-            print(f"  Página {page['page']}: {page['chars']} caracteres - {status}")
+            coverage = f" | imagen {page['image_coverage']:.0%}" if 'image_coverage' in page else ""
+            print(f"  Página {page['page']}: {page['chars']} caracteres - {status}{coverage}")
         print()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Exportación del tracker de conversiones a Parquet (columnar)
+
+Lee conversion_tracker.db en modo solo lectura y escribe cada tabla en
+Parquet particionado por mes de creación (estilo Hive), leyendo por
+lotes con fetchmany(): la memoria queda acotada por --batch-size, no por
+el tamaño del tracker.
+
+Salida:
+    <out>/conversions/month=2025-11/part-0.parquet
+    <out>/conversion_errors/month=2025-11/part-0.parquet
+    <out>/validation_reports/...
+    <out>/conversion_pages/...      (mes de la conversión)
+    <out>/conversion_metrics/...    (mes de la conversión)
+
+Uso:
+    python export_parquet.py --out sources/exports/parquet
+    python export_parquet.py --tables conversions conversion_pages --batch-size 50000
+
+Análisis (ejemplo):
+    import pyarrow.dataset as ds
+    pages = ds.dataset("sources/exports/parquet/conversion_pages", partitioning="hive")
+    pages.to_table(columns=["strategy", "render_seconds"]).group_by("strategy") \\
+         .aggregate([("render_seconds", "mean")])
+"""
+
+import sys
+import argparse
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+_pa = None
+_pq = None
+
+# Tabla → consulta de exportación. Todas devuelven `month` (YYYY-MM) al
+# final y vienen ordenadas por mes, así solo hay un archivo abierto a la vez
+EXPORT_QUERIES: Dict[str, str] = {
+    "conversions": """
+        SELECT t.*, substr(t.created_at, 1, 7) AS month
+        FROM conversions t ORDER BY t.created_at
+    """,
+    "conversion_errors": """
+        SELECT t.*, substr(t.created_at, 1, 7) AS month
+        FROM conversion_errors t ORDER BY t.created_at
+    """,
+    "validation_reports": """
+        SELECT t.*, substr(t.created_at, 1, 7) AS month
+        FROM validation_reports t ORDER BY t.created_at
+    """,
+    "conversion_pages": """
+        SELECT t.*, substr(c.created_at, 1, 7) AS month
+        FROM conversion_pages t JOIN conversions c ON c.id = t.conversion_id
+        ORDER BY c.created_at, t.conversion_id, t.page_number
+    """,
+    "conversion_metrics": """
+        SELECT t.*, substr(c.created_at, 1, 7) AS month
+        FROM conversion_metrics t JOIN conversions c ON c.id = t.conversion_id
+        ORDER BY c.created_at, t.conversion_id, t.key
+    """,
+}
+
+DEFAULT_BATCH_SIZE = 20000
+
+
+def _import_pyarrow():
+    """Lazy import de pyarrow (dependencia opcional)."""
+    global _pa, _pq
+    if _pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+            _pa, _pq = pyarrow, pyarrow.parquet
+        except ImportError:
+            raise ImportError(
+                "pyarrow no instalado. Ejecutar: pip install pyarrow"
+            )
+    return _pa, _pq
+
+
+def _arrow_type(declared: str):
+    """Tipo Arrow a partir del tipo declarado en SQLite (afinidad)."""
+    pa, _ = _import_pyarrow()
+    declared = (declared or "").upper()
+    if "BOOL" in declared:
+        return pa.bool_()
+    if "INT" in declared:
+        return pa.int64()
+    if any(t in declared for t in ("REAL", "FLOA", "DOUB")):
+        return pa.float64()
+    if "BLOB" in declared:
+        return pa.binary()
+    return pa.string()
+
+
+def table_schema(conn: sqlite3.Connection, table: str):
+    """
+    Esquema Arrow explícito desde PRAGMA table_info.
+    
+    Con un esquema fijo todos los lotes y particiones tienen los mismos
+    tipos, aunque un lote tenga una columna entera en NULL. `month` no se
+    guarda en los archivos: lo aporta la ruta de la partición.
+    """
+    pa, _ = _import_pyarrow()
+    fields = [
+        pa.field(row[1], _arrow_type(row[2]))
+        for row in conn.execute(f"PRAGMA table_info({table})")
+    ]
+    return pa.schema(fields)
+
+
+def _to_batch(rows: List[tuple], schema):
+    """Convierte filas de SQLite a un RecordBatch (ignora la columna `month` final)."""
+    pa, _ = _import_pyarrow()
+    columns = []
+    for index, field in enumerate(schema):
+        values = [row[index] for row in rows]
+        if pa.types.is_boolean(field.type):
+            values = [None if v is None else bool(v) for v in values]
+        columns.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def export_table(
+    conn: sqlite3.Connection,
+    table: str,
+    out_dir: Path,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Dict[str, int]:
+    """
+    Exporta una tabla a <out_dir>/<table>/month=YYYY-MM/part-0.parquet.
+    
+    Returns:
+        Dict con rows, partitions y bytes escritos
+    """
+    _, pq = _import_pyarrow()
+    schema = table_schema(conn, table)
+    table_dir = out_dir / table
+    
+    stats = {"rows": 0, "partitions": 0, "bytes": 0}
+    writer = None
+    current_month: Optional[str] = None
+    
+    def close_writer():
+        if writer is not None:
+            writer.close()
+            stats["bytes"] += (table_dir / f"month={current_month}" / "part-0.parquet").stat().st_size
+    
+    cursor = conn.execute(EXPORT_QUERIES[table])
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        
+        # Cortar el lote en cada cambio de mes (filas ya vienen ordenadas)
+        start = 0
+        while start < len(rows):
+            month = rows[start][-1] or "unknown"
+            end = start
+            while end < len(rows) and (rows[end][-1] or "unknown") == month:
+                end += 1
+            
+            if month != current_month:
+                close_writer()
+                partition_dir = table_dir / f"month={month}"
+                partition_dir.mkdir(parents=True, exist_ok=True)
+                writer = pq.ParquetWriter(
+                    partition_dir / "part-0.parquet", schema, compression="zstd"
+                )
+                current_month = month
+                stats["partitions"] += 1
+            
+            writer.write_batch(_to_batch(rows[start:end], schema))
+            stats["rows"] += end - start
+            start = end
+    
+    close_writer()
+    return stats
+
+
+def _existing_tables(conn: sqlite3.Connection) -> set:
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def export_tracker(
+    db_path: Path,
+    out_dir: Path,
+    tables: Optional[List[str]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    overwrite: bool = False
+) -> Dict[str, Dict[str, int]]:
+    """
+    Exporta las tablas del tracker a Parquet.
+    
+    Args:
+        db_path: Ruta a conversion_tracker.db
+        out_dir: Directorio de salida
+        tables: Tablas a exportar (default: todas las de EXPORT_QUERIES)
+        batch_size: Filas por lote (fetchmany y row group)
+        overwrite: Reemplazar exportaciones previas de esas tablas
+    
+    Returns:
+        Estadísticas por tabla
+    
+    Raises:
+        FileExistsError: Si ya existe la exportación de una tabla y no se usa overwrite
+    """
+    _import_pyarrow()
+    tables = tables or list(EXPORT_QUERIES)
+    
+    # Solo lectura: no migra el esquema ni bloquea a los convertidores (WAL)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    results = {}
+    try:
+        available = _existing_tables(conn)
+        for table in tables:
+            if table not in available:
+                print(f"⚠️  {table}: no existe en esta base (esquema anterior), se omite")
+                continue
+            # Tablas unidas a conversions necesitan que exista
+            if table in ("conversion_pages", "conversion_metrics") and "conversions" not in available:
+                continue
+            
+            table_dir = out_dir / table
+            if table_dir.exists():
+                if not overwrite:
+                    raise FileExistsError(f"Ya existe {table_dir} (usar --overwrite)")
+                shutil.rmtree(table_dir)
+            
+            start = time.perf_counter()
+            stats = export_table(conn, table, out_dir, batch_size)
+            stats["seconds"] = round(time.perf_counter() - start, 2)
+            results[table] = stats
+    finally:
+        conn.close()
+    
+    return results
+
+
+# ========== CLI ==========
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exporta el tracker de conversiones a Parquet particionado por mes"
+    )
+    parser.add_argument("--metadata-dir", default="sources/metadata",
+                        help="Directorio con conversion_tracker.db (default: sources/metadata)")
+    parser.add_argument("--out", default="sources/exports/parquet",
+                        help="Directorio de salida (default: sources/exports/parquet)")
+    parser.add_argument("--tables", nargs="+", choices=list(EXPORT_QUERIES),
+                        help="Tablas a exportar (default: todas)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Filas por lote (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Reemplazar exportaciones previas")
+    
+    args = parser.parse_args()
+    
+    db_path = Path(args.metadata_dir) / "conversion_tracker.db"
+    if not db_path.exists():
+        print(f"❌ No existe {db_path}")
+        sys.exit(1)
+    
+    try:
+        results = export_tracker(
+            db_path, Path(args.out), args.tables, args.batch_size, args.overwrite
+        )
+    except (ImportError, FileExistsError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    
+    print("\n" + "=" * 60)
+    print("📦 EXPORTACIÓN PARQUET")
+    print("=" * 60)
+    for table, stats in results.items():
+        print(f"  {table:<20} {stats['rows']:>9} filas | {stats['partitions']:>3} particiones | "
+              f"{stats['bytes'] / 1024 / 1024:>7.1f} MB | {stats['seconds']:.1f}s")
+    print(f"\n📁 Salida: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
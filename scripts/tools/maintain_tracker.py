@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Mantenimiento del tracker de conversiones (archivado + compactación)
+
+conversion_errors y validation_reports solo crecen: cada reintento
+fallido agrega errores y cada validación agrega un reporte. Este comando:
+
+1. Mueve a una base de archivo (conversion_archive.db) los errores
+   anteriores a --older-than-days, los errores de conversiones que luego
+   terminaron bien y los reportes superados por uno más nuevo
+2. Opcionalmente exporta la base de archivo a Parquet
+3. Compacta el tracker: incremental_vacuum (VACUUM completo la primera
+   vez), ANALYZE y checkpoint del WAL
+
+Uso:
+    python maintain_tracker.py --dry-run
+    python maintain_tracker.py --older-than-days 30
+    python maintain_tracker.py --parquet sources/exports/archive
+    python maintain_tracker.py --no-archive          # solo compactar
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "conversion"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from conversion_db import ConversionTracker, ARCHIVE_AFTER_DAYS, ARCHIVE_DB_NAME, ARCHIVE_CRITERIA
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Archiva filas antiguas del tracker y compacta la base"
+    )
+    parser.add_argument("--metadata-dir", default="sources/metadata",
+                        help="Directorio con conversion_tracker.db (default: sources/metadata)")
+    parser.add_argument("--archive", default=None,
+                        help=f"Base de archivo (default: <metadata-dir>/{ARCHIVE_DB_NAME})")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS,
+                        help=f"Archivar errores con más de N días (default: {ARCHIVE_AFTER_DAYS})")
+    parser.add_argument("--parquet", default=None, metavar="DIR",
+                        help="Exportar la base de archivo a Parquet en DIR")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Solo mostrar cuántas filas se archivarían")
+    parser.add_argument("--no-archive", action="store_true", help="No archivar, solo compactar")
+    parser.add_argument("--no-compact", action="store_true", help="No compactar")
+    
+    args = parser.parse_args()
+    
+    metadata_dir = Path(args.metadata_dir)
+    if not (metadata_dir / "conversion_tracker.db").exists():
+        print(f"❌ No existe {metadata_dir / 'conversion_tracker.db'}")
+        sys.exit(1)
+    archive_path = Path(args.archive) if args.archive else metadata_dir / ARCHIVE_DB_NAME
+    
+    print("\n" + "=" * 60)
+    print("🧹 MANTENIMIENTO DEL TRACKER")
+    print("=" * 60)
+    
+    with ConversionTracker(str(metadata_dir)) as tracker:
+        if args.dry_run:
+            counts = tracker.archive_rows(older_than_days=args.older_than_days, dry_run=True)
+            for table, count in counts.items():
+                print(f"  {table:<20} {count:>9} filas a archivar")
+            return
+        
+        if not args.no_archive:
+            moved = tracker.archive_rows(archive_path, args.older_than_days)
+            for table, count in moved.items():
+                print(f"  📦 {table:<20} {count:>9} filas → {archive_path.name}")
+        
+        if not args.no_compact:
+            result = tracker.compact()
+            print(f"  🗜️  VACUUM {result['vacuum']}: {result['freed_pages']} páginas libres | "
+                  f"{result['size_before'] / 1024 / 1024:.1f} MB → "
+                  f"{result['size_after'] / 1024 / 1024:.1f} MB")
+            print("  📊 ANALYZE + checkpoint del WAL")
+    
+    if args.parquet and archive_path.exists():
+        from export_parquet import export_tracker
+        try:
+            results = export_tracker(
+                archive_path, Path(args.parquet), list(ARCHIVE_CRITERIA), overwrite=True
+            )
+        except ImportError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        for table, stats in results.items():
+            print(f"  🪶 {table:<20} {stats['rows']:>9} filas → {args.parquet}/{table}")
+    
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
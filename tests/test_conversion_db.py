@@ -0,0 +1,691 @@
+"""
+Tests del tracker de conversiones (ConversionTracker) sobre una base temporal.
+"""
+
+import gc
+import json
+import multiprocessing as mp
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts" / "conversion"))
+
+from conversion_db import ConversionTracker
+from near_duplicates import NearDuplicateDetector, compute_signature
+from pdf_type_detector import PageMap, PDFType
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    """Tracker sobre una base nueva en un directorio temporal."""
+    with ConversionTracker(str(tmp_path / "db")) as tracker:
+        yield tracker
+
+
+def make_pdf(directory: Path, name: str) -> Path:
+    """PDF de prueba: el tracker solo lee sus bytes (hash) y su tamaño."""
+    pdf_path = directory / name
+    pdf_path.write_bytes(b"%PDF-1.4\n" + name.encode() * 16)
+    return pdf_path
+
+
+def trace_statements(tracker):
+    """Registra las sentencias que ejecuta la conexión del hilo actual."""
+    statements = []
+    tracker.conn.set_trace_callback(statements.append)
+    return statements
+
+
+def sample_page_map() -> PageMap:
+    page_map = PageMap(PDFType.NATIVE)
+    page_map.add_page(1500, 0.0, PDFType.NATIVE)
+    return page_map
+
+
+def count_errors(tracker, conversion_id: int) -> int:
+    return tracker.conn.execute(
+        "SELECT COUNT(*) FROM conversion_errors WHERE conversion_id = ?",
+        (conversion_id,)
+    ).fetchone()[0]
+
+
+def test_transaction_commits_once(tracker, tmp_path):
+    """Un bloque transaction(), con bloques anidados, hace un solo commit."""
+    pdf_path = make_pdf(tmp_path, "a.pdf")
+    statements = trace_statements(tracker)
+
+    with tracker.transaction():
+        conversion_id = tracker.add_conversion(pdf_path)
+        tracker.update_conversion(conversion_id, status="processing")
+        with tracker.transaction():
+            tracker.add_error(conversion_id, "timeout", "lento")
+            with tracker.transaction():
+                tracker.update_conversion(conversion_id, status="success")
+        tracker.record_metrics(conversion_id, {"pages": 3})
+
+    assert statements.count("BEGIN IMMEDIATE") == 1
+    assert statements.count("COMMIT") == 1
+    assert statements[-1] == "COMMIT"
+    assert not tracker.conn.in_transaction
+    assert tracker.get_conversion(conversion_id)["status"] == "success"
+
+
+def test_nested_transaction_rollback(tracker, tmp_path):
+    """Una excepción en un bloque anidado revierte todo el grupo."""
+    conversion_id = tracker.add_conversion(make_pdf(tmp_path, "a.pdf"))
+
+    with pytest.raises(RuntimeError):
+        with tracker.transaction():
+            tracker.update_conversion(conversion_id, status="success")
+            with tracker.transaction():
+                tracker.add_error(conversion_id, "timeout", "lento")
+                raise RuntimeError("falla")
+
+    assert tracker._tx_depth == 0
+    assert not tracker.conn.in_transaction
+    assert tracker.get_conversion(conversion_id)["status"] == "pending"
+    assert count_errors(tracker, conversion_id) == 0
+
+    # El tracker sigue usable y la siguiente transacción confirma
+    with tracker.transaction():
+        tracker.update_conversion(conversion_id, status="success")
+    assert tracker.get_conversion(conversion_id)["status"] == "success"
+
+
+def test_transaction_rollback_keeps_previous_commits(tracker, tmp_path):
+    """Revertir un grupo no afecta a lo confirmado antes."""
+    first_id = tracker.add_conversion(make_pdf(tmp_path, "a.pdf"))
+
+    with pytest.raises(ValueError):
+        with tracker.transaction():
+            tracker.add_conversion(make_pdf(tmp_path, "b.pdf"))
+            tracker.update_conversion(first_id, columna_inexistente=1)
+
+    assert tracker.get_statistics()["total_conversions"] == 1
+    assert tracker.get_conversion(first_id)["status"] == "pending"
+
+
+def test_connection_per_thread(tracker, tmp_path):
+    """Cada hilo usa su propia conexión y las escrituras concurrentes llegan todas."""
+    pdf_paths = [make_pdf(tmp_path, f"doc_{i}.pdf") for i in range(16)]
+    main_conn = tracker.conn
+
+    def register(pdf_path):
+        conversion_id = tracker.add_conversion(pdf_path)
+        tracker.update_conversion(conversion_id, status="success")
+        return threading.get_ident(), tracker.conn
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(register, pdf_paths))
+
+    connections = {}
+    for thread_id, conn in results:
+        assert connections.setdefault(thread_id, conn) is conn
+    assert main_conn not in connections.values()
+    assert len(set(map(id, connections.values()))) == len(connections)
+    assert tracker.get_statistics()["by_status"] == {"success": len(pdf_paths)}
+
+
+# Tracker compartido con los procesos del pool (heredado por fork)
+_fork_tracker = None
+
+
+def _register_in_child(pdf_path):
+    tracker, parent_conn = _fork_tracker
+    conversion_id = tracker.add_conversion(Path(pdf_path))
+    tracker.update_conversion(conversion_id, status="success")
+    return (
+        os.getpid(),
+        tracker.conn is not parent_conn and parent_conn in tracker._inherited,
+        tracker._pid == os.getpid(),
+    )
+
+
+@pytest.mark.skipif(
+    "fork" not in mp.get_all_start_methods(),
+    reason="requiere procesos con fork"
+)
+def test_connection_after_fork(tracker, tmp_path):
+    """Tras un fork el hijo abre su conexión sin tocar la del padre."""
+    global _fork_tracker
+    pdf_paths = [str(make_pdf(tmp_path, f"doc_{i}.pdf")) for i in range(8)]
+    parent_conn = tracker.conn
+    parent_id = tracker.add_conversion(make_pdf(tmp_path, "padre.pdf"))
+
+    _fork_tracker = (tracker, parent_conn)
+    try:
+        with mp.get_context("fork").Pool(2) as pool:
+            results = pool.map(_register_in_child, pdf_paths)
+    finally:
+        _fork_tracker = None
+
+    assert all(pid != os.getpid() for pid, _, _ in results)
+    assert all(new_conn and pid_updated for _, new_conn, pid_updated in results)
+    # La conexión del padre sigue abierta y ve lo escrito por los hijos
+    assert tracker.conn is parent_conn
+    assert tracker.get_conversion(parent_id)["status"] == "pending"
+    assert tracker.get_statistics()["by_status"] == {
+        "pending": 1, "success": len(pdf_paths)
+    }
+
+
+def test_write_behind_validates_in_caller(tmp_path):
+    """En write-behind los argumentos inválidos fallan al llamar, no al aplicar."""
+    with ConversionTracker(str(tmp_path / "db"), write_behind=True) as tracker:
+        conversion_id = tracker.add_conversion(make_pdf(tmp_path, "a.pdf"))
+
+        with pytest.raises(ValueError, match="columna_inexistente"):
+            tracker.update_conversion(conversion_id, status="success", columna_inexistente=1)
+        with pytest.raises(TypeError):
+            tracker.add_error(conversion_id)
+
+        assert tracker._write_queue.unfinished_tasks == 0
+        tracker.update_conversion(conversion_id, status="success")
+        tracker.flush()
+        assert tracker.get_conversion(conversion_id)["status"] == "success"
+
+
+def test_write_behind_close_drains_queue(tmp_path):
+    """close() aplica todas las escrituras encoladas antes de cerrar."""
+    db_dir = str(tmp_path / "db")
+    tracker = ConversionTracker(db_dir, write_behind=True)
+    conversion_id = tracker.add_conversion(make_pdf(tmp_path, "a.pdf"))
+    for i in range(500):
+        tracker.add_error(conversion_id, "timeout", f"intento {i}")
+    tracker.update_conversion(conversion_id, status="failed")
+    tracker.close()
+
+    with ConversionTracker(db_dir) as reopened:
+        assert reopened.get_conversion(conversion_id)["status"] == "failed"
+        assert count_errors(reopened, conversion_id) == 500
+
+
+def test_write_behind_atexit_drains_queue(tmp_path):
+    """Al terminar el proceso sin close(), atexit aplica la cola."""
+    db_dir = str(tmp_path / "db")
+    pdf_path = make_pdf(tmp_path, "a.pdf")
+    script = f"""
+import sys
+from pathlib import Path
+sys.path.insert(0, {str(Path(__file__).parent.parent / "scripts" / "conversion")!r})
+from conversion_db import ConversionTracker
+tracker = ConversionTracker({db_dir!r}, write_behind=True)
+conversion_id = tracker.add_conversion(Path({str(pdf_path)!r}))
+for i in range(500):
+    tracker.add_error(conversion_id, "timeout", f"intento {{i}}")
+tracker.update_conversion(conversion_id, status="failed")
+"""
+    subprocess.run([sys.executable, "-c", script], check=True)
+
+    with ConversionTracker(db_dir) as reopened:
+        conversion_id = reopened.is_duplicate(pdf_path)[1]
+        assert reopened.get_conversion(conversion_id)["status"] == "failed"
+        assert count_errors(reopened, conversion_id) == 500
+
+
+def test_add_conversions_many_commits_once(tracker, tmp_path):
+    """Un lote de PDFs nuevos (hashes sin memoizar) se registra con un solo commit."""
+    pdf_paths = [make_pdf(tmp_path, f"doc_{i}.pdf") for i in range(20)]
+    records = [{"pdf_path": p} for p in pdf_paths] + [{"pdf_path": pdf_paths[0]}]
+    statements = trace_statements(tracker)
+
+    ids = tracker.add_conversions_many(records)
+
+    assert statements.count("COMMIT") == 1
+    assert len(set(ids)) == len(pdf_paths) and ids[-1] == ids[0]
+    # Los hashes quedaron memoizados en file_hashes
+    assert tracker.conn.execute("SELECT COUNT(*) FROM file_hashes").fetchone()[0] == len(pdf_paths)
+    assert tracker.add_conversion(pdf_paths[3]) == ids[3]
+
+
+def stats_rows(tracker):
+    return [
+        dict(row) for row in tracker.conn.execute(
+            "SELECT * FROM conversion_stats WHERE count > 0 ORDER BY status"
+        )
+    ]
+
+
+def test_statistics_triggers_match_rebuild(tracker, tmp_path):
+    """El resumen mantenido por triggers coincide con recalcularlo desde cero."""
+    rng = random.Random(36)
+    statuses = ["pending", "processing", "success", "failed"]
+    ids = [
+        tracker.add_conversion(
+            make_pdf(tmp_path, f"doc_{i}.pdf"),
+            status=rng.choice(statuses),
+            pages=rng.randint(1, 400),
+            has_tables=rng.random() < 0.5,
+            has_equations=rng.random() < 0.3,
+            is_scanned=rng.random() < 0.2,
+        )
+        for i in range(30)
+    ]
+    ids += tracker.add_conversions_many(
+        {"pdf_path": make_pdf(tmp_path, f"lote_{i}.pdf"), "pages": i}
+        for i in range(20)
+    )
+
+    for _ in range(200):
+        conversion_id = rng.choice(ids)
+        fields = {}
+        if rng.random() < 0.6:
+            fields["status"] = rng.choice(statuses)
+        if rng.random() < 0.6:
+            fields["confidence_score"] = rng.choice([None, round(rng.random(), 3)])
+        if rng.random() < 0.3:
+            fields["pages"] = rng.randint(0, 400)
+            fields["is_scanned"] = rng.random() < 0.5
+        if fields:
+            tracker.update_conversion(conversion_id, **fields)
+    tracker.update_conversions_many(
+        (conversion_id, {"status": "success", "confidence_score": 0.9})
+        for conversion_id in ids[::7]
+    )
+    with tracker.transaction():
+        tracker.conn.execute("DELETE FROM conversions WHERE id IN (?, ?, ?)", ids[1:4])
+
+    incremental_rows = stats_rows(tracker)
+    incremental = tracker.get_statistics()
+    tracker.rebuild_statistics()
+
+    rebuilt_rows = stats_rows(tracker)
+    # Las sumas de confianza acumulan redondeo de punto flotante
+    for row in incremental_rows:
+        row["confidence_sum"] = pytest.approx(row["confidence_sum"])
+    assert rebuilt_rows == incremental_rows
+    assert tracker.get_statistics() == incremental
+    assert incremental["total_conversions"] == len(ids) - 3
+
+
+def test_orphaned_signatures_are_not_candidates(tracker, tmp_path):
+    """Las firmas de conversiones borradas no se devuelven como casi-duplicados."""
+    words = " ".join(f"palabra{i % 97} termino{i % 13}" for i in range(400))
+    signature = compute_signature(words)
+    detector = NearDuplicateDetector(tracker)
+    deleted_id = tracker.add_conversion(make_pdf(tmp_path, "a.pdf"))
+    kept_id = tracker.add_conversion(make_pdf(tmp_path, "b.pdf"))
+    detector.register(deleted_id, signature)
+    detector.register(kept_id, signature)
+
+    with tracker.transaction():
+        tracker.conn.execute("DELETE FROM conversions WHERE id = ?", (deleted_id,))
+
+    assert [conversion_id for conversion_id, _ in detector.find(signature)] == [kept_id]
+
+
+def count_calls(monkeypatch, tracker, name):
+    """Cuenta las llamadas a un método del tracker (sin cambiar su resultado)."""
+    calls = []
+    method = getattr(tracker, name)
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return method(*args, **kwargs)
+
+    monkeypatch.setattr(tracker, name, wrapper)
+    return calls
+
+
+def test_hash_memo_hit_does_not_reread(tracker, tmp_path, monkeypatch):
+    """Con la misma ruta, inode, tamaño y mtime el SHA-256 no se recalcula."""
+    pdf_path = make_pdf(tmp_path, "a.pdf")
+    reads = count_calls(monkeypatch, tracker, "_hash_file")
+
+    pdf_hash = tracker.file_hash(pdf_path)
+    conversion_id = tracker.add_conversion(pdf_path)
+    assert tracker.is_duplicate(pdf_path) == (True, conversion_id)
+    assert len(reads) == 1
+
+    # Otro tracker sobre la misma base usa la tabla file_hashes
+    with ConversionTracker(str(tracker.db_path.parent)) as other:
+        other_reads = count_calls(monkeypatch, other, "_hash_file")
+        assert other.file_hash(pdf_path) == pdf_hash
+        assert other.is_duplicate(pdf_path) == (True, conversion_id)
+        assert other_reads == []
+
+
+def test_hash_memo_invalidated_by_mtime(tracker, tmp_path, monkeypatch):
+    """Un mtime distinto invalida el hash memoizado (en memoria y en la base)."""
+    pdf_path = make_pdf(tmp_path, "a.pdf")
+    old_hash = tracker.file_hash(pdf_path)
+    reads = count_calls(monkeypatch, tracker, "_hash_file")
+
+    # Mismo tamaño, otro contenido y otro mtime
+    stat = pdf_path.stat()
+    pdf_path.write_bytes(pdf_path.read_bytes()[::-1])
+    os.utime(pdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    new_hash = tracker.file_hash(pdf_path)
+    assert len(reads) == 1 and new_hash != old_hash
+    with ConversionTracker(str(tracker.db_path.parent)) as other:
+        assert other.file_hash(pdf_path) == new_hash
+
+    # Solo tocar el mtime también obliga a releer (mismo hash)
+    os.utime(pdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+    assert tracker.file_hash(pdf_path) == new_hash
+    assert len(reads) == 2
+
+
+def test_duplicate_prefilter_skips_full_hash(tracker, tmp_path, monkeypatch):
+    """Tamaño o hash parcial distintos descartan el duplicado sin SHA-256 completo."""
+    data = random.Random(29).randbytes(200_000)
+    original = tmp_path / "original.pdf"
+    original.write_bytes(data)
+    conversion_id = tracker.add_conversion(original)
+
+    full_reads = count_calls(monkeypatch, tracker, "_hash_file")
+    partial_reads = count_calls(monkeypatch, tracker, "_calculate_partial_hash")
+
+    def candidate(name, content):
+        path = tmp_path / name
+        path.write_bytes(content)
+        return tracker.is_duplicate(path)
+
+    # Otro tamaño: ni siquiera el hash parcial
+    assert candidate("corto.pdf", data[:100_000]) == (False, None)
+    assert (len(partial_reads), len(full_reads)) == (0, 0)
+
+    # Mismo tamaño, inicio distinto: solo el hash parcial
+    assert candidate("inicio.pdf", b"X" + data[1:]) == (False, None)
+    assert (len(partial_reads), len(full_reads)) == (1, 0)
+
+    # Mismo tamaño y mismos extremos: el SHA-256 decide
+    middle = len(data) // 2
+    assert candidate("medio.pdf", data[:middle] + b"X" + data[middle + 1:]) == (False, None)
+    assert (len(partial_reads), len(full_reads)) == (2, 1)
+    assert candidate("copia.pdf", data) == (True, conversion_id)
+    assert (len(partial_reads), len(full_reads)) == (3, 2)
+
+
+def test_update_conversions_many_ignores_empty_status(tracker, tmp_path):
+    """status=None en un lote no se escribe (igual que update_conversion)."""
+    first = tracker.add_conversion(make_pdf(tmp_path, "a.pdf"), status="processing")
+    second = tracker.add_conversion(make_pdf(tmp_path, "b.pdf"))
+    tracker.update_conversion(first, status=None, pages=3)
+
+    updated = tracker.update_conversions_many([
+        (first, {"status": None, "pages": 12}),
+        (second, {"status": "success", "pages": 5}),
+    ])
+
+    assert updated == 2
+    assert (tracker.get_conversion(first)["status"], tracker.get_conversion(first)["pages"]) == ("processing", 12)
+    assert (tracker.get_conversion(second)["status"], tracker.get_conversion(second)["pages"]) == ("success", 5)
+
+
+def test_write_behind_atexit_hook_does_not_keep_tracker_alive(tmp_path):
+    """El hook de atexit guarda una referencia débil: el tracker se puede liberar."""
+    tracker = ConversionTracker(str(tmp_path / "db"), write_behind=True)
+    conversion_id = tracker.add_conversion(make_pdf(tmp_path, "a.pdf"))
+    tracker.update_conversion(conversion_id, status="success")
+    tracker.flush()
+    # El hilo escritor termina sin close() (solo mantenía vivo al tracker él)
+    tracker._write_queue.put(None)
+    tracker._writer.join()
+    tracker._writer = None
+
+    tracker_ref = weakref.ref(tracker)
+    del tracker
+    gc.collect()
+    assert tracker_ref() is None
+
+
+def test_write_behind_reads_flush_only_pending_keys(tmp_path, monkeypatch):
+    """Las lecturas del flujo de conversión no vacían la cola por escrituras ajenas."""
+    with ConversionTracker(str(tmp_path / "db"), write_behind=True) as tracker:
+        first_pdf, second_pdf = make_pdf(tmp_path, "a.pdf"), make_pdf(tmp_path, "b.pdf")
+        first_id = tracker.add_conversion(first_pdf, status="processing")
+        first_hash = tracker.file_hash(first_pdf)
+
+        # El escritor no aplica nada hasta abrir la compuerta
+        gate = threading.Event()
+        apply_writes = tracker._apply_writes
+
+        def gated_apply(ops):
+            gate.wait(10)
+            apply_writes(ops)
+
+        monkeypatch.setattr(tracker, "_apply_writes", gated_apply)
+        flushes = count_calls(monkeypatch, tracker, "flush")
+
+        # Escrituras del primer documento (quedan pendientes)
+        tracker.save_page_map(first_hash, sample_page_map())
+        tracker.add_page_records(first_id, [{"page_number": 1, "strategy": "native"}])
+        tracker.add_validation_report(first_id, True, 90, True, 95, {})
+        tracker.add_error(first_id, "timeout", "lento")
+        tracker.record_metrics(first_id, {"pages": 1})
+        tracker.update_conversion(first_id, status="success", pages=1)
+
+        # Lecturas del segundo documento: ninguna espera a la cola
+        assert tracker.is_duplicate(second_pdf) == (False, None)
+        second_id = tracker.add_conversion(second_pdf, status="processing")
+        assert tracker.get_page_map(tracker.file_hash(second_pdf)) is None
+        assert tracker.get_conversion(second_id)["status"] == "processing"
+        assert flushes == [] and tracker._write_queue.unfinished_tasks == 6
+
+        # Leer lo que sí está pendiente espera al escritor
+        gate.set()
+        assert tracker.get_conversion(first_id)["status"] == "success"
+        assert tracker.get_page_map(first_hash) == sample_page_map().to_bytes()
+        assert len(flushes) == 1
+
+
+# Tabla conversions del esquema original (user_version 0, sin métricas)
+_LEGACY_CONVERSIONS_SQL = """
+    CREATE TABLE conversions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        pdf_filename TEXT NOT NULL,
+        pdf_path TEXT NOT NULL,
+        pdf_hash TEXT NOT NULL UNIQUE,
+        pdf_size_bytes INTEGER,
+        status TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        markdown_path TEXT,
+        pages INTEGER,
+        has_tables BOOLEAN DEFAULT 0,
+        has_equations BOOLEAN DEFAULT 0,
+        is_scanned BOOLEAN DEFAULT 0,
+        language TEXT DEFAULT 'unknown',
+        conversion_time_seconds REAL,
+        confidence_score INTEGER DEFAULT 0,
+        notes TEXT,
+        pdf_type TEXT DEFAULT 'unknown',
+        profile_used TEXT,
+        fidelity_score REAL
+    )
+"""
+
+LEGACY_NOTES = [
+    ("success", {"strategy": "native", "tables_extracted": 3, "ocr": False,
+                 "detection": {"native_ratio": 0.9, "pages": [1, 2]}}),
+    ("success", {"strategy": "mixed", "tables_extracted": 7,
+                 "detection": {"native_ratio": 0.5}}),
+    ("failed", {"strategy": "scanned", "tables_extracted": 0}),
+    ("failed", None),
+]
+
+
+def test_metrics_backfilled_from_legacy_notes(tmp_path):
+    """Migrar una base sin conversion_metrics copia las métricas del JSON de notes."""
+    db_dir = tmp_path / "db"
+    db_dir.mkdir()
+    conn = sqlite3.connect(db_dir / "conversion_tracker.db")
+    conn.execute(_LEGACY_CONVERSIONS_SQL)
+    conn.executemany(
+        "INSERT INTO conversions (pdf_filename, pdf_path, pdf_hash, status, created_at, updated_at, notes) "
+        "VALUES (?, ?, ?, ?, '2024-01-01', '2024-01-01', ?)",
+        [
+            (f"{i}.pdf", f"/tmp/{i}.pdf", f"hash{i}", status,
+             json.dumps(notes) if notes is not None else "texto libre")
+            for i, (status, notes) in enumerate(LEGACY_NOTES)
+        ]
+    )
+    conn.commit()
+    conn.close()
+
+    with ConversionTracker(str(db_dir)) as tracker:
+        assert tracker.get_metrics(1) == {
+            "strategy": "native", "tables_extracted": 3.0, "ocr": 0.0,
+            "detection.native_ratio": 0.9,
+        }
+        assert tracker.get_metrics(4) == {}
+
+        stats = tracker.get_metric_stats("tables_extracted")
+        assert stats == {"count": 3, "sum": 10.0, "avg": pytest.approx(10 / 3), "min": 0.0, "max": 7.0}
+        assert tracker.get_metric_stats("tables_extracted", status="success")["avg"] == 5.0
+        assert tracker.get_metric_stats("detection.native_ratio")["count"] == 2
+        assert tracker.get_statistics()["by_status"] == {"failed": 2, "success": 2}
+
+        # record_metrics() aplana igual que el backfill y reemplaza lo anterior
+        backfilled = tracker.get_metrics(2)
+        tracker.record_metrics(2, LEGACY_NOTES[1][1])
+        assert tracker.get_metrics(2) == backfilled
+        tracker.record_metrics(2, {"tables_extracted": 1})
+        assert tracker.get_metrics(2) == {"tables_extracted": 1.0}
+        assert tracker.get_metric_stats("tables_extracted")["sum"] == 4.0
+
+
+def test_page_records_persist_and_cascade(tracker, tmp_path):
+    """Las páginas se guardan por conversión y se borran con ella."""
+    first = tracker.add_conversion(make_pdf(tmp_path, "a.pdf"))
+    second = tracker.add_conversion(make_pdf(tmp_path, "b.pdf"))
+    tracker.add_page_records(first, [
+        {"page_number": 2, "strategy": "native", "char_count": 900, "render_seconds": 0.5},
+        {"page_number": 1, "strategy": "native", "char_count": 1200, "render_seconds": 0.2},
+    ])
+    tracker.add_page_records(second, [
+        {"page_number": 1, "strategy": "scanned", "render_seconds": 4.0, "output_bytes": 10},
+    ])
+
+    pages = tracker.get_page_records(first)
+    assert [page["page_number"] for page in pages] == [1, 2]
+    assert pages[0]["char_count"] == 1200 and pages[0]["word_count"] is None
+    assert [(p["conversion_id"], p["page_number"]) for p in tracker.get_slowest_pages(2)] == [
+        (second, 1), (first, 2)
+    ]
+
+    # replace=True (reconversión) sustituye; replace=False agrega
+    tracker.add_page_records(first, [{"page_number": 1, "strategy": "mixed"}])
+    tracker.add_page_records(first, [{"page_number": 2, "strategy": "mixed"}], replace=False)
+    assert [p["strategy"] for p in tracker.get_page_records(first)] == ["mixed", "mixed"]
+
+    with tracker.transaction():
+        tracker.conn.execute("DELETE FROM conversions WHERE id = ?", (first,))
+    assert tracker.get_page_records(first) == []
+    assert len(tracker.get_page_records(second)) == 1
+
+    # Bases anteriores: la migración borra las páginas huérfanas
+    with tracker.transaction():
+        tracker.conn.execute("DROP TRIGGER trg_pages_delete")
+        tracker.conn.execute("DELETE FROM conversions WHERE id = ?", (second,))
+        tracker.conn.execute("PRAGMA user_version = 5")
+    with ConversionTracker(str(tracker.db_path.parent)) as reopened:
+        assert reopened.get_page_records(second) == []
+
+
+def table_ids(conn, table):
+    return sorted(row[0] for row in conn.execute(f"SELECT id FROM {table}"))
+
+
+def test_archive_rows_moves_rows_to_archive(tracker, tmp_path):
+    """Errores antiguos o resueltos y reportes superados pasan a la base de archivo."""
+    failed = tracker.add_conversion(make_pdf(tmp_path, "a.pdf"))
+    resolved = tracker.add_conversion(make_pdf(tmp_path, "b.pdf"))
+    tracker.add_error(failed, "timeout", "viejo")
+    tracker.add_error(failed, "timeout", "reciente")
+    tracker.add_error(resolved, "ocr", "resuelto")
+    tracker.update_conversion(resolved, status="success")
+    for confidence in (60, 80):
+        tracker.add_validation_report(failed, True, 7, True, confidence, {"ok": True})
+    with tracker.transaction():
+        tracker.conn.execute(
+            "UPDATE conversion_errors SET created_at = '2000-01-01T00:00:00' "
+            "WHERE error_message = 'viejo'"
+        )
+    errors = table_ids(tracker.conn, "conversion_errors")
+    reports = table_ids(tracker.conn, "validation_reports")
+
+    expected = {"conversion_errors": 2, "validation_reports": 1}
+    assert tracker.archive_rows(dry_run=True) == expected
+    assert tracker.archive_rows() == expected
+
+    assert [row[0] for row in tracker.conn.execute("SELECT error_message FROM conversion_errors")] == [
+        "reciente"
+    ]
+    assert table_ids(tracker.conn, "validation_reports") == reports[-1:]
+    assert tracker.conn.execute("PRAGMA database_list").fetchall()[-1]["name"] != "archive"
+
+    archive_path = tracker.db_path.parent / "conversion_archive.db"
+    with sqlite3.connect(archive_path) as archive:
+        assert sorted(
+            row[0] for row in archive.execute("SELECT error_message FROM conversion_errors")
+        ) == ["resuelto", "viejo"]
+        assert archive.execute(
+            "SELECT COUNT(*) FROM validation_reports WHERE archived_at IS NULL"
+        ).fetchone()[0] == 0
+
+    # Repetir no mueve ni duplica filas
+    assert tracker.archive_rows() == {"conversion_errors": 0, "validation_reports": 0}
+
+    # Consultas sobre ambas bases con ATTACH: main + archivo = filas originales
+    tracker.conn.execute("ATTACH DATABASE ? AS archive", (str(archive_path),))
+    try:
+        for table, ids in (("conversion_errors", errors), ("validation_reports", reports)):
+            union = tracker.conn.execute(
+                f"SELECT id FROM main.{table} UNION ALL SELECT id FROM archive.{table}"
+            ).fetchall()
+            assert sorted(row[0] for row in union) == ids
+        joined = tracker.conn.execute("""
+            SELECT c.pdf_filename FROM archive.conversion_errors e
+            JOIN main.conversions c ON c.id = e.conversion_id
+            WHERE e.error_message = 'resuelto'
+        """).fetchone()
+        assert joined[0] == "b.pdf"
+    finally:
+        tracker.conn.execute("DETACH DATABASE archive")
+
+
+def test_compact_switches_to_incremental_vacuum(tmp_path):
+    """Una base sin auto_vacuum se convierte una vez; después el vacuum es incremental."""
+    db_dir = tmp_path / "db"
+    with ConversionTracker(str(db_dir)) as tracker:
+        tracker.conn.execute("PRAGMA auto_vacuum = NONE")
+        tracker.conn.execute("VACUUM")
+        assert tracker.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+        conversion_id = tracker.add_conversion(make_pdf(tmp_path, "a.pdf"))
+        with tracker.transaction():
+            for i in range(500):
+                tracker.add_error(conversion_id, "timeout", "x" * 2000)
+
+    with ConversionTracker(str(db_dir)) as tracker:
+        with tracker.transaction():
+            tracker.conn.execute("DELETE FROM conversion_errors")
+
+        first = tracker.compact()
+        assert first["vacuum"] == "full"
+        assert first["freed_pages"] > 0
+        assert first["size_after"] < first["size_before"]
+        assert tracker.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert tracker.conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+
+        with tracker.transaction():
+            for i in range(200):
+                tracker.add_error(conversion_id, "timeout", "x" * 2000)
+        with tracker.transaction():
+            tracker.conn.execute("DELETE FROM conversion_errors")
+        second = tracker.compact()
+        assert second["vacuum"] == "incremental"
+        assert second["freed_pages"] > 0
+        assert tracker.conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+        assert tracker.get_conversion(conversion_id)["pdf_filename"] == "a.pdf"
@@ -0,0 +1,361 @@
+"""
+Tests del normalizador de markdown sobre los fixtures de tests/fixtures/normalizer.
+"""
+
+import io
+import json
+import re
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from itertools import islice
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts" / "conversion"))
+
+from conversion_profiles import ProfileManager
+import markdown_normalizer
+from markdown_normalizer import (
+    MAX_LOGGED_CHANGES, MarkdownNormalizer, NormalizationCache, _LineValidator,
+    get_normalizer, normalize_markdown_files
+)
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "normalizer"
+FIXTURES = sorted(FIXTURES_DIR.glob("*.md"))
+
+
+def profile(name):
+    return ProfileManager().get_profile(name).normalization
+
+
+def normalize_streaming(normalizer, markdown, **kwargs):
+    """normalize_stream() sobre las líneas de un string; devuelve (markdown, resultado)."""
+    output = []
+    result = normalizer.normalize_stream(
+        lambda: iter(markdown.split('\n')), output.append, **kwargs
+    )
+    return '\n'.join(output), result
+
+
+@pytest.mark.parametrize("profile_name", [None, "universidad_de_chile_thesis"])
+@pytest.mark.parametrize("fixture", FIXTURES, ids=lambda path: path.stem)
+def test_stream_matches_normalize(fixture, profile_name):
+    """normalize() y normalize_stream() dan la misma salida y los mismos cambios."""
+    markdown = fixture.read_text(encoding="utf-8")
+    normalizer = MarkdownNormalizer(profile=profile(profile_name) if profile_name else None)
+
+    expected = normalizer.normalize(markdown, section_tree=True)
+    streamed, result = normalize_streaming(normalizer, markdown, section_tree=True)
+
+    assert expected["changes_count"] > 0
+    assert streamed == expected["markdown"]
+    assert result == {key: value for key, value in expected.items() if key != "markdown"}
+
+
+def test_fixtures_cover_rewrite_edge_cases():
+    """Los fixtures incluyen los casos que toca la reescritura en dos pasadas."""
+    text = "\n".join(path.read_text(encoding="utf-8") for path in FIXTURES)
+    for marker in ("\n---\n", "```", "~~~", "\n| ", "# Página", "## 2.1. ", "# CAPÍTULO I"):
+        assert marker in text
+
+
+def test_normalize_fixture_structure():
+    """Puntos fijos de la salida: marcadores de página, separadores y numeración."""
+    markdown = (FIXTURES_DIR / "thesis_pages.md").read_text(encoding="utf-8")
+    result = MarkdownNormalizer().normalize(markdown)
+    lines = result["markdown"].split('\n')
+
+    assert not any(line.startswith("# Página") or line == "---" for line in lines)
+    assert "Revista de Ejemplo, Vol. 3" not in lines
+    assert result["boilerplate"]["pages"] == 5
+    # La numeración define el nivel: 1. → ##, 1.1 → ###, 1.1.1 → ####
+    assert "## 1. INTRODUCCIÓN" in lines
+    assert "### 1.1 Antecedentes" in lines
+    assert "#### 1.1.1 Trabajos previos" in lines
+    assert "### 2.1. Diseño del estudio" in lines
+
+
+FRAGMENTED = (
+    "# Título\n"
+    "\n"
+    "Una línea corta\n"
+    "que sigue aquí.\n"
+    "\n"
+    "Una línea larga de un párrafo que el extractor cortó en el borde\n"
+    "de la página y que continúa en la siguiente línea."
+)
+
+
+def test_profile_merge_threshold_changes_output():
+    """Con perfil (min_line_length_for_merge=60) las líneas cortas no se fusionan."""
+    standard = get_normalizer().normalize(FRAGMENTED)["markdown"].split('\n')
+    with_profile = get_normalizer(profile("academic_apa")).normalize(FRAGMENTED)["markdown"].split('\n')
+
+    long_paragraph = (
+        "Una línea larga de un párrafo que el extractor cortó en el borde "
+        "de la página y que continúa en la siguiente línea."
+    )
+    assert "Una línea corta que sigue aquí." in standard
+    assert long_paragraph in standard
+    assert "Una línea corta" in with_profile and "que sigue aquí." in with_profile
+    assert long_paragraph in with_profile
+
+
+def test_get_normalizer_keys_on_profile_values():
+    """Un perfil editado con el mismo nombre no reutiliza el normalizador anterior."""
+    base = profile("academic_apa")
+    assert get_normalizer(base) is get_normalizer(profile("academic_apa"))
+
+    edited = replace(base, min_line_length_for_merge=0)
+    normalizer = get_normalizer(edited)
+    assert normalizer is not get_normalizer(base)
+    assert normalizer.min_line_length_for_merge == 0
+    assert "Una línea corta que sigue aquí." in normalizer.normalize(FRAGMENTED)["markdown"]
+
+
+def test_get_normalizer_is_per_thread():
+    """Cada hilo recibe su propia instancia; en paralelo la salida es la misma que en serie."""
+    documents = [fixture.read_text(encoding="utf-8") for fixture in FIXTURES] * 8
+    apa = profile("academic_apa")
+    expected = [get_normalizer(apa).normalize(document) for document in documents]
+
+    def normalize(document):
+        normalizer = get_normalizer(apa)
+        assert normalizer is get_normalizer(profile("academic_apa"))
+        return id(normalizer), normalizer.normalize(document)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(normalize, documents))
+
+    instances = {instance for instance, _ in results}
+    assert id(get_normalizer(apa)) not in instances
+    assert [result for _, result in results] == expected
+
+
+# ~600 cambios (encabezados y líneas fusionadas): más que MAX_LOGGED_CHANGES
+MANY_CHANGES = "\n\n".join(
+    f"# CAPÍTULO {i}\n\nUna línea corta\nque sigue aquí.\n\n## {i}.1. Sección\n\ntexto"
+    for i in range(1, 120)
+)
+
+
+def test_change_log_truncates_entries_but_counts_all(tmp_path):
+    """En memoria quedan MAX_LOGGED_CHANGES cambios; los conteos y el stream son completos."""
+    full = MarkdownNormalizer(max_logged_changes=10**6).normalize(MANY_CHANGES)
+    assert full["changes_count"] > MAX_LOGGED_CHANGES
+    assert len(full["changes"]) == full["changes_count"]
+
+    stream = io.StringIO()
+    capped = MarkdownNormalizer().normalize(MANY_CHANGES, changes_stream=stream)
+    assert len(capped["changes"]) == MAX_LOGGED_CHANGES
+    assert capped["changes"] == full["changes"][:MAX_LOGGED_CHANGES]
+    assert capped["changes_count"] == full["changes_count"]
+    assert capped["changes_by_type"] == full["changes_by_type"]
+    assert sum(capped["changes_by_type"].values()) == full["changes_count"]
+    streamed = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert streamed == json.loads(json.dumps(full["changes"]))
+
+    # Con caché los cambios de cada bloque se registran por lote (ChangeLog.extend)
+    cache = NormalizationCache(tmp_path / "cache.db")
+    for _ in range(2):
+        cached = MarkdownNormalizer().normalize(MANY_CHANGES, cache=cache)
+        assert len(cached["changes"]) == MAX_LOGGED_CHANGES
+        assert cached["changes_count"] == full["changes_count"]
+        assert cached["changes_by_type"] == full["changes_by_type"]
+
+
+def cached_normalize(normalizer, markdown, cache):
+    """normalize() con caché; devuelve (resultado, (aciertos fase 1, aciertos fase 4), bloques)."""
+    result = normalizer.normalize(markdown, cache=cache, section_tree=True)
+    stats = result.pop("cache")
+    return result, (stats["phase1_hits"], stats["phase4_hits"]), stats["blocks"]
+
+
+def test_normalization_cache_hit(tmp_path, monkeypatch):
+    """Un documento repetido sale de la caché sin normalizar bloques y con el mismo resultado."""
+    markdown = (FIXTURES_DIR / "thesis_pages.md").read_text(encoding="utf-8")
+    cache = NormalizationCache(tmp_path / "cache.db")
+    expected = MarkdownNormalizer().normalize(markdown, section_tree=True)
+
+    first, hits, blocks = cached_normalize(MarkdownNormalizer(), markdown, cache)
+    assert hits == (0, 0) and blocks > 1
+    assert first == expected
+
+    calls = []
+    original = MarkdownNormalizer._normalize_block
+    monkeypatch.setattr(MarkdownNormalizer, "_normalize_block",
+                        lambda self, *args: calls.append(args) or original(self, *args))
+    # Otra instancia y otra conexión: la caché es el archivo
+    second, hits, _ = cached_normalize(MarkdownNormalizer(), markdown, NormalizationCache(cache.db_path))
+    assert hits == (blocks, blocks)
+    assert calls == []
+    assert second == expected
+
+    # Un bloque editado es el único que se recalcula
+    edited = markdown.replace("# Página 2", "# Página 2\n\nUn párrafo nuevo.", 1)
+    assert edited != markdown
+    third, hits, edited_blocks = cached_normalize(MarkdownNormalizer(), edited, cache)
+    assert hits[0] == edited_blocks - 1
+    assert third == MarkdownNormalizer().normalize(edited, section_tree=True)
+
+
+def test_normalization_cache_invalidated_by_rules(tmp_path, monkeypatch):
+    """Otro perfil u otra NORMALIZER_VERSION no reutiliza las entradas guardadas."""
+    cache = NormalizationCache(tmp_path / "cache.db")
+    _, _, blocks = cached_normalize(MarkdownNormalizer(), FRAGMENTED * 3, cache)
+
+    # min_line_length_for_merge solo afecta a la etapa de normalización
+    strict = MarkdownNormalizer(profile=replace(profile("academic_apa"), min_line_length_for_merge=60))
+    result, hits, _ = cached_normalize(strict, FRAGMENTED * 3, cache)
+    assert hits[1] == 0
+    assert result == strict.normalize(FRAGMENTED * 3, section_tree=True)
+    assert "Una línea corta" in result["markdown"].split('\n')
+
+    monkeypatch.setattr(markdown_normalizer, "NORMALIZER_VERSION", markdown_normalizer.NORMALIZER_VERSION + 1)
+    result, hits, _ = cached_normalize(MarkdownNormalizer(), FRAGMENTED * 3, cache)
+    assert hits == (0, 0)
+    assert result == MarkdownNormalizer().normalize(FRAGMENTED * 3, section_tree=True)
+
+    # La versión original sigue encontrando sus entradas
+    monkeypatch.undo()
+    _, hits, _ = cached_normalize(MarkdownNormalizer(), FRAGMENTED * 3, cache)
+    assert hits == (blocks, blocks)
+
+
+def copy_fixtures(directory):
+    """Copia los fixtures a un directorio de trabajo; devuelve las salidas esperadas."""
+    directory.mkdir()
+    for fixture in FIXTURES:
+        shutil.copy(fixture, directory / fixture.name)
+    return [directory / f"{fixture.stem}_normalized.md" for fixture in FIXTURES]
+
+
+def statuses(summary):
+    return sorted((Path(f["input"]).name, f["status"]) for f in summary["files"])
+
+
+def test_batch_skips_up_to_date_outputs(tmp_path):
+    """Se omiten las salidas cuyo reporte coincide en entrada, versión y reglas."""
+    inputs = tmp_path / "md"
+    outputs = copy_fixtures(inputs)
+
+    first = normalize_markdown_files([inputs], workers=2)
+    assert first["normalized"] == len(FIXTURES) and first["errors"] == 0
+    written = {path: path.stat().st_mtime_ns for path in outputs}
+
+    second = normalize_markdown_files([inputs], workers=1)
+    assert second["skipped"] == len(FIXTURES) and second["normalized"] == 0
+    assert {path: path.stat().st_mtime_ns for path in outputs} == written
+
+    # Entrada editada: solo ese archivo se vuelve a normalizar
+    edited = inputs / FIXTURES[0].name
+    edited.write_text(edited.read_text(encoding="utf-8") + "\nUn párrafo nuevo.\n", encoding="utf-8")
+    third = normalize_markdown_files([inputs], workers=1)
+    assert statuses(third) == sorted(
+        (fixture.name, "normalized" if fixture == FIXTURES[0] else "skipped") for fixture in FIXTURES
+    )
+    assert "Un párrafo nuevo." in outputs[0].read_text(encoding="utf-8")
+
+    # Otras reglas, o force, normalizan todo
+    apa = profile("academic_apa")
+    assert normalize_markdown_files([inputs], profile=apa, workers=1)["normalized"] == len(FIXTURES)
+    assert normalize_markdown_files([inputs], profile=apa, workers=1)["skipped"] == len(FIXTURES)
+    assert normalize_markdown_files([inputs], workers=1, force=True)["normalized"] == len(FIXTURES)
+
+
+def test_batch_failure_keeps_previous_output(tmp_path, monkeypatch):
+    """Un archivo que falla a mitad de la escritura deja intactos salida y reporte anteriores."""
+    inputs = tmp_path / "md"
+    outputs = copy_fixtures(inputs)
+    normalize_markdown_files([inputs], workers=1)
+    before = {path: path.read_bytes() for path in inputs.iterdir()}
+
+    def failing_stream(self, lines, write_line, *args, **kwargs):
+        for line in islice(lines(), 5):
+            write_line(line)
+        raise RuntimeError("falla a mitad del archivo")
+
+    monkeypatch.setattr(MarkdownNormalizer, "normalize_stream", failing_stream)
+    summary = normalize_markdown_files([inputs], workers=1, force=True)
+
+    assert summary["errors"] == len(FIXTURES) and summary["normalized"] == 0
+    assert all(f["error"] == "falla a mitad del archivo" for f in summary["files"])
+    # Sin temporales a medias; salidas y reportes como antes del intento
+    assert not list(inputs.glob(".*.tmp"))
+    assert {path: path.read_bytes() for path in inputs.iterdir()} == before
+    assert all(path in before for path in outputs)
+
+    # El reporte anterior sigue al día: el siguiente lote omite los archivos
+    monkeypatch.undo()
+    assert normalize_markdown_files([inputs], workers=1)["skipped"] == len(FIXTURES)
+
+
+def regex_checks(markdown):
+    """Checks de la validación anterior: regex sobre el texto completo."""
+    current_level = 0
+    valid_hierarchy = True
+    for match in re.finditer(r'^(#+)\s', markdown, re.MULTILINE):
+        level = len(match.group(1))
+        if current_level and level > current_level + 1:
+            valid_hierarchy = False
+            break
+        current_level = level
+    return {
+        "has_h1": bool(re.search(r'^#\s+', markdown, re.MULTILINE)),
+        "no_duplicate_hashes": not re.search(r'^###+\s*##', markdown, re.MULTILINE),
+        "valid_hierarchy": valid_hierarchy,
+        "no_metadata_markers": not re.search(r'^#{1,6}\s*(?:Página|Page)\s*\d', markdown, re.MULTILINE),
+        "proper_spacing": not re.search(r'\n\n\n+', markdown),
+    }
+
+
+VALIDATION_CASES = [
+    "",
+    "texto sin encabezados",
+    "# Título\n\n## Sección\n\n### Sub",
+    "## Sin H1\n\ntexto",
+    "#Título sin espacio\n\n##también",
+    "# Título\n\n### Salto de nivel",
+    "### Primero profundo\n\n#### Sigue\n\n# Vuelve\n\n## Baja",
+    "# A\n\n## B\n\n#### Salto tardío\n\n## C",
+    "### ## Hashes duplicados",
+    "###\t##tab",
+    "## Página 3\n\ntexto",
+    "#Page 12",
+    "###### Página\n7",
+    "####### Página 1",
+    "# Título\n\n\ntexto",
+    "texto\n\n\n\n# Título",
+    # Los espacios de las regex cruzan saltos de línea
+    "#\n\nTítulo en la línea siguiente",
+    "#\n\n\n",
+    "##\n\n   \nPágina 4",
+    "###\n\n\n## cruzando líneas",
+    "## Uno\n#\n\n#### Dos",
+    "texto\n#",
+    "#",
+    "# Título\n\n\t\n\n##\t\t\nPage 9",
+]
+
+
+@pytest.mark.parametrize("batch", [1, 2, 3, 1000])
+@pytest.mark.parametrize(
+    "markdown",
+    VALIDATION_CASES + [path.read_text(encoding="utf-8") for path in FIXTURES],
+    ids=[f"case{i}" for i in range(len(VALIDATION_CASES))] + [path.stem for path in FIXTURES]
+)
+def test_line_validator_matches_full_text_regexes(markdown, batch):
+    """_LineValidator da los mismos checks que las regex sobre el texto completo, en todo lote."""
+    lines = markdown.split('\n')
+    validator = _LineValidator()
+    for start in range(0, len(lines), batch):
+        validator.feed(lines[start:start + batch])
+    report = validator.report()
+
+    expected = regex_checks(markdown)
+    assert report["checks"] == expected
+    assert report["warnings"] == [name for name, ok in expected.items() if not ok]
+    assert report["fidelity_score"] == sum(expected.values()) / len(expected) * 100
@@ -0,0 +1,106 @@
+"""
+Tests de casi-duplicados (MinHash + LSH) sobre textos sintéticos: se firma
+el texto que extract_signature_text() devolvería, sin leer PDFs.
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts" / "conversion"))
+
+from conversion_db import ConversionTracker
+from near_duplicates import (
+    NEAR_DUPLICATE_THRESHOLD, SIGNATURE_PAGES, NearDuplicateDetector, compute_signature
+)
+
+VOCABULARY = [f"termino{i}" for i in range(3000)]
+
+
+def make_pages(seed: int, count: int, words: int = 350):
+    """Páginas de texto con palabras al azar (semilla fija)."""
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(VOCABULARY) for _ in range(words)) for _ in range(count)]
+
+
+def signed_text(pages):
+    """Texto que se firma: las primeras SIGNATURE_PAGES páginas."""
+    return "\n".join(pages[:SIGNATURE_PAGES])
+
+
+def re_export(page: str, page_number: int) -> str:
+    """Misma página desde otro exportador: cortes de línea, encabezado y pie distintos."""
+    words = page.split()
+    lines = [" ".join(words[i:i + 11]) for i in range(0, len(words), 11)]
+    return "\n".join(["Descargado desde el repositorio institucional", *lines, str(page_number)])
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    with ConversionTracker(str(tmp_path / "db")) as tracker:
+        yield tracker
+
+
+def register(tracker, tmp_path, name, text):
+    """Registra una conversión con la firma de `text`; devuelve su ID."""
+    pdf_path = tmp_path / name
+    pdf_path.write_bytes(b"%PDF-1.4\n" + name.encode() * 16)
+    conversion_id = tracker.add_conversion(pdf_path)
+    NearDuplicateDetector(tracker).register(conversion_id, compute_signature(text))
+    return conversion_id
+
+
+def test_prepended_cover_page_is_near_duplicate(tracker, tmp_path):
+    """Una portada agregada desplaza una página, pero la copia se detecta."""
+    pages = make_pages(seed=1, count=12)
+    cover = " ".join(make_pages(seed=2, count=1, words=40))
+    original = compute_signature(signed_text(pages))
+    with_cover = compute_signature(signed_text([cover] + pages))
+
+    # Con Jaccard quedaría bajo el umbral; la contención no
+    assert original.similarity(with_cover) < NEAR_DUPLICATE_THRESHOLD
+    assert original.containment(with_cover) >= NEAR_DUPLICATE_THRESHOLD
+    shared_bands = set(original.band_keys()) & set(with_cover.band_keys())
+    assert len(shared_bands) >= 3
+
+    original_id = register(tracker, tmp_path, "original.pdf", signed_text(pages))
+    matches = NearDuplicateDetector(tracker).find(with_cover)
+    assert [conversion_id for conversion_id, _ in matches] == [original_id]
+
+
+def test_re_exported_document_is_near_duplicate(tracker, tmp_path):
+    """El mismo texto con otros cortes de línea, encabezado y pie se detecta."""
+    pages = make_pages(seed=3, count=12)
+    exported = [re_export(page, number) for number, page in enumerate(pages, 1)]
+
+    original_id = register(tracker, tmp_path, "original.pdf", signed_text(pages))
+    matches = NearDuplicateDetector(tracker).find(compute_signature(signed_text(exported)))
+
+    assert [conversion_id for conversion_id, _ in matches] == [original_id]
+    assert matches[0][1] >= 0.9
+
+
+def test_unrelated_document_is_not_near_duplicate(tracker, tmp_path):
+    """Documentos distintos sobre el mismo vocabulario no se marcan."""
+    register(tracker, tmp_path, "a.pdf", signed_text(make_pages(seed=4, count=3)))
+    other = compute_signature(signed_text(make_pages(seed=5, count=3)))
+
+    assert NearDuplicateDetector(tracker).find(other) == []
+
+
+def test_signature_bands_rebuilt_on_migration(tmp_path):
+    """Las bases con bandas de otra división LSH las recalculan al abrir (v7)."""
+    text = signed_text(make_pages(seed=6, count=3))
+    with ConversionTracker(str(tmp_path / "db")) as tracker:
+        conversion_id = register(tracker, tmp_path, "a.pdf", text)
+        with tracker.transaction():
+            tracker.conn.execute("UPDATE signature_bands SET bucket = bucket + 1")
+            tracker.conn.execute("PRAGMA user_version = 6")
+        assert NearDuplicateDetector(tracker).find(compute_signature(text)) == []
+
+    with ConversionTracker(str(tmp_path / "db")) as tracker:
+        matches = NearDuplicateDetector(tracker).find(compute_signature(text))
+
+    assert [conversion_id for conversion_id, _ in matches] == [conversion_id]
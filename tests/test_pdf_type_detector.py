@@ -0,0 +1,104 @@
+"""
+Tests del detector de tipo de PDF: conteo de caracteres del triage sobre
+content streams sintéticos y serialización del mapa de páginas (PageMap).
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts" / "conversion"))
+
+from conversion_db import ConversionTracker
+from pdf_type_detector import PageMap, PDFType, PDFTypeDetector
+
+count = PDFTypeDetector._count_text_chars
+
+
+@pytest.mark.parametrize("stream, expected", [
+    # Tj, ' y " cuentan solo los bytes del string
+    (b"BT /F1 12 Tf 72 700 Td (Hola mundo) Tj ET", 10),
+    (b"BT (linea) ' ET", 5),
+    (b'BT 1 2 (texto) " ET', 5),
+    # TJ: sin corchetes ni números de kerning
+    (b"BT [(Ho) -250 (la) 120.5 (!)] TJ ET", 5),
+    (b"BT [ (a)-10(b) ]TJ ET", 2),
+    # Escapes: cada uno es un byte; \<fin de línea> no agrega nada
+    (b"BT (a\\(b\\)c) Tj ET", 5),
+    (b"BT (\\101\\102\\7x) Tj ET", 4),
+    (b"BT (\\\\) Tj ET", 1),
+    (b"BT (\\n\\t) Tj ET", 2),
+    (b"BT (ab\\\ncd) Tj ET", 4),
+    # Paréntesis balanceados sin escapar y corchetes dentro de strings
+    (b"BT (f(x) = y) Tj ET", 8),
+    (b"BT [(a]b) 5 (c[)] TJ ET", 5),
+    # Hexadecimal: dos dígitos por byte, espacios ignorados, impar se completa
+    (b"BT <48656C6C6F> Tj ET", 5),
+    (b"BT [<0048 0069> -30 <00>] TJ ET", 5),
+    (b"BT <414> Tj ET", 2),
+])
+def test_count_text_chars_decoded_operands(stream, expected):
+    """Cuenta los bytes decodificados de los operandos de texto."""
+    assert count(stream) == expected
+
+
+def test_count_text_chars_ignores_other_strings():
+    """Strings que no son operandos de Tj/TJ/'/" no cuentan."""
+    stream = (
+        b"/Span << /ActualText (texto oculto) >> BDC "
+        b"BT (visible) Tj ET EMC "
+        b"[(no) (es) (texto)] 0 d"
+    )
+    assert count(stream) == 7
+
+
+def test_count_text_chars_without_text():
+    """Un stream solo con gráficos no tiene caracteres."""
+    assert count(b"q 100 0 0 200 0 0 cm /Im0 Do Q") == 0
+    assert count(b"") == 0
+
+
+def sample_page_map():
+    page_map = PageMap(PDFType.MIXED)
+    page_map.add_page(1800, 0.0, PDFType.NATIVE)
+    page_map.add_page(0, 0.97, PDFType.SCANNED)
+    page_map.add_page(70000, 0.456, PDFType.MIXED)
+    return page_map
+
+
+def test_page_map_round_trip():
+    """to_bytes()/from_bytes() conservan tipo, caracteres, cobertura y etiquetas."""
+    page_map = sample_page_map()
+    restored = PageMap.from_bytes(page_map.to_bytes())
+
+    assert restored.pdf_type is PDFType.MIXED
+    assert len(restored) == 3
+    assert [restored.page(i) for i in range(3)] == [page_map.page(i) for i in range(3)]
+    assert restored.page(2) == {"page": 3, "chars": 70000, "image_coverage": 0.46, "label": "mixed"}
+    assert restored.pages_with_label(PDFType.SCANNED) == [2]
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda data: data[:5],
+    lambda data: data[:-1],
+    lambda data: data + b"\x00",
+    lambda data: b"XXXX" + data[4:],
+    lambda data: data[:-1] + b"\x09",
+])
+def test_page_map_from_bytes_rejects_invalid_data(corrupt):
+    """Datos truncados o corruptos dan ValueError (el llamador re-detecta)."""
+    with pytest.raises(ValueError):
+        PageMap.from_bytes(corrupt(sample_page_map().to_bytes()))
+
+
+def test_page_map_persisted_in_tracker(tmp_path):
+    """save_page_map()/get_page_map() guardan el mapa por hash del PDF."""
+    page_map = sample_page_map()
+    with ConversionTracker(str(tmp_path)) as tracker:
+        assert tracker.get_page_map("a" * 64) is None
+        tracker.save_page_map("a" * 64, page_map)
+        data = tracker.get_page_map("a" * 64)
+
+    assert data == page_map.to_bytes()
+    assert PageMap.from_bytes(data).page(1) == page_map.page(1)